@@ -0,0 +1,690 @@
+import math
+from datetime import datetime
+from typing import Callable
+
+import altair as alt
+import matplotlib.pyplot as plt
+from matplotlib.colors import rgb2hex
+from streamlit_echarts import JsCode
+
+from constants import DISTANCE_NAMES, HEATMAP_TILE_CELLS
+from data_access import Reader
+from enums import ExerciseName, RecoveryZone
+from resources.resources import PACE_FORMATTER, SHOE_FORMATTER
+from utils import m_to_km_or_mi, ms_to_min_km_or_min_mi, lbs_to_kg, busiest_tile
+
+
+def get_color(value, min_value=0, max_value=100, cmap_name="Reds"):
+    cmap = plt.get_cmap(cmap_name)
+    norm = plt.Normalize(min_value, max_value)
+    rgba = cmap(norm(value))
+    return rgb2hex(rgba)
+
+
+def date_categories(get: Callable, weekly: bool):
+    if weekly:
+        return [f"Wk {i + 1}" for i, _ in enumerate(get("week_start_dates"))]
+    return get("dates_str")
+
+
+def make_run_duration_distance_chart(reader: Reader, weekly: bool, imperial: bool):
+    return {
+        "legend": {
+            "data": [f"Distance ({'mi' if imperial else 'km'})", "Duration (min)"]
+        },
+        "xAxis": {
+            "type": "category",
+            "axisTick": {"alignWithLabel": True},
+            "data": date_categories(reader.get_tcx, weekly),
+        },
+        "yAxis": [
+            {
+                "type": "value",
+                "name": f"Distance ({'mi' if imperial else 'km'})",
+                "position": "left",
+                "alignTicks": True,
+                "axisLabel": {"formatter": "{value}" + f"{'mi' if imperial else 'km'}"},
+            },
+            {
+                "type": "value",
+                "name": "Duration (min)",
+                "position": "right",
+                "alignTicks": True,
+                "axisLabel": {"formatter": "{value} min"},
+            },
+        ],
+        "series": [
+            {
+                "name": f"Distance ({'mi' if imperial else 'km'})",
+                "data": [
+                    round(m_to_km_or_mi(d, imperial), 2)
+                    for d in reader.get_tcx(
+                        "run_distances_weekly" if weekly else "run_distances_daily"
+                    )
+                ],
+                "type": "line",
+                "yAxisIndex": 0,
+            },
+            {
+                "name": "Duration (min)",
+                "data": [
+                    round(d / 60, 2)
+                    for d in reader.get_tcx(
+                        "run_duration_weekly" if weekly else "run_duration_daily"
+                    )
+                ],
+                "type": "line",
+                "yAxisIndex": 1,
+            },
+        ],
+        "tooltip": {
+            "trigger": "axis",
+            "axisPointer": {"type": "cross"},
+        },
+    }
+
+
+def make_training_load_chart(reader: Reader, weekly: bool):
+    try:
+        training_load = reader.get_tcx(
+            "training_load_weekly" if weekly else "training_load_daily"
+        )
+    except KeyError:
+        # Data built before the training load was added
+        return None
+    return {
+        "legend": {"data": ["TRIMP", "Fitness (CTL)", "Fatigue (ATL)", "Form (TSB)"]},
+        "xAxis": {
+            "type": "category",
+            "axisTick": {"alignWithLabel": True},
+            "data": date_categories(reader.get_tcx, weekly),
+        },
+        "yAxis": [
+            {"type": "value", "name": "TRIMP", "position": "left"},
+            {"type": "value", "name": "CTL / ATL / TSB", "position": "right"},
+        ],
+        "series": [
+            {
+                "name": "TRIMP",
+                "data": [round(d, 1) for d in training_load["load"]],
+                "type": "bar",
+                "yAxisIndex": 0,
+                "itemStyle": {"color": "#D3D3D3"},
+            },
+            {
+                "name": "Fitness (CTL)",
+                "data": [round(d, 1) for d in training_load["ctl"]],
+                "type": "line",
+                "yAxisIndex": 1,
+                "itemStyle": {"color": "#1F77B4"},
+            },
+            {
+                "name": "Fatigue (ATL)",
+                "data": [round(d, 1) for d in training_load["atl"]],
+                "type": "line",
+                "yAxisIndex": 1,
+                "itemStyle": {"color": "#FF0026"},
+            },
+            {
+                "name": "Form (TSB)",
+                "data": [round(d, 1) for d in training_load["tsb"]],
+                "type": "line",
+                "yAxisIndex": 1,
+                "itemStyle": {"color": "#16EC06"},
+            },
+        ],
+        "tooltip": {
+            "trigger": "axis",
+            "axisPointer": {"type": "cross"},
+        },
+    }
+
+
+def make_heart_rate_zone_chart(reader: Reader, weekly: bool):
+    # Zones come with the data, as each athlete can have their own
+    zones = reader.get_tcx(
+        "heart_rate_zone_percentages_weekly"
+        if weekly
+        else "heart_rate_zone_percentages_daily"
+    )
+    return {
+        "tooltip": {"trigger": "axis", "axisPointer": {"type": "shadow"}},
+        "legend": {
+            "data": [zone for zone, _ in zones],
+        },
+        "grid": {"left": "3%", "right": "4%", "bottom": "3%", "containLabel": True},
+        "xAxis": {
+            "type": "category",
+            "data": date_categories(reader.get_tcx, weekly),
+        },
+        "yAxis": {"type": "value", "min": 0, "max": 100},
+        "series": [
+            {
+                "name": zone,
+                "type": "bar",
+                "stack": "total",
+                "itemStyle": {"color": get_color(i + 1, 0, len(zones), "Reds")},
+                "data": data,
+            }
+            for i, (zone, data) in enumerate(zones)
+        ],
+    }
+
+
+def make_pace_zone_chart(reader: Reader, weekly: bool, imperial: bool):
+    zones = reader.get_tcx(
+        "pace_zone_percentages_weekly" if weekly else "pace_zone_percentages_daily"
+    )
+    return {
+        "tooltip": {"trigger": "axis", "axisPointer": {"type": "shadow"}},
+        "legend": {
+            "data": [min_mi if imperial else min_km for min_mi, min_km, _ in zones],
+        },
+        "grid": {"left": "3%", "right": "4%", "bottom": "3%", "containLabel": True},
+        "xAxis": {
+            "type": "category",
+            "data": date_categories(reader.get_tcx, weekly),
+        },
+        "yAxis": {"type": "value", "min": 0, "max": 100},
+        "series": [
+            {
+                "name": min_mi if imperial else min_km,
+                "type": "bar",
+                "stack": "total",
+                "itemStyle": {"color": get_color(i + 1, 0, len(zones), "Blues")},
+                "data": data,
+            }
+            for i, (min_mi, min_km, data) in enumerate(zones)
+        ],
+    }
+
+
+def make_peak_chart(
+    reader: Reader, dataset_name: str, pretty_name: str, imperial: bool
+):
+    data = reader.get_tcx(dataset_name)
+    if dataset_name == "peak_pace":
+        y_values = [ms_to_min_km_or_min_mi(d, imperial) for d in data.values()]
+        categories = [
+            name for val, name in DISTANCE_NAMES.items() if val in data.keys()
+        ]
+        inverse = True
+        base_color = "Blues"
+        min_value = min(y_values)
+        max_value = max(y_values)
+        formatter = JsCode(PACE_FORMATTER).js_code
+    elif dataset_name == "peak_hr":
+        y_values = [d for d in data.values()]
+        categories = list(data.keys())
+        inverse = False
+        base_color = "Reds"
+        min_value = min(y_values) - 10
+        max_value = max(y_values) + 5
+        formatter = "{b}: {c} BPM"
+    else:
+        raise ValueError(f"Unknown dataset_name: {dataset_name}")
+
+    return {
+        "xAxis": {
+            "type": "category",
+            "data": categories,
+        },
+        "yAxis": {
+            "type": "value",
+            "name": pretty_name,
+            "inverse": inverse,
+            "min": math.floor(min_value),
+            "max": math.ceil(max_value),
+        },
+        "series": [
+            {
+                "data": [round(d, 2) for d in y_values],
+                "type": "line",
+                "itemStyle": {"color": get_color(4, 0, 5, base_color)},
+            }
+        ],
+        "tooltip": {"trigger": "axis", "formatter": formatter},
+    }
+
+
+def make_peak_pace_chart_by_month(reader: Reader, imperial: bool):
+    data = reader.get_tcx("peak_pace_monthly")
+
+    raw_categories = list(
+        set([int(item) for sublist in data.values() for item in sublist])
+    )
+    categories = [name for val, name in DISTANCE_NAMES.items() if val in raw_categories]
+    flat_values = [item for sublist in data.values() for item in sublist.values()]
+    months = [datetime(2024, int(month), 1).strftime("%B") for month in data.keys()]
+
+    slowest_pace = ms_to_min_km_or_min_mi(min(flat_values), imperial)
+    fastest_pace = ms_to_min_km_or_min_mi(max(flat_values), imperial)
+
+    return {
+        "xAxis": {
+            "type": "category",
+            "data": categories,
+        },
+        "legend": {
+            "data": [categories],
+        },
+        "grid": {"left": "3%", "right": "4%", "bottom": "3%", "containLabel": True},
+        "yAxis": {
+            "type": "value",
+            "name": "Pace (min/km)" if not imperial else "Pace (min/mi)",
+            "inverse": True,
+            "min": math.floor(fastest_pace),
+            "max": math.ceil(slowest_pace),
+        },
+        "series": [
+            {
+                "name": months[i],
+                "data": [
+                    round(ms_to_min_km_or_min_mi(d, imperial), 2) for d in y_values
+                ],
+                "type": "line",
+                "itemStyle": {"color": get_color(i + 1, 0, len(data.keys()), "Blues")},
+            }
+            for i, y_values in enumerate([d.values() for d in data.values()])
+        ],
+        "tooltip": {
+            "trigger": "axis",
+        },
+    }
+
+
+def make_heart_rate_pace_chart(reader: Reader):
+    selector = alt.selection_point(fields=["Month"], bind="legend")
+    return (
+        alt.Chart(
+            alt.Data(
+                values=[
+                    {"Month": t, "HR": hr, "Pace": p}
+                    for t, hr, p in reader.get_tcx("heart_rate_pace_data")
+                ]
+            )
+        )
+        .mark_circle(size=50)
+        .encode(
+            x="Pace:Q",
+            y="HR:Q",
+            color="Month:N",
+            opacity=alt.condition(selector, alt.value(1), alt.value(0.1)),
+        )
+        .add_params(selector)
+    )
+
+
+def make_shoe_chart(reader: Reader, imperial: bool):
+    data = reader.get_strava("distance_by_gear")
+    categories = [x.replace(" ", "\n") for x in data.keys()]
+    y_values = [round(m_to_km_or_mi(d, imperial), 2) for d in data.values()]
+    return {
+        "tooltip": {
+            "trigger": "axis",
+            "axisPointer": {"type": "shadow"},
+            "formatter": JsCode(SHOE_FORMATTER).js_code,
+        },
+        "grid": {"left": "3%", "right": "4%", "bottom": "3%", "containLabel": True},
+        "xAxis": {
+            "type": "category",
+            "data": categories,
+        },
+        "yAxis": {
+            "type": "value",
+            "min": 0,
+            "max": math.ceil(max(y_values)),
+        },
+        "series": [
+            {
+                "type": "bar",
+                "data": y_values,
+            }
+        ],
+    }
+
+
+def make_shoe_wear_chart(reader: Reader, weekly: bool, imperial: bool):
+    try:
+        data = reader.get_strava(
+            "gear_mileage_weekly" if weekly else "gear_mileage_daily"
+        )
+        retirement_distance = round(
+            m_to_km_or_mi(reader.get_strava("shoe_retirement_distance"), imperial), 2
+        )
+        dates = date_categories(reader.get_strava, weekly)
+    except KeyError:
+        # Data built before the gear mileage was added
+        return None
+    return {
+        "legend": {"data": list(data.keys())},
+        "tooltip": {"trigger": "axis"},
+        "grid": {"left": "3%", "right": "4%", "bottom": "3%", "containLabel": True},
+        "xAxis": {
+            "type": "category",
+            "data": dates,
+        },
+        "yAxis": {
+            "type": "value",
+            "name": f"Distance ({'mi' if imperial else 'km'})",
+        },
+        "series": [
+            {
+                "name": gear,
+                "type": "line",
+                "showSymbol": False,
+                "data": [
+                    round(m_to_km_or_mi(d, imperial), 2)
+                    for d in gear_mileage["cumulative_distance"]
+                ],
+                "markLine": {
+                    "silent": True,
+                    "symbol": "none",
+                    "lineStyle": {"type": "dashed", "color": "#FF0026"},
+                    "data": [{"yAxis": retirement_distance, "name": "Retire"}],
+                },
+            }
+            for gear, gear_mileage in data.items()
+        ],
+    }
+
+
+def make_strength_duration_volume_chart(reader: Reader, weekly: bool, imperial: bool):
+    return {
+        "legend": {
+            "data": [f"Volume ({'lbs' if imperial else 'kg'})", "Duration (min)"]
+        },
+        "xAxis": {
+            "type": "category",
+            "axisTick": {"alignWithLabel": True},
+            "data": date_categories(reader.get_hevy, weekly),
+        },
+        "yAxis": [
+            {
+                "type": "value",
+                "name": f"Volume ({'lbs' if imperial else 'kg'})",
+                "position": "left",
+                "alignTicks": True,
+                "axisLabel": {
+                    "formatter": "{value}" + f"{'lbs' if imperial else 'kg'}"
+                },
+            },
+            {
+                "type": "value",
+                "name": "Duration (min)",
+                "position": "right",
+                "alignTicks": True,
+                "axisLabel": {"formatter": "{value} min"},
+            },
+        ],
+        "series": [
+            {
+                "name": f"Volume ({'lbs' if imperial else 'kg'})",
+                "data": [
+                    round(d if imperial else lbs_to_kg(d), 2)
+                    for d in reader.get_hevy(
+                        "workout_volume_weekly" if weekly else "workout_volume_daily"
+                    )
+                ],
+                "type": "line",
+                "yAxisIndex": 0,
+            },
+            {
+                "name": "Duration (min)",
+                "data": [
+                    round(d / 60, 2)
+                    for d in reader.get_hevy(
+                        "workout_duration_weekly"
+                        if weekly
+                        else "workout_duration_daily"
+                    )
+                ],
+                "type": "line",
+                "yAxisIndex": 1,
+            },
+        ],
+        "tooltip": {
+            "trigger": "axis",
+            "axisPointer": {"type": "cross"},
+        },
+    }
+
+
+def make_one_rep_max_chart(reader: Reader, weekly: bool, imperial: bool):
+    return {
+        "legend": {"data": [v.value for v in ExerciseName]},
+        "xAxis": {
+            "type": "category",
+            "axisTick": {"alignWithLabel": True},
+            "data": date_categories(reader.get_hevy, weekly),
+        },
+        "yAxis": {
+            "type": "value",
+            "name": f"One Rep Max ({'lbs' if imperial else 'kg'})",
+            "position": "left",
+            "alignTicks": True,
+            "axisLabel": {"formatter": "{value}" + f"{'lbs' if imperial else 'kg'}"},
+        },
+        "series": [
+            {
+                "name": exercise,
+                "data": [round(d if imperial else lbs_to_kg(d), 2) for d in data],
+                "type": "line",
+            }
+            for exercise, data in reader.get_hevy(
+                "exercise_one_rep_max_monthly"
+                if weekly
+                else "exercise_one_rep_max_daily"
+            )
+        ],
+        "tooltip": {
+            "trigger": "axis",
+            "axisPointer": {"type": "cross"},
+        },
+    }
+
+
+def make_recovery_chart(reader: Reader, weekly: bool):
+    return {
+        "tooltip": {"trigger": "axis", "axisPointer": {"type": "shadow"}},
+        "legend": {
+            "data": [zone.value for zone in RecoveryZone],
+        },
+        "grid": {"left": "3%", "right": "4%", "bottom": "3%", "containLabel": True},
+        "xAxis": {
+            "type": "category",
+            "data": date_categories(reader.get_whoop, weekly),
+        },
+        "yAxis": {"type": "value", "min": 0, "max": 100, "name": "%"},
+        "series": [
+            {
+                "name": zone,
+                "type": "bar",
+                "stack": "total",
+                "itemStyle": {
+                    "color": {
+                        RecoveryZone.RED.name: "#FF0026",
+                        RecoveryZone.YELLOW.name: "#FFDE00",
+                        RecoveryZone.GREEN.name: "#16EC06",
+                    }[zone]
+                },
+                "data": [round(d, 2) for d in data],
+            }
+            for i, (zone, data) in enumerate(
+                reader.get_whoop(
+                    "avg_recovery_score_weekly"
+                    if weekly
+                    else "avg_recovery_score_daily"
+                )
+            )
+        ],
+    }
+
+
+def make_sleep_strain_chart(reader: Reader, weekly: bool):
+    return {
+        "legend": {
+            "data": [
+                "Sleep Performance",
+                "Day Strain",
+            ]
+        },
+        "xAxis": {
+            "type": "category",
+            "axisTick": {"alignWithLabel": True},
+            "data": date_categories(reader.get_whoop, weekly),
+            "axisLine": {
+                "onZero": False,
+                "show": True,
+            },
+        },
+        "yAxis": [
+            {
+                "type": "value",
+                "name": "Sleep\nPerformance",
+                "position": "left",
+                "alignTicks": True,
+                "axisLabel": {"formatter": "{value} %"},
+            },
+            {
+                "type": "value",
+                "name": "Day\nStrain",
+                "position": "right",
+                "alignTicks": True,
+                "axisLabel": {"formatter": "{value} min"},
+            },
+        ],
+        "series": [
+            {
+                "name": "Sleep Performance",
+                "data": [
+                    round(d, 2)
+                    for d in reader.get_whoop(
+                        "sleep_performance_weekly"
+                        if weekly
+                        else "sleep_performance_daily"
+                    )
+                ],
+                "type": "line",
+                "yAxisIndex": 0,
+                "itemStyle": {"color": "#7BA1BB"},
+            },
+            {
+                "name": "Day Strain",
+                "data": [
+                    round(d, 2)
+                    for d in reader.get_whoop(
+                        "day_strain_weekly" if weekly else "day_strain_daily"
+                    )
+                ],
+                "type": "line",
+                "yAxisIndex": 1,
+                "itemStyle": {"color": "#67AEE6"},
+            },
+        ],
+        "tooltip": {
+            "trigger": "axis",
+            "axisPointer": {"type": "cross"},
+        },
+        "grid": {"containLabel": True},
+    }
+
+
+def make_recovery_run_correlation_chart(reader: Reader):
+    try:
+        data = reader.get_recovery_run("correlations")
+    except KeyError:
+        # Data built before the recovery-run join was added
+        return None
+    whoop_features = list(dict.fromkeys(d[0] for d in data))
+    run_features = list(dict.fromkeys(d[1] for d in data))
+    return {
+        "tooltip": {"position": "top"},
+        "grid": {"left": "3%", "right": "4%", "bottom": "15%", "containLabel": True},
+        "xAxis": {
+            "type": "category",
+            "data": [f.replace("_", " ").capitalize() for f in run_features],
+            "axisLabel": {"rotate": 30},
+        },
+        "yAxis": {
+            "type": "category",
+            "data": [f.replace("_", " ").capitalize() for f in whoop_features],
+        },
+        "visualMap": {
+            "min": -1,
+            "max": 1,
+            "calculable": True,
+            "orient": "horizontal",
+            "left": "center",
+            "bottom": "0%",
+            "inRange": {"color": ["#FF0026", "#FFFFFF", "#16EC06"]},
+        },
+        "series": [
+            {
+                "type": "heatmap",
+                "data": [
+                    [
+                        run_features.index(run_feature),
+                        whoop_features.index(whoop_feature),
+                        round(r, 2) if r is not None else "-",
+                    ]
+                    for whoop_feature, run_feature, r, _ in data
+                ],
+                "label": {"show": True},
+            }
+        ],
+    }
+
+
+def make_heatmap_chart(
+    reader: Reader,
+    zoom: int,
+    center: tuple[int, int] | None = None,
+    view_tiles: int = 1,
+):
+    """
+    Show the tiles within `view_tiles` of the `center` tile (x, y) at the given
+    zoom, by default the busiest tile. Only that zoom level is loaded.
+    """
+    tiles = reader.get_heatmap_tiles(zoom)
+    if len(tiles) == 0:
+        return None
+    center_x, center_y = busiest_tile(tiles) if center is None else center
+    min_x = (center_x - view_tiles) * HEATMAP_TILE_CELLS
+    min_y = (center_y - view_tiles) * HEATMAP_TILE_CELLS
+    size = (2 * view_tiles + 1) * HEATMAP_TILE_CELLS
+
+    data = []
+    for tile, cells in tiles.items():
+        tile_x, tile_y = map(int, tile.split("/"))
+        if abs(tile_x - center_x) > view_tiles or abs(tile_y - center_y) > view_tiles:
+            continue
+        for cell, seconds in cells.items():
+            x = tile_x * HEATMAP_TILE_CELLS + int(cell) % HEATMAP_TILE_CELLS
+            y = tile_y * HEATMAP_TILE_CELLS + int(cell) // HEATMAP_TILE_CELLS
+            data.append([x - min_x, y - min_y, round(seconds / 60, 1)])
+
+    # Panned away from every run
+    minutes = sorted(d[2] for d in data) or [1]
+    return {
+        "tooltip": {"formatter": "{c} min"},
+        "grid": {"left": 0, "right": 0, "top": 0, "bottom": 40},
+        "xAxis": {"type": "category", "data": list(range(size)), "show": False},
+        "yAxis": {
+            "type": "category",
+            "data": list(range(size)),
+            "show": False,
+            "inverse": True,
+        },
+        "visualMap": {
+            "min": 0,
+            # Clip at the 95th percentile so a few busy cells don't wash out the rest
+            "max": minutes[int(len(minutes) * 0.95)],
+            "calculable": True,
+            "orient": "horizontal",
+            "left": "center",
+            "bottom": "0%",
+            "inRange": {"color": [get_color(i, 0, 4, "Reds") for i in range(1, 5)]},
+        },
+        "series": [{"type": "heatmap", "data": data}],
+    }
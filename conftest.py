@@ -0,0 +1,39 @@
+# Lets the tests import the top-level modules when run with plain `pytest`
+from datetime import datetime, timedelta
+
+import pytest
+
+
+@pytest.fixture
+def make_tcx():
+    """
+    TCX file contents of a run at a steady speed and a heart rate cycling
+    between 140 and 169 bpm.
+    """
+
+    def make_tcx(start: datetime, seconds=1200, speed=3.0):
+        start_time = f"{start.isoformat()}Z"
+        trackpoints = "".join(
+            f"<Trackpoint><Time>{(start + timedelta(seconds=t)).isoformat()}Z</Time>"
+            f"<Position><LatitudeDegrees>{52.5 + t * speed / 111000}</LatitudeDegrees>"
+            "<LongitudeDegrees>13.4</LongitudeDegrees></Position>"
+            f"<AltitudeMeters>30</AltitudeMeters><DistanceMeters>{t * speed}"
+            f"</DistanceMeters><HeartRateBpm><Value>{140 + t % 30}</Value>"
+            "</HeartRateBpm><Extensions><ns3:TPX><ns3:Speed>"
+            f"{speed}</ns3:Speed></ns3:TPX></Extensions></Trackpoint>"
+            for t in range(seconds)
+        )
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            "<TrainingCenterDatabase"
+            ' xmlns="http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2"'
+            ' xmlns:ns3="http://www.garmin.com/xmlschemas/ActivityExtension/v2">'
+            f'<Activities><Activity Sport="Running"><Id>{start_time}</Id>'
+            f'<Lap StartTime="{start_time}">'
+            f"<TotalTimeSeconds>{seconds}</TotalTimeSeconds>"
+            f"<DistanceMeters>{seconds * speed}</DistanceMeters>"
+            f"<Calories>300</Calories><Track>{trackpoints}</Track></Lap>"
+            "</Activity></Activities></TrainingCenterDatabase>"
+        )
+
+    return make_tcx
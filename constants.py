@@ -2,6 +2,13 @@ from datetime import datetime
 
 PLAN_START_DATE = datetime(2024, 7, 1)
 SLOWEST_SUPPORTED_PACE = 15
+PACE_AT_HEART_RATE = 150
+PACE_AT_HEART_RATE_TOLERANCE = 5
+SHOE_RETIREMENT_DISTANCE = 800000  # m, roughly 500 mi
+RESTING_HEART_RATE = 50
+MAX_HEART_RATE = 197
+ATL_DAYS = 7  # time constant of fatigue (acute training load)
+CTL_DAYS = 42  # time constant of fitness (chronic training load)
 DURATIONS = [5, 10, 12, 20, 30, 60, 120, 360, 600, 720, 1800, 3600, 5400]
 DISTANCE_NAMES = {
     800: "800 m",
@@ -14,3 +21,12 @@ DISTANCE_NAMES = {
     30000: "30 km",
     42195: "M",
 }
+PAUSE_GAP_SECONDS = 15  # gaps between trackpoints longer than this are pauses
+PAUSE_SPEED = 0.5  # m/s, slower than this counts as standing still
+TIME_GRID_STEP = 1  # s, resolution of the uniform time grid
+DISTANCE_GRID_STEP = 10  # m, resolution of the uniform distance grid
+GRADE_SMOOTHING_DISTANCE = 50  # m, elevation is averaged over this distance
+MAX_GRADE = 0.45  # grades are clipped to the range of the energy cost model
+HEATMAP_MIN_ZOOM = 8
+HEATMAP_MAX_ZOOM = 16
+HEATMAP_TILE_CELLS = 32  # cells per tile side, i.e. 8 px cells on 256 px tiles
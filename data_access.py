@@ -1,23 +1,103 @@
+import argparse
 import json
+import multiprocessing
+import os
+import sys
+import threading
+import traceback
+from collections import OrderedDict
+from concurrent.futures import (
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+)
+from datetime import datetime, time, timedelta
+from typing import Callable
 
-from data_utils import TcxUtils, HevyUtils, StravaUtils, WhoopUtils
-from enums import HeartRateZone, PaceZone, ExerciseName, RecoveryZone
-from utils import date_to_str
+from data_utils import (
+    TcxUtils,
+    HevyUtils,
+    StravaUtils,
+    WhoopUtils,
+    RecoveryRunJoin,
+    StravaStreamUtils,
+)
+from constants import SHOE_RETIREMENT_DISTANCE
+from enums import ExerciseName, RecoveryZone
+from memo import MemoStore
+from models.athlete import Athlete, DEFAULT_ATHLETE, athlete_ids
+from models.whoop import WhoopCycle
+from utils import (
+    date_to_str,
+    get_first_day_of_week,
+    get_list_of_dates_between,
+    histogram_zone_percentages,
+)
 
-APP_DATA = "data/app_data.json"
+# Relative to the athlete's data directory
+APP_DATA = "app_data.json"
+HEATMAP_DIR = "heatmap"
+# Memory the dashboard may spend on loaded athletes' data
+READER_MEMORY_BUDGET = 512 * 1024**2
 TCX_PREFIX = "tcx__"
 HEVY_PREFIX = "hevy__"
 STRAVA_PREFIX = "strava__"
 WHOOP_PREFIX = "whoop__"
+RECOVERY_RUN_PREFIX = "recovery_run__"
+SOURCES = ["tcx", "hevy", "strava", "whoop"]
+# How a series is indexed. Only daily and weekly series (and their calendars)
+# can be recomputed for a date window; everything else (period None) is
+# recomputed over the full history.
+CALENDAR = "calendar"
+DAILY = "daily"
+WEEKLY = "weekly"
+DATED = {CALENDAR, DAILY, WEEKLY}
+# Per-period statistics that have no value (None) for periods without data
+STATISTICS = {"mean", "min", "max"}
+# Running totals, which keep the previous period's value for periods without data
+CUMULATIVE = {"cumulative_distance"}
+PREFIXES = {
+    "tcx": TCX_PREFIX,
+    "hevy": HEVY_PREFIX,
+    "strava": STRAVA_PREFIX,
+    "whoop": WHOOP_PREFIX,
+    "recovery_run": RECOVERY_RUN_PREFIX,
+}
+
+
+def heatmap_file(zoom: int, athlete: Athlete = DEFAULT_ATHLETE):
+    return athlete.path(HEATMAP_DIR, f"{zoom}.json")
+
+
+def _deep_size(value):
+    """
+    Approximate memory held by parsed JSON (dicts, lists and scalars).
+    """
+    size = 0
+    stack = [value]
+    while stack:
+        value = stack.pop()
+        size += sys.getsizeof(value)
+        if isinstance(value, dict):
+            stack.extend(value.keys())
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return size
 
 
 class Reader:
-    def __init__(self):
-        self.data = self.read_json()
+    def __init__(self, athlete: Athlete = DEFAULT_ATHLETE):
+        self.athlete = athlete
+        self.data = self.read_json(athlete)
+        self._heatmap_tiles = {}
+        # Measured once, and grown as heatmap zoom levels are loaded
+        self.memory_size = _deep_size(self.data)
 
     @staticmethod
-    def read_json():
-        with open(APP_DATA, "r") as file:
+    def read_json(athlete: Athlete = DEFAULT_ATHLETE):
+        with open(athlete.path(APP_DATA), "r") as file:
             return json.load(file)
 
     def get_tcx(self, key):
@@ -36,188 +116,764 @@ class Reader:
         key = key if key.startswith(WHOOP_PREFIX) else WHOOP_PREFIX + key
         return self.data[key]
 
+    def get_recovery_run(self, key):
+        key = key if key.startswith(RECOVERY_RUN_PREFIX) else RECOVERY_RUN_PREFIX + key
+        return self.data[key]
+
+    def get_heatmap_tiles(self, zoom: int):
+        """
+        Heatmap tiles of one zoom level, {"x/y": {cell: seconds}}. Zoom levels
+        are read from disk only when first requested.
+        """
+        if zoom not in self._heatmap_tiles:
+            if not os.path.exists(heatmap_file(zoom, self.athlete)):
+                return {}
+            with open(heatmap_file(zoom, self.athlete), "r") as file:
+                self._heatmap_tiles[zoom] = json.load(file)
+            self.memory_size += _deep_size(self._heatmap_tiles[zoom])
+        return self._heatmap_tiles[zoom]
+
+    def get_heart_rate_zone_percentages(
+        self, zones: list[tuple[str, int, int]], weekly=False
+    ):
+        """
+        Zone percentages for arbitrary zones, e.g. [("Easy", 0, 150), ...],
+        computed from the stored heart rate histograms.
+        """
+        histograms = self.get_tcx(
+            "heart_rate_histogram_weekly" if weekly else "heart_rate_histogram_daily"
+        )
+        return histogram_zone_percentages(histograms, zones)
+
+    def get_pace_zone_percentages(
+        self, zones: list[tuple[str, float, float]], weekly=False
+    ):
+        """
+        Zone percentages for arbitrary speed zones in m/s, e.g.
+        [("Easy", 0, 3.2), ...], computed from the stored speed histograms.
+        """
+        histograms = self.get_tcx(
+            "speed_histogram_weekly" if weekly else "speed_histogram_daily"
+        )
+        return histogram_zone_percentages(histograms, zones)
+
+
+class ReaderRegistry:
+    """
+    Readers of recently viewed athletes, kept while their data fits into
+    `max_bytes`; the least recently used are dropped first. The newest one
+    is always kept, even if it alone exceeds the budget.
+
+    Athletes are loaded outside of the registry's lock, so a slow load only
+    holds up the sessions waiting for that same athlete.
+    """
+
+    def __init__(self, max_bytes=READER_MEMORY_BUDGET):
+        self.max_bytes = max_bytes
+        self._readers: OrderedDict[str, Reader] = OrderedDict()
+        self._loading: dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def get(self, athlete_id: str) -> Reader:
+        with self._lock:
+            if athlete_id in self._readers:
+                self._readers.move_to_end(athlete_id)
+                # Its heatmap tiles may have grown since it was last used
+                self._evict()
+                return self._readers[athlete_id]
+            loading = self._loading.get(athlete_id)
+            if loading is None:
+                future = self._loading[athlete_id] = Future()
+        if loading is not None:
+            return loading.result()
+
+        try:
+            reader = Reader(Athlete.load(athlete_id))
+        except BaseException as e:
+            with self._lock:
+                del self._loading[athlete_id]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._loading[athlete_id]
+            self._readers[athlete_id] = reader
+            self._evict()
+        future.set_result(reader)
+        return reader
+
+    def _evict(self):
+        while (
+            len(self._readers) > 1
+            and sum(r.memory_size for r in self._readers.values()) > self.max_bytes
+        ):
+            self._readers.popitem(last=False)
+
 
 class Writer:
-    def __init__(self):
+    def __init__(
+        self,
+        use_strava_streams=False,
+        since: datetime = None,
+        until: datetime = None,
+        keys: list[str] = None,
+        grade_adjusted=False,
+        athlete: Athlete = DEFAULT_ATHLETE,
+        streaming=False,
+    ):
         self.data = {}
-        self.tcx_utils = TcxUtils()
-        self.hevy_utils = HevyUtils()
-        self.strava_utils = StravaUtils()
-        self.whoop_utils = WhoopUtils()
+        self.periods = {}
+        self.athlete = athlete
+        self.use_strava_streams = use_strava_streams
+        self.grade_adjusted = grade_adjusted
+        self.streaming = streaming
+        # Date windows are widened to whole weeks so that weekly series are
+        # never computed from a partial week.
+        self.since = None
+        self.until = None
+        if since is not None or until is not None:
+            self.since = datetime.combine(
+                get_first_day_of_week(since or athlete.plan_start_date), time()
+            )
+            self.until = datetime.combine(
+                get_first_day_of_week(until or datetime.now()) + timedelta(days=7),
+                time(),
+            )
+        self.keys = self._normalize_keys(keys) if keys is not None else None
+        # Periods of the series to compute; None for all of them
+        self.periods_to_build: set | None = None
+        self.failed_sources = []
+        tcx_utils_class = StravaStreamUtils if use_strava_streams else TcxUtils
+        # The memo store is shared: its keys include every athlete setting used
+        self.tcx_utils = tcx_utils_class(
+            MemoStore(), grade_adjusted, athlete, streaming=streaming
+        )
+        self.hevy_utils = HevyUtils(athlete)
+        self.strava_utils = StravaUtils(athlete)
+        self.whoop_utils = WhoopUtils(athlete)
+
+    @staticmethod
+    def _normalize_keys(keys: list[str]):
+        # Keys may be given without their source prefix
+        return {
+            prefix + key if not key.startswith(prefix) else key
+            for key in keys
+            for prefix in PREFIXES.values()
+        }
+
+    @property
+    def is_partial(self):
+        return self.since is not None or self.keys is not None
+
+    def _writer_args(self):
+        return {
+            "use_strava_streams": self.use_strava_streams,
+            "since": self.since,
+            "until": self.until - timedelta(days=1) if self.until else None,
+            "keys": list(self.keys) if self.keys is not None else None,
+            "grade_adjusted": self.grade_adjusted,
+            "athlete": self.athlete,
+            "streaming": self.streaming,
+        }
+
+    def load_source(self, source: str):
+        getattr(self, f"{source}_utils").load_data()
+
+    def restrict_to_window(self, source: str):
+        getattr(self, f"{source}_utils").restrict_to_window(self.since, self.until)
+
+    def is_empty(self, source: str):
+        utils = getattr(self, f"{source}_utils")
+        return len(utils.data_period_start_times()) == 0
+
+    def process_source(self, source: str):
+        getattr(self, f"_process_{source}")()
 
-    def load_data(self):
-        self.tcx_utils.load_data()
-        self.hevy_utils.load_data()
-        self.strava_utils.load_data()
-        self.whoop_utils.load_data()
+    def build(self, sources: list[str] = SOURCES, max_workers=None):
+        """
+        Load and process the given sources, each in its own worker process. A
+        source that fails doesn't stop the others; its series from the previous
+        build are kept instead, if there are any.
 
-    def process_data(self):
-        # TCX Data
+        For partial builds (a date window, a subset of keys or of sources) the
+        recomputed series are merged into the previous build.
+        """
+        previous = (
+            Reader.read_json(self.athlete)
+            if os.path.exists(self.athlete.path(APP_DATA))
+            else {}
+        )
+        partial = self.is_partial or set(sources) != set(SOURCES)
+        if partial:
+            self.data = dict(previous)
+
+        built_sources = []
+        join_inputs = {}
+        # Builds may run in threads (build_athletes, the sync daemon), and
+        # forking a multithreaded process can copy locks held by other threads
+        with ProcessPoolExecutor(
+            max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            futures = {
+                executor.submit(_build_source, source, self._writer_args()): source
+                for source in sources
+            }
+            for future in as_completed(futures):
+                source = futures[future]
+                result = self._isolated(source, future.result)
+                if result is None:
+                    continue
+                data, periods, join_inputs[source] = result
+                built_sources.append(source)
+                if self.is_partial:
+                    self._merge(PREFIXES[source], data, periods)
+                else:
+                    self.data.update(data)
+
+        if "tcx" in join_inputs and "whoop" in join_inputs:
+            self._isolated(
+                "recovery_run",
+                self._process_recovery_run,
+                join_inputs["tcx"],
+                join_inputs["whoop"],
+            )
+        elif "tcx" in sources and "whoop" in sources:
+            self.failed_sources.append("recovery_run")
+
+        if not partial and len(self.failed_sources) > 0:
+            self._keep_previous_data(previous, self.failed_sources)
+
+    def _merge(self, prefix: str, data: dict, periods: dict):
+        """
+        Merge a partial build of one source into the previous build. Daily and
+        weekly series are spliced in by date, and series that weren't
+        recomputed are realigned to the merged calendars.
+        """
+        calendars = {DAILY: prefix + "dates_str", WEEKLY: prefix + "week_start_dates"}
+        if any(k not in data or k not in self.data for k in calendars.values()):
+            self.data.update(data)
+            return
+        for period, calendar_key in calendars.items():
+            old_dates = self.data[calendar_key]
+            new_dates = data[calendar_key]
+            dates = [
+                date_to_str(d)
+                for d in get_list_of_dates_between(
+                    datetime.fromisoformat(min(old_dates[0], new_dates[0])),
+                    datetime.fromisoformat(max(old_dates[-1], new_dates[-1])),
+                    1 if period == DAILY else 7,
+                )
+            ]
+            for key, key_period in periods.items():
+                if key_period != period:
+                    continue
+                if key in self.data or key in data:
+                    self.data[key] = _splice_by_date(
+                        self.data.get(key), data.get(key), old_dates, new_dates, dates
+                    )
+            self.data[calendar_key] = dates
+        self.data.update({k: v for k, v in data.items() if periods[k] not in DATED})
+
+    def _isolated(self, source: str, func: Callable, *args):
+        try:
+            return func(*args)
+        except Exception:
+            print(f"Failed to build {source} data:\n{traceback.format_exc()}")
+            self.failed_sources.append(source)
+            return None
+
+    def join_inputs(self, source: str):
+        if source == "tcx":
+            return self.tcx_utils.run_features()
+        if source == "whoop":
+            return self.whoop_utils.cycles
+        return None
+
+    def _keep_previous_data(self, previous: dict, sources: list[str]):
+        prefixes = tuple(PREFIXES[source] for source in sources)
+        for key, value in previous.items():
+            if key.startswith(prefixes):
+                self.data[key] = value
+
+    def _process_tcx(self):
         self._add_tcx(
             "week_start_dates",
-            [date_to_str(d) for d in self.tcx_utils.week_start_dates()],
+            lambda: [date_to_str(d) for d in self.tcx_utils.week_start_dates()],
+            CALENDAR,
+        )
+        self._add_tcx("dates_str", self.tcx_utils.dates_str, CALENDAR)
+        self._add_tcx("total_run_distance", self.tcx_utils.total_run_distance)
+        self._add_tcx("total_run_elevation", self.tcx_utils.total_run_elevation)
+        self._add_tcx("total_run_calories", self.tcx_utils.total_run_calories)
+        self._add_tcx(
+            "run_distances_daily",
+            lambda: self.tcx_utils.run_distances(weekly=False),
+            DAILY,
+        )
+        self._add_tcx(
+            "run_distances_weekly",
+            lambda: self.tcx_utils.run_distances(weekly=True),
+            WEEKLY,
+        )
+        self._add_tcx(
+            "run_duration_daily",
+            lambda: self.tcx_utils.run_duration(weekly=False),
+            DAILY,
+        )
+        self._add_tcx(
+            "run_duration_weekly",
+            lambda: self.tcx_utils.run_duration(weekly=True),
+            WEEKLY,
+        )
+        self._add_tcx(
+            "heart_rate_histogram_daily",
+            lambda: self.tcx_utils.heart_rate_histograms(weekly=False),
+            DAILY,
+        )
+        self._add_tcx(
+            "heart_rate_histogram_weekly",
+            lambda: self.tcx_utils.heart_rate_histograms(weekly=True),
+            WEEKLY,
+        )
+        self._add_tcx(
+            "speed_histogram_daily",
+            lambda: self.tcx_utils.speed_histograms(weekly=False),
+            DAILY,
+        )
+        self._add_tcx(
+            "speed_histogram_weekly",
+            lambda: self.tcx_utils.speed_histograms(weekly=True),
+            WEEKLY,
         )
-        self._add_tcx("dates_str", self.tcx_utils.dates_str())
-        self._add_tcx("total_run_distance", self.tcx_utils.total_run_distance())
-        self._add_tcx("total_run_elevation", self.tcx_utils.total_run_elevation())
-        self._add_tcx("total_run_calories", self.tcx_utils.total_run_calories())
-        self._add_tcx("run_distances_daily", self.tcx_utils.run_distances(weekly=False))
-        self._add_tcx("run_distances_weekly", self.tcx_utils.run_distances(weekly=True))
-        self._add_tcx("run_duration_daily", self.tcx_utils.run_duration(weekly=False))
-        self._add_tcx("run_duration_weekly", self.tcx_utils.run_duration(weekly=True))
         self._add_tcx(
             "heart_rate_zone_percentages_daily",
-            [
-                (
-                    zone.value,
-                    self.tcx_utils.get_heart_rate_zone_percentages(
-                        zone=zone, weekly=False
-                    ),
-                )
-                for zone in HeartRateZone
-            ],
+            lambda: self.tcx_utils.heart_rate_zone_percentages(weekly=False),
+            DAILY,
         )
         self._add_tcx(
             "heart_rate_zone_percentages_weekly",
-            [
-                (
-                    zone.value,
-                    self.tcx_utils.get_heart_rate_zone_percentages(
-                        zone=zone, weekly=True
-                    ),
-                )
-                for zone in HeartRateZone
-            ],
+            lambda: self.tcx_utils.heart_rate_zone_percentages(weekly=True),
+            WEEKLY,
         )
         self._add_tcx(
             "pace_zone_percentages_daily",
-            [
-                (
-                    zone.min_mi,
-                    zone.min_km,
-                    self.tcx_utils.get_pace_zone_percentages(zone=zone, weekly=False),
-                )
-                for zone in PaceZone
-            ],
+            lambda: self.tcx_utils.pace_zone_percentages(weekly=False),
+            DAILY,
         )
         self._add_tcx(
             "pace_zone_percentages_weekly",
-            [
-                (
-                    zone.min_mi,
-                    zone.min_km,
-                    self.tcx_utils.get_pace_zone_percentages(zone=zone, weekly=True),
-                )
-                for zone in PaceZone
-            ],
+            lambda: self.tcx_utils.pace_zone_percentages(weekly=True),
+            WEEKLY,
         )
-        self._add_tcx("peak_hr", self.tcx_utils.get_peak_data("heart_rate"))
-        self._add_tcx("peak_pace", self.tcx_utils.get_peak_data("pace"))
-        self._add_tcx("peak_pace_monthly", self.tcx_utils.get_peak_data("pace", True))
-        self._add_tcx("heart_rate_pace_data", self.tcx_utils.get_heart_rate_pace_data())
+        self._add_tcx("peak_hr", lambda: self.tcx_utils.get_peak_data("heart_rate"))
+        self._add_tcx("peak_pace", lambda: self.tcx_utils.get_peak_data("pace"))
+        self._add_tcx(
+            "peak_pace_monthly", lambda: self.tcx_utils.get_peak_data("pace", True)
+        )
+        self._add_tcx("heart_rate_pace_data", self.tcx_utils.get_heart_rate_pace_data)
+        self._add_tcx(
+            "training_load_daily",
+            lambda: self.tcx_utils.training_load(weekly=False),
+            DAILY,
+        )
+        self._add_tcx(
+            "training_load_weekly",
+            lambda: self.tcx_utils.training_load(weekly=True),
+            WEEKLY,
+        )
+        # Written to HEATMAP_DIR, one file per zoom level, instead of APP_DATA
+        self._add_tcx("heatmap_tiles", self.tcx_utils.heatmap_tiles)
 
-        # Hevy data
+    def _process_hevy(self):
         self._add_hevy(
             "week_start_dates",
-            [date_to_str(d) for d in self.hevy_utils.week_start_dates()],
+            lambda: [date_to_str(d) for d in self.hevy_utils.week_start_dates()],
+            CALENDAR,
         )
-        self._add_hevy("dates_str", self.hevy_utils.dates_str())
+        self._add_hevy("dates_str", self.hevy_utils.dates_str, CALENDAR)
         self._add_hevy(
-            "workout_volume_daily", self.hevy_utils.workout_volume(weekly=False)
+            "workout_volume_daily",
+            lambda: self.hevy_utils.workout_volume(weekly=False),
+            DAILY,
         )
         self._add_hevy(
-            "workout_volume_weekly", self.hevy_utils.workout_volume(weekly=True)
+            "workout_volume_weekly",
+            lambda: self.hevy_utils.workout_volume(weekly=True),
+            WEEKLY,
         )
         self._add_hevy(
-            "workout_duration_daily", self.hevy_utils.workout_duration(weekly=False)
+            "workout_duration_daily",
+            lambda: self.hevy_utils.workout_duration(weekly=False),
+            DAILY,
         )
         self._add_hevy(
-            "workout_duration_weekly", self.hevy_utils.workout_duration(weekly=True)
+            "workout_duration_weekly",
+            lambda: self.hevy_utils.workout_duration(weekly=True),
+            WEEKLY,
         )
         self._add_hevy(
             "exercise_one_rep_max_daily",
-            [
+            lambda: [
                 (
                     exercise.value,
                     self.hevy_utils.exercise_one_rep_max(exercise.value, weekly=False),
                 )
                 for exercise in ExerciseName
             ],
+            DAILY,
         )
         self._add_hevy(
             "exercise_one_rep_max_monthly",
-            [
+            lambda: [
                 (
                     exercise.value,
                     self.hevy_utils.exercise_one_rep_max(exercise.value, weekly=True),
                 )
                 for exercise in ExerciseName
             ],
+            WEEKLY,
         )
 
-        # Strava Data
-        self._add_strava("distance_by_gear", self.strava_utils.distance_by_gear())
+    def _process_strava(self):
+        self._add_strava(
+            "week_start_dates",
+            lambda: [date_to_str(d) for d in self.strava_utils.week_start_dates()],
+            CALENDAR,
+        )
+        self._add_strava("dates_str", self.strava_utils.dates_str, CALENDAR)
+        self._add_strava("distance_by_gear", self.strava_utils.distance_by_gear)
+        self._add_strava("gear_mileage_daily", self.strava_utils.gear_mileage, DAILY)
+        self._add_strava(
+            "gear_mileage_weekly",
+            lambda: self.strava_utils.gear_mileage(weekly=True),
+            WEEKLY,
+        )
+        self._add_strava("shoe_retirement_distance", lambda: SHOE_RETIREMENT_DISTANCE)
 
-        # Whoop Data
+    def _process_whoop(self):
         self._add_whoop(
             "week_start_dates",
-            [date_to_str(d) for d in self.whoop_utils.week_start_dates()],
+            lambda: [date_to_str(d) for d in self.whoop_utils.week_start_dates()],
+            CALENDAR,
         )
-        self._add_whoop("dates_str", self.whoop_utils.dates_str())
+        self._add_whoop("dates_str", self.whoop_utils.dates_str, CALENDAR)
         self._add_whoop(
             "avg_recovery_score_daily",
-            [
+            lambda: [
                 (
                     zone.name,
                     self.whoop_utils.avg_recovery_score(zone=zone, weekly=False),
                 )
                 for zone in RecoveryZone
             ],
+            DAILY,
         )
         self._add_whoop(
             "avg_recovery_score_weekly",
-            [
+            lambda: [
                 (
                     zone.name,
                     self.whoop_utils.avg_recovery_score(zone=zone, weekly=True),
                 )
                 for zone in RecoveryZone
             ],
+            WEEKLY,
+        )
+        self._add_whoop("day_strain_daily", self.whoop_utils.day_strain, DAILY)
+        self._add_whoop(
+            "day_strain_weekly",
+            lambda: self.whoop_utils.day_strain(weekly=True),
+            WEEKLY,
+        )
+        self._add_whoop(
+            "sleep_performance_daily",
+            self.whoop_utils.sleep_performance,
+            DAILY,
+        )
+        self._add_whoop(
+            "sleep_performance_weekly",
+            lambda: self.whoop_utils.sleep_performance(weekly=True),
+            WEEKLY,
+        )
+        self._add_whoop(
+            "asleep_duration_daily", self.whoop_utils.asleep_duration, DAILY
         )
-        self._add_whoop("day_strain_daily", self.whoop_utils.day_strain())
-        self._add_whoop("day_strain_weekly", self.whoop_utils.day_strain(weekly=True))
-        self._add_whoop("sleep_performance_daily", self.whoop_utils.sleep_performance())
         self._add_whoop(
-            "sleep_performance_weekly", self.whoop_utils.sleep_performance(weekly=True)
+            "asleep_duration_weekly",
+            lambda: self.whoop_utils.asleep_duration(weekly=True),
+            WEEKLY,
         )
-        self._add_whoop("asleep_duration_daily", self.whoop_utils.asleep_duration())
+        self._add_whoop("cycle_metrics_daily", self.whoop_utils.cycle_metrics, DAILY)
         self._add_whoop(
-            "asleep_duration_weekly", self.whoop_utils.asleep_duration(weekly=True)
+            "cycle_metrics_weekly",
+            lambda: self.whoop_utils.cycle_metrics(weekly=True),
+            WEEKLY,
         )
 
+    def _process_recovery_run(self, runs: list[dict], cycles: list[WhoopCycle]):
+        recovery_run_join = RecoveryRunJoin(runs, cycles, self.athlete.heart_rate_zones)
+        self._add_recovery_run("features", lambda: recovery_run_join.run_features())
+        self._add_recovery_run("correlations", lambda: recovery_run_join.correlations())
+
     def write_json(self):
-        with open(APP_DATA, "w", encoding="utf-8") as f:
-            json.dump(self.data, f, ensure_ascii=False, indent=4)
+        heatmap_key = TCX_PREFIX + "heatmap_tiles"
+        data = {k: v for k, v in self.data.items() if k != heatmap_key}
+        with open(self.athlete.path(APP_DATA), "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=4)
+        if heatmap_key in self.data:
+            self.write_heatmap(self.data[heatmap_key])
 
-    def _add_tcx(self, key, value):
-        key = key if key.startswith(TCX_PREFIX) else TCX_PREFIX + key
-        self.data[key] = value
+    def write_heatmap(self, pyramid: dict):
+        os.makedirs(self.athlete.path(HEATMAP_DIR), exist_ok=True)
+        for zoom, tiles in pyramid.items():
+            with open(heatmap_file(zoom, self.athlete), "w", encoding="utf-8") as f:
+                json.dump(tiles, f)
 
-    def _add_hevy(self, key, value):
-        key = key if key.startswith(HEVY_PREFIX) else HEVY_PREFIX + key
-        self.data[key] = value
+    def _add(self, prefix, key, value_func: Callable, period=None):
+        """
+        Publish a series unless it's filtered out by `keys` or its period
+        isn't one of `periods_to_build`. Calendars are always published, so
+        that they match the dated series that are.
+        """
+        key = key if key.startswith(prefix) else prefix + key
+        self.periods[key] = period
+        if self.keys is not None and key not in self.keys and period != CALENDAR:
+            return
+        if self.periods_to_build is not None and period not in self.periods_to_build:
+            return
+        self.data[key] = value_func()
 
-    def _add_strava(self, key, value):
-        key = key if key.startswith(STRAVA_PREFIX) else STRAVA_PREFIX + key
-        self.data[key] = value
+    def _add_tcx(self, key, value_func: Callable, period=None):
+        self._add(TCX_PREFIX, key, value_func, period)
 
-    def _add_whoop(self, key, value):
-        key = key if key.startswith(WHOOP_PREFIX) else WHOOP_PREFIX + key
-        self.data[key] = value
+    def _add_hevy(self, key, value_func: Callable, period=None):
+        self._add(HEVY_PREFIX, key, value_func, period)
 
+    def _add_strava(self, key, value_func: Callable, period=None):
+        self._add(STRAVA_PREFIX, key, value_func, period)
 
-if __name__ == "__main__":
+    def _add_whoop(self, key, value_func: Callable, period=None):
+        self._add(WHOOP_PREFIX, key, value_func, period)
+
+    def _add_recovery_run(self, key, value_func: Callable, period=None):
+        self._add(RECOVERY_RUN_PREFIX, key, value_func, period)
+
+
+def _build_source(source: str, writer_args: dict):
+    """
+    Load and process a single source. Runs in a worker process, so only the
+    published series and the inputs of the cross-source join are returned.
+    """
+    writer = Writer(**writer_args)
+    writer.load_source(source)
+    if writer.is_empty(source):
+        # Not a failure; the join just has nothing to match for this source
+        print(f"No {source} data")
+        return {}, {}, writer.join_inputs(source)
+    join_inputs = writer.join_inputs(source)
+    if writer.since is not None:
+        # Series that need the full history first, then the dated ones for
+        # the window only
+        writer.periods_to_build = {None}
+        writer.process_source(source)
+        writer.restrict_to_window(source)
+        writer.periods_to_build = DATED
+        if writer.is_empty(source):
+            print(f"No {source} data in the selected window")
+            return writer.data, writer.periods, join_inputs
+    writer.process_source(source)
+    return writer.data, writer.periods, join_inputs
+
+
+def series_keys():
+    """
+    Keys of every series the Writer publishes, found without loading or
+    computing anything.
+    """
     writer = Writer()
-    writer.load_data()
-    writer.process_data()
+    writer.periods_to_build = set()
+    for source in SOURCES:
+        writer.process_source(source)
+    writer._process_recovery_run([], [])
+    return set(writer.periods)
+
+
+def _build_athlete(athlete: Athlete, sources: list[str], writer_args: dict):
+    writer = Writer(athlete=athlete, **writer_args)
+    writer.build(sources=sources)
     writer.write_json()
+    return writer.failed_sources
+
+
+def build_athletes(
+    athletes: list[Athlete],
+    sources: list[str] = SOURCES,
+    max_workers=None,
+    **writer_args,
+):
+    """
+    Rebuild several athletes at once, up to `max_workers` at a time. Each
+    build already runs its sources in worker processes, so a thread per
+    athlete is enough. Returns the failed sources by athlete id.
+    """
+    failed = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(_build_athlete, athlete, sources, writer_args): athlete
+            for athlete in athletes
+        }
+        for future in as_completed(futures):
+            athlete_id = futures[future].athlete_id
+            try:
+                failed_sources = future.result()
+            except Exception:
+                print(f"Failed to build {athlete_id}:\n{traceback.format_exc()}")
+                failed_sources = sources
+            if len(failed_sources) > 0:
+                failed[athlete_id] = failed_sources
+    return failed
+
+
+def _splice_by_date(old, new, old_dates, new_dates, dates, fill=0, carry=False):
+    """
+    Merge a series computed for a date window into the same series computed
+    before, aligning both on `dates`. Nested lists/dicts (e.g. one series per
+    zone) are merged element-wise; per-date dicts (e.g. histograms) are
+    taken whole.
+
+    Dates that neither series covers get the value of a day without data:
+    {} in series of dicts, None in series of statistics (see STATISTICS or
+    series that already hold None), the previous date's value in running
+    totals (see CUMULATIVE, or `carry`) and `fill` in series of totals.
+    """
+
+    def is_series(value, value_dates):
+        return (
+            isinstance(value, list)
+            and len(value) == len(value_dates)
+            and all(v is None or isinstance(v, (int, float, dict)) for v in value)
+        )
+
+    if is_series(new, new_dates) or (new is None and is_series(old, old_dates)):
+        by_date = dict(zip(old_dates, old)) if is_series(old, old_dates) else {}
+        if new is not None:
+            by_date.update(zip(new_dates, new))
+        if any(isinstance(v, dict) for v in by_date.values()):
+            return [by_date.get(d, {}) for d in dates]
+        if any(v is None for v in by_date.values()):
+            fill = None
+        if carry:
+            spliced = []
+            for d in dates:
+                fill = by_date.get(d, fill)
+                spliced.append(fill)
+            return spliced
+        return [by_date.get(d, fill) for d in dates]
+    if isinstance(new, dict) or isinstance(old, dict):
+        old = old if isinstance(old, dict) else {}
+        new = new if isinstance(new, dict) else {}
+        return {
+            k: _splice_by_date(
+                old.get(k),
+                new.get(k),
+                old_dates,
+                new_dates,
+                dates,
+                None if k in STATISTICS else fill,
+                k in CUMULATIVE,
+            )
+            for k in {**old, **new}
+        }
+    if isinstance(new, (list, tuple)):
+        if not isinstance(old, (list, tuple)) or len(old) != len(new):
+            old = [None] * len(new)
+        return [
+            _splice_by_date(o, n, old_dates, new_dates, dates, fill, carry)
+            for o, n in zip(old, new)
+        ]
+    if new is None and isinstance(old, list):
+        return [
+            _splice_by_date(o, None, old_dates, new_dates, dates, fill, carry)
+            for o in old
+        ]
+    return new if new is not None else old
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Rebuild the dashboard data.")
+    parser.add_argument(
+        "--strava-streams",
+        action="store_true",
+        help="Build the run series from Strava streams instead of TCX files.",
+    )
+    parser.add_argument(
+        "--only",
+        type=lambda x: x.split(","),
+        default=SOURCES,
+        help=f"Comma separated sources to rebuild, out of {','.join(SOURCES)}.",
+    )
+    parser.add_argument(
+        "--since",
+        type=datetime.fromisoformat,
+        help="Only recompute daily and weekly series from this date on; the "
+        "others are recomputed over the full history.",
+    )
+    parser.add_argument(
+        "--until",
+        type=datetime.fromisoformat,
+        help="Only recompute daily and weekly series up to this date.",
+    )
+    parser.add_argument(
+        "--keys",
+        type=lambda x: x.split(","),
+        help="Comma separated series keys to recompute, e.g. tcx__peak_hr.",
+    )
+    parser.add_argument(
+        "--grade-adjusted",
+        action="store_true",
+        help="Use grade-adjusted pace for pace zones, peak pace and HR vs pace.",
+    )
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Reduce runs to their summaries as they're loaded, to save memory.",
+    )
+    parser.add_argument(
+        "--athletes",
+        type=lambda x: x.split(","),
+        help="Comma separated athletes to rebuild, defaults to all of them.",
+    )
+    parser.add_argument(
+        "--athlete-workers",
+        type=int,
+        default=2,
+        help="How many athletes to rebuild at the same time.",
+    )
+    args = parser.parse_args()
+    unknown_sources = set(args.only) - set(SOURCES)
+    if len(unknown_sources) > 0:
+        parser.error(f"Unknown sources: {', '.join(unknown_sources)}")
+    if args.keys is not None:
+        known_keys = series_keys()
+        unknown_keys = [
+            k for k in args.keys if Writer._normalize_keys([k]).isdisjoint(known_keys)
+        ]
+        if len(unknown_keys) > 0:
+            parser.error(f"Unknown keys: {', '.join(unknown_keys)}")
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    failed = build_athletes(
+        [Athlete.load(a) for a in args.athletes or athlete_ids()],
+        sources=args.only,
+        max_workers=args.athlete_workers,
+        use_strava_streams=args.strava_streams,
+        since=args.since,
+        until=args.until,
+        keys=args.keys,
+        grade_adjusted=args.grade_adjusted,
+        streaming=args.streaming,
+    )
+    for athlete_id, failed_sources in failed.items():
+        print(f"Failed sources for {athlete_id}: {', '.join(failed_sources)}")
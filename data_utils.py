@@ -1,22 +1,69 @@
 import csv
 import datetime
+import gzip
+import hashlib
+import io
 import json
+import math
 import os
+import pickle
+import tempfile
+import zipfile
 from abc import ABC, abstractmethod
-from datetime import date, datetime
-from typing import Callable, Any
-
-from tcxreader import TCXExercise, TCXTrackPoint, TCXReader
-
-from constants import DURATIONS, DISTANCE_NAMES, PLAN_START_DATE
-from models.strava import MinimalRun
+from bisect import bisect_right
+from dataclasses import fields
+from itertools import accumulate
+from datetime import date, datetime, timedelta
+from typing import BinaryIO, Callable, Any
+from weakref import WeakKeyDictionary, WeakSet
+
+import numpy as np
+from tcxreader import TCXExercise, TCXReader
+
+from constants import (
+    ATL_DAYS,
+    CTL_DAYS,
+    DURATIONS,
+    DISTANCE_NAMES,
+    PACE_AT_HEART_RATE,
+    PACE_AT_HEART_RATE_TOLERANCE,
+    PAUSE_GAP_SECONDS,
+    PAUSE_SPEED,
+    SHOE_RETIREMENT_DISTANCE,
+    TIME_GRID_STEP,
+    DISTANCE_GRID_STEP,
+    HEATMAP_MIN_ZOOM,
+    HEATMAP_MAX_ZOOM,
+    HEATMAP_TILE_CELLS,
+)
+from fit import read_fit
+from models.athlete import Athlete, DEFAULT_ATHLETE
+from models.strava import MinimalRun, ActivityStreams
 from models.whoop import WhoopCycle
-from utils import get_list_of_dates_between, get_first_day_of_week, date_to_str
+from utils import (
+    get_list_of_dates_between,
+    get_first_day_of_week,
+    date_to_str,
+    histogram_zone_durations,
+    histogram_zone_percentages,
+    pearson_correlation,
+    utc_offset,
+)
 from enums import HeartRateZone, PaceZone, RecoveryZone
 from models.hevy import HevyWorkout
+from memo import MemoStore
+from segmentation import WorkoutSegments, segment_arrays, segment_workout
 
 
 class DataUtils(ABC):
+    # Directory of the source files, relative to the athlete's data directory
+    DATA_SUBDIR = ""
+    athlete: Athlete = DEFAULT_ATHLETE
+
+    @property
+    def data_dir(self):
+        return self.athlete.path(self.DATA_SUBDIR)
+
     @abstractmethod
     def data_period_start_times(self):
         ...
@@ -59,6 +106,61 @@ class DataUtils(ABC):
         groups = self.week_start_dates() if weekly else self.dates()
         return [grouped.get(g, default_value) for g in groups]
 
+    def _aggregate_by_date(
+        self,
+        workouts: list[HevyWorkout | TCXExercise | WhoopCycle],
+        metrics: list[str],
+    ):
+        """
+        Compute mean, min, max and count of each metric per day and per week in
+        a single pass over the workouts. Missing (None) values are skipped per
+        metric; periods without any value have a mean, min and max of None.
+        """
+        periods = {"daily": self.dates(), "weekly": self.week_start_dates()}
+        indices = {p: {d: i for i, d in enumerate(g)} for p, g in periods.items()}
+        aggregates = {
+            p: {
+                m: {
+                    "mean": [None] * len(g),
+                    "min": [None] * len(g),
+                    "max": [None] * len(g),
+                    "count": [0] * len(g),
+                }
+                for m in metrics
+            }
+            for p, g in periods.items()
+        }
+        sums = {p: {m: [0] * len(g) for m in metrics} for p, g in periods.items()}
+
+        for workout in workouts:
+            if workout.start_time is None:
+                continue
+            keys = {
+                "daily": workout.start_time.date(),
+                "weekly": get_first_day_of_week(workout.start_time),
+            }
+            for metric in metrics:
+                value = getattr(workout, metric)
+                if value is None:
+                    continue
+                for period, key in keys.items():
+                    i = indices[period][key]
+                    stats = aggregates[period][metric]
+                    stats["count"][i] += 1
+                    sums[period][metric][i] += value
+                    if stats["min"][i] is None or value < stats["min"][i]:
+                        stats["min"][i] = value
+                    if stats["max"][i] is None or value > stats["max"][i]:
+                        stats["max"][i] = value
+
+        for period, metric_sums in sums.items():
+            for metric, period_sums in metric_sums.items():
+                stats = aggregates[period][metric]
+                for i, count in enumerate(stats["count"]):
+                    if count > 0:
+                        stats["mean"][i] = period_sums[i] / count
+        return aggregates
+
     @staticmethod
     def _get_zone_percentages(
         zone: HeartRateZone | PaceZone | RecoveryZone, zone_data: list
@@ -76,19 +178,24 @@ class DataUtils(ABC):
 
 
 class HevyUtils(DataUtils):
-    DATA_DIR = "data"
     CSV_NAME = "hevy_workouts.csv"
 
-    def __init__(self):
+    def __init__(self, athlete: Athlete = DEFAULT_ATHLETE):
+        self.athlete = athlete
         self._workouts: list[HevyWorkout] | None = None
 
     def load_data(self):
         self._workouts = [
-            w for w in self.load_from_source() if w.start_time >= PLAN_START_DATE
+            w
+            for w in self.load_from_source()
+            if w.start_time >= self.athlete.plan_start_date
         ]
 
+    def restrict_to_window(self, since: datetime, until: datetime):
+        self._workouts = [w for w in self._workouts if since <= w.start_time < until]
+
     def load_from_source(self):
-        csv_lines = self._read_hevy_csv(f"{self.DATA_DIR}/{self.CSV_NAME}")
+        csv_lines = self._read_hevy_csv(os.path.join(self.data_dir, self.CSV_NAME))
         grouped_workouts = {}
         for line in csv_lines:
             exercise_title = line[0]
@@ -193,27 +300,241 @@ class HevyUtils(DataUtils):
 
 
 class TcxUtils(DataUtils):
-    DATA_DIR = "data"
-
-    def __init__(self):
+    # Summaries of workouts read from archives, relative to the athlete's
+    # data directory
+    ARCHIVE_MANIFEST = "archive_manifest.pkl"
+    # Attributes of a reduced workout that are kept besides its summaries
+    WORKOUT_FIELDS = [
+        "activity_type",
+        "calories",
+        "start_time",
+        "end_time",
+        "duration",
+        "ascent",
+        "distance",
+    ]
+
+    def __init__(
+        self,
+        memo_store: MemoStore | None = None,
+        grade_adjusted=False,
+        athlete: Athlete = DEFAULT_ATHLETE,
+        streaming=False,
+    ):
+        self.athlete = athlete
         self._workouts: list[TCXExercise] | None = None
+        self.memo_store = memo_store
+        # Speed channel used by the pace zones, peak pace and HR-vs-pace data
+        self.speed_channel = "grade_adjusted_speed" if grade_adjusted else "speed"
+        # Reduce each workout to its summaries as it's loaded and drop its
+        # trackpoints, so memory depends on the largest workout only
+        self.streaming = streaming
+        # Keyed by the workout objects themselves, so entries go with them
+        self._trackpoint_hashes: WeakKeyDictionary[TCXExercise, str] = (
+            WeakKeyDictionary()
+        )
+        self._summaries: WeakKeyDictionary[TCXExercise, dict[str, Any]] = (
+            WeakKeyDictionary()
+        )
+        self._reduced: WeakSet[TCXExercise] = WeakSet()
+        # Only the workout whose summaries are being computed is segmented
+        self._segmented: tuple[TCXExercise, WorkoutSegments] | None = None
+        self._summarizing: TCXExercise | None = None
+        self._manifest: dict[tuple, tuple[dict, dict]] = {}
+        self._loaded_manifest_keys = set()
+        self._archived: set[tuple] = set()
+        self._windowed = False
+        self._training_load = None
 
     def load_data(self):
-        self._workouts = [
-            w
-            for w in self.load_from_source()
-            if w.activity_type == "Running" and w.start_time >= PLAN_START_DATE
-        ]
+        self._manifest = self._load_manifest()
+        self._loaded_manifest_keys = set(self._manifest)
+        self._archived = set()
+        self._workouts = []
+        for w in self.iter_from_source():
+            if not self._is_included(w):
+                continue
+            if self.streaming:
+                self._reduce(w)
+            self._workouts.append(w)
+        self._save_manifest()
+        self._windowed = False
+        self._training_load = None
+
+    def _is_included(self, workout: TCXExercise):
+        # Workouts without a start time (e.g. FIT files without any records
+        # or sessions) can't be placed on the calendar
+        return (
+            workout.activity_type == "Running"
+            and workout.start_time is not None
+            and workout.start_time >= self.athlete.plan_start_date
+        )
+
+    def restrict_to_window(self, since: datetime, until: datetime):
+        self._workouts = [w for w in self._workouts if since <= w.start_time < until]
+        self._windowed = True
+        self._training_load = None
 
     def load_from_source(self):
-        file_names = [f for f in os.listdir(self.DATA_DIR) if f.endswith(".tcx")]
-        tcx_data = []
-        tcx_reader = TCXReader()
-        for file_name in file_names:
-            file_location = os.path.join(self.DATA_DIR, file_name)
-            _data = tcx_reader.read(file_location)
-            tcx_data.append(_data)
-        return tcx_data
+        return list(self.iter_from_source())
+
+    def iter_from_source(self):
+        """
+        Workouts one at a time, each parsed only when it's needed. TCX and
+        FIT files are told apart by their extension. They may be gzipped or
+        inside zip archives (like the Strava and Garmin bulk exports), which
+        are read as streams without unpacking them to disk.
+        """
+        for file_name in os.listdir(self.data_dir):
+            path = os.path.join(self.data_dir, file_name)
+            if file_name.lower().endswith(".zip"):
+                with zipfile.ZipFile(path) as archive:
+                    for member in archive.infolist():
+                        if self._workout_format(member.filename) is not None:
+                            yield self._read_archived(
+                                f"{file_name}/{member.filename}",
+                                (member.CRC, member.file_size),
+                                lambda: archive.open(member),
+                            )
+            elif file_name.lower().endswith(".gz"):
+                if self._workout_format(file_name) is not None:
+                    # The gzip trailer holds the CRC and size of the contents
+                    with open(path, "rb") as file:
+                        file.seek(-8, os.SEEK_END)
+                        trailer = file.read()
+                    yield self._read_archived(
+                        file_name, trailer, lambda: open(path, "rb")
+                    )
+            elif self._workout_format(file_name) is not None:
+                with open(path, "rb") as file:
+                    yield self._read_workout(file_name, file)
+
+    @staticmethod
+    def _workout_format(name: str):
+        """
+        ".tcx" or ".fit" for workout files, gzipped or not; None otherwise.
+        """
+        name = name.lower().removesuffix(".gz")
+        extension = os.path.splitext(name)[1]
+        return extension if extension in (".tcx", ".fit") else None
+
+    @classmethod
+    def _read_workout(cls, name: str, file: BinaryIO):
+        if name.lower().endswith(".gz"):
+            file = gzip.GzipFile(fileobj=file)
+        if cls._workout_format(name) == ".fit":
+            return read_fit(file)
+        # Strava's exports pad some TCX files with whitespace before the XML
+        # declaration, which the XML parser rejects
+        return TCXReader().read(io.BytesIO(file.read().lstrip()))
+
+    def _read_archived(self, name: str, checksum: Any, open_file: Callable):
+        """
+        Parse an archived workout and reduce it to its summaries right away.
+        Members reduced on a previous run (same name, checksum and summary
+        settings) are restored from the archive manifest instead, so re-runs
+        only decompress new members. Members that were excluded then (and so
+        have no summaries) are parsed again once they are included.
+        """
+        key = (name, checksum)
+        self._archived.add(key)
+        if key in self._manifest:
+            info, summaries = self._manifest[key]
+            workout = TCXExercise(trackpoints=[], **info)
+            if len(summaries) > 0 or not self._is_included(workout):
+                self._summaries[workout] = dict(summaries)
+                self._reduced.add(workout)
+                return workout
+
+        with open_file() as file:
+            workout = self._read_workout(name, file)
+        summaries = {}
+        if self._is_included(workout):
+            self._reduce(workout)
+            summaries = self._summaries[workout]
+        info = {f: getattr(workout, f) for f in self.WORKOUT_FIELDS}
+        self._manifest[key] = (info, dict(summaries))
+        return workout
+
+    def _settings_key(self):
+        # Everything the summaries computed by _reduce depend on
+        return MemoStore.key(
+            self.speed_channel,
+            self.athlete.resting_heart_rate,
+            self.athlete.max_heart_rate,
+            self.athlete.heart_rate_zones,
+            PAUSE_GAP_SECONDS,
+            PAUSE_SPEED,
+            TIME_GRID_STEP,
+            DISTANCE_GRID_STEP,
+            PACE_AT_HEART_RATE,
+            PACE_AT_HEART_RATE_TOLERANCE,
+            DURATIONS,
+            DISTANCE_NAMES,
+            HEATMAP_MAX_ZOOM,
+            HEATMAP_TILE_CELLS,
+        )
+
+    def _load_manifest(self):
+        """
+        Reduced archive members by (name, checksum), or nothing if the
+        manifest is missing, unreadable or was written with other settings.
+        """
+        try:
+            with open(self.athlete.path(self.ARCHIVE_MANIFEST), "rb") as file:
+                manifest = pickle.load(file)
+        except Exception:
+            return {}
+        if manifest.get("settings") != self._settings_key():
+            return {}
+        return manifest["workouts"]
+
+    def _save_manifest(self):
+        # Members no longer in any archive are dropped
+        workouts = {k: v for k, v in self._manifest.items() if k in self._archived}
+        if workouts.keys() == self._loaded_manifest_keys:
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=self.athlete.path(), suffix=".tmp")
+        with os.fdopen(fd, "wb") as file:
+            pickle.dump(
+                {"settings": self._settings_key(), "workouts": workouts},
+                file,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        os.replace(tmp_path, self.athlete.path(self.ARCHIVE_MANIFEST))
+
+    def _summarize(self, workout: TCXExercise):
+        """
+        Compute every per-workout summary the Writer uses. They are computed
+        together so that the workout is segmented once; the segmentation is
+        dropped afterwards.
+        """
+        self._summarizing = workout
+        try:
+            self._workout_heart_rate_histogram(workout)
+            self._workout_speed_histogram(workout)
+            self._workout_peak_values(workout, "heart_rate")
+            self._workout_peak_values(workout, "pace")
+            self._workout_heart_rate_pace_groups(workout)
+            self._workout_trimp(workout)
+            self._workout_heatmap_cells(workout)
+            self._workout_run_features(workout)
+        finally:
+            self._summarizing = None
+            self._segmented = None
+
+    def _reduce(self, workout: TCXExercise):
+        """
+        Compute every per-workout summary the Writer uses, then drop the
+        workout's trackpoints. Only the summaries are kept afterwards.
+        """
+        if workout in self._reduced:
+            return
+        self._summarize(workout)
+        workout.trackpoints = []
+        for lap in workout.laps or []:
+            lap.trackpoints = []
+        self._reduced.add(workout)
 
     @property
     def workouts(self):
@@ -237,168 +558,170 @@ class TcxUtils(DataUtils):
     def run_duration(self, weekly=False):
         return self._group_by_date(self.workouts, lambda w: w.duration, weekly)
 
-    def get_heart_rate_zone_percentages(self, zone: HeartRateZone, weekly=False):
-        return self._get_zone_percentages(zone, self.heart_rate_zones(weekly))
-
-    def get_pace_zone_percentages(self, zone: PaceZone, weekly=False):
-        return self._get_zone_percentages(zone, self.pace_zones(weekly))
-
-    @staticmethod
-    def _heart_rate_zones(workout: TCXExercise):
-        trackpoints = TcxUtils.get_sorted_trackpoint_deltas(
-            workout, lambda t: t.hr_value, "time"
+    def heart_rate_zone_percentages(self, weekly=False):
+        """
+        Percentage of time in each of the athlete's heart rate zones, as
+        [(zone, percentages)].
+        """
+        zones = self.athlete.heart_rate_zones
+        percentages = histogram_zone_percentages(
+            self.heart_rate_histograms(weekly), zones
         )
-
-        # Calculate duration spent in each HeartRateZone
-        zone_durations = {}
-        for i in range(len(trackpoints) - 1):
-            start = trackpoints[i]
-            end = trackpoints[i + 1]
-            duration = (end[0] - start[0]).total_seconds()
-            if (
-                duration > 15
-            ):  # Durations over 15s are likely paused workouts and are skipped
-                continue
-            zone = HeartRateZone.zone(start[1])
-            if zone not in zone_durations:
-                zone_durations[zone] = 0
-            zone_durations[zone] += duration
-
-        return zone_durations
+        return [(zone, percentages[zone[0]]) for zone in zones]
+
+    def pace_zone_percentages(self, weekly=False):
+        """
+        Percentage of time in each of the athlete's pace zones, as
+        [(min/mi label, min/km label, percentages)].
+        """
+        zones = self.athlete.pace_zones
+        percentages = histogram_zone_percentages(
+            self.speed_histograms(weekly),
+            [
+                (min_mi, min_speed, max_speed)
+                for min_mi, _, min_speed, max_speed in zones
+            ],
+        )
+        return [(min_mi, min_km, percentages[min_mi]) for min_mi, min_km, _, _ in zones]
+
+    def segments(self, workout: TCXExercise) -> WorkoutSegments:
+        """
+        Moving segments of a workout, shared by all of its analytics. Only
+        the last segmented workout's are kept.
+        """
+        if self._segmented is None or self._segmented[0] is not workout:
+            self._segmented = (workout, self._segment(workout))
+        return self._segmented[1]
+
+    def _segment(self, workout: TCXExercise):
+        return segment_workout(workout)
+
+    def _heart_rate_histogram(self, workout: TCXExercise):
+        # 1 bpm resolution
+        series = self.segments(workout).per_second
+        return series.histogram(np.rint(series.heart_rate))
+
+    def _speed_histogram(self, workout: TCXExercise):
+        # 0.01 m/s resolution
+        series = self.segments(workout).per_second
+        speed = getattr(series, self.speed_channel)
+        histogram = series.histogram(np.rint(speed * 100))
+        return {k / 100: v for k, v in histogram.items()}
 
     @staticmethod
-    def _pace_zones(workout: TCXExercise):
-        trackpoints = TcxUtils.get_sorted_trackpoint_deltas(
-            workout, lambda t: t.tpx_ext.get("Speed"), "time"
+    def _trackpoint_hash(workout: TCXExercise):
+        h = hashlib.sha256()
+        for t in workout.trackpoints:
+            h.update(
+                repr(
+                    (
+                        t.time,
+                        t.hr_value,
+                        t.tpx_ext.get("Speed"),
+                        t.distance,
+                        t.elevation,
+                        t.latitude,
+                        t.longitude,
+                    )
+                ).encode()
+            )
+        return h.hexdigest()
+
+    def _memoized(self, workout: TCXExercise, name: str, func: Callable, *params):
+        """
+        Run a per-workout analytic through the memo store, keyed by the
+        workout's trackpoints, the analytic and the parameters it depends on.
+        Results are also kept in memory for as long as the workout is loaded.
+        The first analytic requested for a workout computes all of them (see
+        _summarize).
+        """
+        summaries = self._summaries.setdefault(workout, {})
+        summary_key = repr((name, params))
+        if summary_key not in summaries:
+            if workout in self._reduced:
+                raise ValueError(f"{name} wasn't computed before reducing the workout")
+            if self._summarizing is not workout:
+                self._summarize(workout)
+            if summary_key not in summaries:
+                summaries[summary_key] = self._memoized_on_disk(
+                    workout, name, func, *params
+                )
+        return summaries[summary_key]
+
+    def _memoized_on_disk(
+        self, workout: TCXExercise, name: str, func: Callable, *params
+    ):
+        if self.memo_store is None:
+            return func(workout)
+        if workout not in self._trackpoint_hashes:
+            self._trackpoint_hashes[workout] = self._trackpoint_hash(workout)
+        return self.memo_store.memoize(
+            (
+                self._trackpoint_hashes[workout],
+                name,
+                PAUSE_GAP_SECONDS,
+                PAUSE_SPEED,
+                TIME_GRID_STEP,
+                DISTANCE_GRID_STEP,
+                *params,
+            ),
+            lambda: func(workout),
         )
 
-        # Calculate duration spent in each HeartRateZone
-        zone_durations = {}
-        for i in range(len(trackpoints) - 1):
-            start = trackpoints[i]
-            end = trackpoints[i + 1]
-            duration = (end[0] - start[0]).total_seconds()
-            if (
-                duration > 15
-            ):  # Durations over 45s are likely paused workouts and are skipped
-                continue
-            zone = PaceZone.zone(start[1])
-            if zone not in zone_durations:
-                zone_durations[zone] = 0
-            zone_durations[zone] += duration
+    def _workout_heart_rate_histogram(self, workout: TCXExercise):
+        return self._memoized(
+            workout, "heart_rate_histogram", self._heart_rate_histogram
+        )
 
-        return zone_durations
+    def _workout_speed_histogram(self, workout: TCXExercise):
+        return self._memoized(
+            workout, "speed_histogram", self._speed_histogram, self.speed_channel
+        )
 
-    @staticmethod
-    def _hr_zone_agg_func(zones1, zones2):
-        return {
-            zone: zones1.get(zone, 0) + zones2.get(zone, 0) for zone in HeartRateZone
-        }
+    def _workout_heart_rate_zones(self, workout: TCXExercise):
+        return histogram_zone_durations(
+            self._workout_heart_rate_histogram(workout),
+            self.athlete.heart_rate_zones,
+        )
 
     @staticmethod
-    def _pace_zone_agg_func(zones1, zones2):
-        return {zone: zones1.get(zone, 0) + zones2.get(zone, 0) for zone in PaceZone}
+    def _histogram_agg_func(histogram1, histogram2):
+        merged = dict(histogram1)
+        for bpm, duration in histogram2.items():
+            merged[bpm] = merged.get(bpm, 0) + duration
+        return merged
 
-    def heart_rate_zones(self, weekly=False):
+    def heart_rate_histograms(self, weekly=False):
         return self._group_by_date(
             self.workouts,
-            self._heart_rate_zones,
+            self._workout_heart_rate_histogram,
             weekly=weekly,
-            default_value={zone: 0 for zone in HeartRateZone},
-            agg_func=self._hr_zone_agg_func,
+            default_value={},
+            agg_func=self._histogram_agg_func,
         )
 
-    def pace_zones(self, weekly=False):
+    def speed_histograms(self, weekly=False):
         return self._group_by_date(
             self.workouts,
-            self._pace_zones,
+            self._workout_speed_histogram,
             weekly=weekly,
-            default_value={zone: 0 for zone in PaceZone},
-            agg_func=self._pace_zone_agg_func,
+            default_value={},
+            agg_func=self._histogram_agg_func,
         )
 
-    @staticmethod
-    def get_sorted_trackpoint_deltas(
-        workout: TCXExercise,
-        key_func: Callable[[TCXTrackPoint], int | float],
-        mode: str,
-    ) -> list[tuple[Any, int | float, int | float]]:
-
-        if mode == "time":
-            index_func = lambda x: x.time
-            delta_func = lambda x, y: (y.time - x.time).total_seconds()
-        elif mode == "distance":
-            index_func = lambda x: x.distance
-            delta_func = lambda x, y: y.distance - x.distance
-        else:
-            raise ValueError(f"Invalid mode: {mode}")
-
-        raw_trackpoints = [t for t in workout.trackpoints if key_func(t) is not None]
-        raw_trackpoints.sort(key=lambda x: x.time)
-
-        trackpoints = []
-
-        if len(raw_trackpoints) == 0:
-            return trackpoints
-
-        # Calculate duration of each trackpoint
-        for i in range(len(raw_trackpoints) - 1):
-            start = raw_trackpoints[i]
-            end = raw_trackpoints[i + 1]
-            delta = delta_func(start, end)
-            trackpoints.append((index_func(start), key_func(start), delta))
-
-        return trackpoints
-
-    @staticmethod
-    def calc_moving_average(
-        dataset: list[tuple[datetime, float | int, int]],
-        mode: str,
-        delta: int = 60,
-    ) -> list[float]:
-        if mode == "time":
-            delta_func = lambda x, y: (y[0] - x[0]).total_seconds()
-        elif mode == "distance":
-            delta_func = lambda x, y: y[0] - x[0]
-        else:
-            raise ValueError(f"Invalid mode: {mode}")
-
-        left_idx = 0
-        right_idx = 0
-        moving_average = []
-        moving_sum = 0
-        normalizer = 0
-        while right_idx < len(dataset):
-            delta_between_trackpoints = delta_func(
-                dataset[left_idx], dataset[right_idx]
-            )
-            if delta_between_trackpoints < delta:
-                moving_sum += dataset[right_idx][1] * dataset[right_idx][2]
-                normalizer += dataset[right_idx][2]
-                right_idx += 1
-            else:
-                moving_average.append(moving_sum / normalizer)
-                moving_sum -= dataset[left_idx][1] * dataset[left_idx][2]
-                normalizer -= dataset[left_idx][2]
-                left_idx += 1
-        return moving_average
-
     def _moving_average_heart_rate(
         self, workout: TCXExercise, duration_seconds: int = 60
     ):
-        trackpoints = self.get_sorted_trackpoint_deltas(
-            workout, lambda t: t.hr_value, "time"
-        )
-        return TcxUtils.calc_moving_average(trackpoints, "time", duration_seconds)
+        series = self.segments(workout).per_second
+        return series.rolling_means(series.heart_rate, duration_seconds)
 
-    def _moving_average_pace(self, workout: TCXExercise, duration_seconds: int = 60):
-        trackpoints = self.get_sorted_trackpoint_deltas(
-            workout, lambda t: t.tpx_ext.get("Speed"), "distance"
+    def _moving_average_pace(self, workout: TCXExercise, distance_meters: int = 60):
+        series = self.segments(workout).per_distance
+        return series.rolling_means(
+            getattr(series, self.speed_channel), distance_meters
         )
-        return TcxUtils.calc_moving_average(trackpoints, "distance", duration_seconds)
 
-    def get_peak_data(self, dataset_name: str, by_month=False):
-        # Todo this got really messy after adding the by_month option. Refactor this.
+    def _peak_values(self, workout: TCXExercise, dataset_name: str):
         if dataset_name == "heart_rate":
             categories = DURATIONS
             ma_func = self._moving_average_heart_rate
@@ -408,68 +731,334 @@ class TcxUtils(DataUtils):
         else:
             raise ValueError(f"Invalid dataset_name: {dataset_name}")
 
-        monthly_data = {
-            workout.start_time.month: {cat: [] for cat in categories}
-            for workout in self.workouts
-        }
+        peaks = {}
+        for cat in categories:
+            moving_averages = ma_func(workout, cat)
+            if len(moving_averages) > 0:
+                peaks[cat] = float(moving_averages.max())
+        return peaks
+
+    def _workout_peak_values(self, workout: TCXExercise, dataset_name: str):
+        categories = DURATIONS if dataset_name == "heart_rate" else DISTANCE_NAMES
+        return self._memoized(
+            workout,
+            f"peak_{dataset_name}",
+            lambda w: self._peak_values(w, dataset_name),
+            list(categories),
+            self.speed_channel,
+        )
+
+    def get_peak_data(self, dataset_name: str, by_month=False):
+        if dataset_name not in ("heart_rate", "pace"):
+            raise ValueError(f"Invalid dataset_name: {dataset_name}")
 
-        data = {cat: [] for cat in categories}
+        data = {}
+        monthly_data = {}
         for workout in self.workouts:
-            workout_month = workout.start_time.month
-            for cat in categories:
-                moving_averages = ma_func(workout, cat)
-                if len(moving_averages) > 0:
-                    data[cat].append(max(moving_averages))
-                    if by_month:
-                        monthly_data[workout_month][cat].append(max(moving_averages))
+            month_data = monthly_data.setdefault(workout.start_time.month, {})
+            for cat, peak in self._workout_peak_values(workout, dataset_name).items():
+                data[cat] = max(data.get(cat, peak), peak)
+                month_data[cat] = max(month_data.get(cat, peak), peak)
 
         if by_month:
-            month_data_out = {}
-            for month, month_data in monthly_data.items():
-                month_data_out[month] = {
-                    k: max(v) for k, v in month_data.items() if len(v) > 0
-                }
-            return month_data_out
+            return monthly_data
+        return data
 
-        return {k: max(v) for k, v in data.items() if len(v) > 0}
+    def _heart_rate_pace_groups(self, workout: TCXExercise):
+        # Average heart rate and speed over consecutive 20 s blocks
+        series = self.segments(workout).per_second
+        group_size = int(20 / series.step)
+        n = len(series.index) // group_size * group_size
+        hr = series.heart_rate[:n].reshape(-1, group_size).mean(axis=1)
+        speed = getattr(series, self.speed_channel)
+        speed = speed[:n].reshape(-1, group_size).mean(axis=1)
+        complete = ~np.isnan(hr) & ~np.isnan(speed)
+        month = workout.start_time.month
+        return [
+            (month, h, v)
+            for h, v in zip(hr[complete].tolist(), speed[complete].tolist())
+        ]
+
+    def _workout_heart_rate_pace_groups(self, workout: TCXExercise):
+        return self._memoized(
+            workout,
+            "heart_rate_pace_groups",
+            self._heart_rate_pace_groups,
+            self.speed_channel,
+        )
 
     def get_heart_rate_pace_data(self):
         trackpoints = []
         for workout in self.workouts:
-            raw_trackpoints = [
-                t
-                for t in workout.trackpoints
-                if t.hr_value is not None and t.tpx_ext.get("Speed") is not None
-            ]
-            raw_trackpoints.sort(key=lambda x: x.time)
-            group_size = 20
-            for i in range(0, len(raw_trackpoints), group_size):
-                group = raw_trackpoints[i : i + group_size]
-                first_time = group[0].time
-                hr = sum([t.hr_value for t in group]) / group_size
-                speed = sum([t.tpx_ext.get("Speed") for t in group]) / group_size
-                trackpoints.append((first_time.month, hr, speed))
+            trackpoints.extend(self._workout_heart_rate_pace_groups(workout))
         return trackpoints
 
+    def _trimp(self, workout: TCXExercise):
+        """
+        Banister's heart rate based training impulse: moving minutes weighted
+        by heart rate reserve, growing exponentially with intensity.
+        """
+        series = self.segments(workout).per_second
+        heart_rate = series.heart_rate[~np.isnan(series.heart_rate)]
+        reserve = np.clip(
+            (heart_rate - self.athlete.resting_heart_rate)
+            / (self.athlete.max_heart_rate - self.athlete.resting_heart_rate),
+            0,
+            1,
+        )
+        minutes = series.step / 60
+        return float(np.sum(minutes * reserve * 0.64 * np.exp(1.92 * reserve)))
+
+    def _workout_trimp(self, workout: TCXExercise):
+        return self._memoized(
+            workout,
+            "trimp",
+            self._trimp,
+            self.athlete.resting_heart_rate,
+            self.athlete.max_heart_rate,
+        )
+
+    def training_load(self, weekly=False):
+        """
+        Daily (or weekly) TRIMP with fitness (CTL), fatigue (ATL) and form
+        (TSB). Weekly values of CTL, ATL and TSB are those of the week's last
+        day, or of today for the current week.
+        """
+        dates = self.dates()
+        if self._training_load is None:
+            # Advanced through the last week's end, so that its values don't
+            # depend on the day of its last run
+            week_end = dates[-1] + timedelta(days=6 - dates[-1].weekday())
+            end = max(dates[-1], min(week_end, date.today()))
+            rest_days = [
+                dates[-1] + timedelta(days=i)
+                for i in range(1, (end - dates[-1]).days + 1)
+            ]
+            model = TrainingLoadModel(self.athlete.path(TrainingLoadModel.STATE_FILE))
+            loads = self._group_by_date(self.workouts, self._workout_trimp)
+            self._training_load = model.update(
+                dates + rest_days,
+                loads + [0.0] * len(rest_days),
+                complete=not self._windowed,
+            )
+            model.save()
+
+        calendar = self._training_load
+        if not weekly:
+            return {k: v[: len(dates)] for k, v in calendar.items()}
+        last_days = [
+            min(i + 6, len(calendar["load"]) - 1) for i in range(0, len(dates), 7)
+        ]
+        return {
+            "load": [sum(calendar["load"][i : i + 7]) for i in range(0, len(dates), 7)],
+            **{k: [calendar[k][i] for i in last_days] for k in ("atl", "ctl", "tsb")},
+        }
+
+    @staticmethod
+    def _mercator_cells(latitude: np.ndarray, longitude: np.ndarray, zoom: int):
+        """
+        Web Mercator heatmap cell coordinates of positions at the given zoom.
+        """
+        cells = 2**zoom * HEATMAP_TILE_CELLS
+        lat = np.radians(np.clip(latitude, -85.0511, 85.0511))
+        x = (longitude + 180) / 360 * cells
+        y = (1 - np.log(np.tan(lat) + 1 / np.cos(lat)) / np.pi) / 2 * cells
+        return x.astype(np.int64), y.astype(np.int64)
+
+    def _heatmap_cells(self, workout: TCXExercise):
+        """
+        Moving seconds spent in each heatmap cell at HEATMAP_MAX_ZOOM, as
+        arrays of cell x, cell y and count.
+        """
+        series = self.segments(workout).per_second
+        located = ~np.isnan(series.latitude) & ~np.isnan(series.longitude)
+        x, y = self._mercator_cells(
+            series.latitude[located], series.longitude[located], HEATMAP_MAX_ZOOM
+        )
+        cells, counts = np.unique(np.stack([x, y]), axis=1, return_counts=True)
+        return cells[0], cells[1], counts * int(series.step)
+
+    def _workout_heatmap_cells(self, workout: TCXExercise):
+        return self._memoized(
+            workout,
+            "heatmap_cells",
+            self._heatmap_cells,
+            HEATMAP_MAX_ZOOM,
+            HEATMAP_TILE_CELLS,
+        )
+
+    def heatmap_tiles(self):
+        """
+        Pyramid of heatmap tiles for every zoom level from HEATMAP_MIN_ZOOM to
+        HEATMAP_MAX_ZOOM: {zoom: {"x/y": {cell: seconds}}}, where cells are
+        numbered row by row within their tile. Each workout is binned once
+        (memoized); the pyramid is built by summing and coarsening those bins.
+        """
+        binned = [self._workout_heatmap_cells(workout) for workout in self.workouts]
+        x = np.concatenate([b[0] for b in binned] + [np.empty(0, np.int64)])
+        y = np.concatenate([b[1] for b in binned] + [np.empty(0, np.int64)])
+        counts = np.concatenate([b[2] for b in binned] + [np.empty(0, np.int64)])
+
+        pyramid = {}
+        for zoom in range(HEATMAP_MAX_ZOOM, HEATMAP_MIN_ZOOM - 1, -1):
+            cells, inverse = np.unique(np.stack([x, y]), axis=1, return_inverse=True)
+            counts = np.bincount(inverse.ravel(), weights=counts).astype(np.int64)
+            x, y = cells[0], cells[1]
+            tiles = {}
+            for cx, cy, count in zip(x.tolist(), y.tolist(), counts.tolist()):
+                tile = f"{cx // HEATMAP_TILE_CELLS}/{cy // HEATMAP_TILE_CELLS}"
+                cell = (cy % HEATMAP_TILE_CELLS) * HEATMAP_TILE_CELLS
+                cell += cx % HEATMAP_TILE_CELLS
+                tiles.setdefault(tile, {})[cell] = count
+            pyramid[zoom] = tiles
+            # Two by two cells make up one cell at the next zoom level out
+            x, y = x // 2, y // 2
+        return pyramid
+
+    def _run_features(self, workout: TCXExercise):
+        segments = self.segments(workout)
+        heart_rate = segments.per_second.heart_rate
+        speed = segments.per_second.speed
+        hr_values = heart_rate[heart_rate > 0]
+        speeds_at_hr = speed[
+            (np.abs(heart_rate - PACE_AT_HEART_RATE) <= PACE_AT_HEART_RATE_TOLERANCE)
+            & ~np.isnan(speed)
+        ]
+        zone_durations = self._workout_heart_rate_zones(workout)
+        run = {
+            "moving_time": segments.moving_time,
+            "elapsed_time": segments.elapsed_time,
+            "avg_heart_rate": float(hr_values.mean()) if len(hr_values) > 0 else None,
+            "speed_at_heart_rate": (
+                float(speeds_at_hr.mean()) if len(speeds_at_hr) > 0 else None
+            ),
+        }
+        for name, duration in zone_durations.items():
+            run[RecoveryRunJoin.zone_feature(name)] = duration
+        return run
+
+    def _workout_run_features(self, workout: TCXExercise):
+        return self._memoized(
+            workout,
+            "run_features",
+            self._run_features,
+            PACE_AT_HEART_RATE,
+            PACE_AT_HEART_RATE_TOLERANCE,
+            self.athlete.heart_rate_zones,
+        )
+
+    def run_features(self):
+        """
+        Per-run summary used to relate runs to other sources: average heart
+        rate, average speed at PACE_AT_HEART_RATE (+/- tolerance) and time
+        spent in each heart rate zone.
+        """
+        return [
+            {
+                "start_time": workout.start_time,
+                "distance": workout.distance,
+                "duration": workout.duration,
+                **self._workout_run_features(workout),
+            }
+            for workout in sorted(self.workouts, key=lambda w: w.start_time)
+        ]
+
+
+class StravaStreamUtils(TcxUtils):
+    """
+    TcxUtils backed by Strava streams downloaded with read_strava_data
+    instead of hand-exported TCX files.
+    """
+
+    DATA_SUBDIR = "strava_streams"
+    SPORT_TYPES = {"Run": "Running"}
+
+    def iter_from_source(self):
+        file_names = [f for f in os.listdir(self.data_dir) if f.endswith(".npz")]
+        for f in file_names:
+            yield self._to_exercise(
+                ActivityStreams.load(os.path.join(self.data_dir, f))
+            )
+
+    @classmethod
+    def _to_exercise(cls, streams: ActivityStreams):
+        """
+        A TCXExercise without trackpoints; the samples stay columnar in its
+        `streams` attribute and are segmented from there (see _segment).
+        """
+        workout = TCXExercise(
+            trackpoints=[],
+            activity_type=cls.SPORT_TYPES.get(streams.sport_type, streams.sport_type),
+            calories=0,  # Not part of the activity summary
+            start_time=streams.start_time,
+            end_time=streams.start_time + timedelta(seconds=streams.duration),
+            duration=streams.duration,
+            ascent=streams.ascent,
+            distance=streams.distance,
+        )
+        workout.streams = streams
+        return workout
+
+    @staticmethod
+    def _stream_columns(streams: ActivityStreams):
+        return {
+            "seconds": streams.time,
+            "heart_rate": streams.heartrate,
+            "speed": streams.velocity_smooth,
+            "distance": streams.distance_stream,
+            "elevation": streams.altitude,
+            "latitude": streams.latitude,
+            "longitude": streams.longitude,
+        }
+
+    def _segment(self, workout: TCXExercise):
+        return segment_arrays(**self._stream_columns(workout.streams))
+
+    @classmethod
+    def _trackpoint_hash(cls, workout: TCXExercise):
+        h = hashlib.sha256()
+        for values in cls._stream_columns(workout.streams).values():
+            h.update(np.ascontiguousarray(values, dtype=float).tobytes())
+        return h.hexdigest()
+
+    def _reduce(self, workout: TCXExercise):
+        super()._reduce(workout)
+        workout.streams = None
+
 
 class StravaUtils(DataUtils):
 
-    DATA_DIR = "data"
     JSON_NAME = "strava_activities_by_gear.json"
 
-    def __init__(self):
+    def __init__(self, athlete: Athlete = DEFAULT_ATHLETE):
+        self.athlete = athlete
         self.data = None
+        # Runs before the date window, which still count towards the mileage
+        self._earlier_runs = {}
+        self._gear_mileage = None
 
     def load_data(self):
         self.data = self.load_from_source()
+        self._earlier_runs = {}
+        self._gear_mileage = None
+
+    def restrict_to_window(self, since: datetime, until: datetime):
+        self._earlier_runs = {
+            gear: [a for a in activities if a.start_time < since]
+            for gear, activities in self.data.items()
+        }
+        self.data = {
+            gear: [a for a in activities if since <= a.start_time < until]
+            for gear, activities in self.data.items()
+        }
+        self._gear_mileage = None
 
     def load_from_source(self):
-        filepath = f"{self.DATA_DIR}/{self.JSON_NAME}"
+        filepath = os.path.join(self.data_dir, self.JSON_NAME)
         with open(filepath, "r") as file:
             raw_json = json.load(file)
         data = {}
-        for gear, activities in raw_json.items():
-            gear_name = self._modify_gear_name(gear)
+        for gear_name, activities in raw_json.items():
             data[gear_name] = [
                 MinimalRun(
                     start_time=datetime.strptime(
@@ -482,15 +1071,8 @@ class StravaUtils(DataUtils):
             ]
         return data
 
-    @staticmethod
-    def _modify_gear_name(gear_name: str):
-        saucony_end_speed_3 = "Saucony Endorphin Speed 3"
-        if gear_name.startswith(saucony_end_speed_3):
-            return saucony_end_speed_3
-        return gear_name
-
     def data_period_start_times(self):
-        raise NotImplementedError
+        return [a.start_time for activities in self.data.values() for a in activities]
 
     def distance_by_gear(self):
         return {
@@ -498,34 +1080,109 @@ class StravaUtils(DataUtils):
             for gear, activities in self.data.items()
         }
 
+    def _compute_gear_mileage(self):
+        periods = {"daily": self.dates(), "weekly": self.week_start_dates()}
+        indices = {p: {d: i for i, d in enumerate(g)} for p, g in periods.items()}
+        mileage = {
+            p: {
+                gear: {"distance": [0.0] * len(g), "cumulative_distance": None}
+                for gear in self.data
+            }
+            for p, g in periods.items()
+        }
+        retired_on = {gear: None for gear in self.data}
+        totals = {gear: 0.0 for gear in self.data}
+        earlier = {gear: 0.0 for gear in self.data}
+
+        runs = sorted(
+            (a.start_time, gear, a.distance, in_window)
+            for in_window, runs_by_gear in [
+                (False, self._earlier_runs),
+                (True, self.data),
+            ]
+            for gear, activities in runs_by_gear.items()
+            for a in activities
+        )
+        for start_time, gear, distance, in_window in runs:
+            if in_window:
+                mileage["daily"][gear]["distance"][
+                    indices["daily"][start_time.date()]
+                ] += distance
+                mileage["weekly"][gear]["distance"][
+                    indices["weekly"][get_first_day_of_week(start_time)]
+                ] += distance
+            else:
+                earlier[gear] += distance
+            totals[gear] += distance
+            if retired_on[gear] is None and totals[gear] >= SHOE_RETIREMENT_DISTANCE:
+                retired_on[gear] = date_to_str(start_time)
+
+        for period in mileage.values():
+            for gear, gear_mileage in period.items():
+                gear_mileage["cumulative_distance"] = list(
+                    accumulate(gear_mileage["distance"], initial=earlier[gear])
+                )[1:]
+                gear_mileage["retired_on"] = retired_on[gear]
+        return mileage
+
+    def gear_mileage(self, weekly=False):
+        """
+        Distance and cumulative distance per gear and day (or week), plus the
+        date on which the gear passed SHOE_RETIREMENT_DISTANCE, if any.
+        """
+        if self._gear_mileage is None:
+            self._gear_mileage = self._compute_gear_mileage()
+        return self._gear_mileage["weekly" if weekly else "daily"]
+
 
 class WhoopUtils(DataUtils):
-    DATA_DIR = "data/whoop"
+    DATA_SUBDIR = "whoop"
     CYCLES_FILE = "physiological_cycles.csv"
+    CYCLE_METRICS = [f.name for f in fields(WhoopCycle) if f.type in (int, float)]
 
-    def __init__(self):
+    def __init__(self, athlete: Athlete = DEFAULT_ATHLETE):
+        self.athlete = athlete
         self.cycles = None
+        self._cycle_aggregates = None
 
     def data_period_start_times(self):
         return [c.start_time for c in self.cycles if c.start_time]
 
     def load_data(self):
         self.cycles = self.load_from_source()
+        self._cycle_aggregates = None
+
+    def restrict_to_window(self, since: datetime, until: datetime):
+        self.cycles = [
+            c for c in self.cycles if c.start_time and since <= c.start_time < until
+        ]
+        self._cycle_aggregates = None
 
     def load_from_source(self):
         cycles = []
-        with open(f"{self.DATA_DIR}/{self.CYCLES_FILE}", "r") as file:
+        with open(os.path.join(self.data_dir, self.CYCLES_FILE), "r") as file:
             reader = csv.reader(file)
             next(reader)
             for row in reader:
                 cycle = WhoopCycle(*row)
-                if cycle.start_time >= PLAN_START_DATE:
+                if cycle.start_time >= self.athlete.plan_start_date:
                     cycles.append(cycle)
         return cycles
 
-    @staticmethod
-    def _group_averages(grouped_data: list[list[float | int]]):
-        return [sum(g) / len(g) if len(g) > 0 else 0 for g in grouped_data]
+    def cycle_metrics(self, weekly=False):
+        """
+        Mean, min, max and count of every numeric cycle metric, keyed by
+        metric and then by statistic, with one value per day (or week).
+        """
+        if self._cycle_aggregates is None:
+            self._cycle_aggregates = self._aggregate_by_date(
+                self.cycles, self.CYCLE_METRICS
+            )
+        return self._cycle_aggregates["weekly" if weekly else "daily"]
+
+    def _metric_means(self, metric: str, weekly=False):
+        means = self.cycle_metrics(weekly)[metric]["mean"]
+        return [m if m is not None else 0 for m in means]
 
     def avg_recovery_score(self, zone: RecoveryZone, weekly=False):
         def agg_func(collector: dict, zone: RecoveryZone):
@@ -551,34 +1208,232 @@ class WhoopUtils(DataUtils):
         return percentages
 
     def day_strain(self, weekly=False):
-        grouped = self._group_by_date(
-            [c for c in self.cycles if c.day_strain],
-            lambda w: w.day_strain,
-            weekly,
-            default_value=[],
-            agg_func=lambda x, y: x + [y],
-        )
-        return self._group_averages(grouped)
+        return self._metric_means("day_strain", weekly)
 
     def sleep_performance(self, weekly=False):
-        grouped = self._group_by_date(
-            [c for c in self.cycles if c.sleep_performance],
-            lambda w: w.sleep_performance,
-            weekly,
-            default_value=[],
-            agg_func=lambda x, y: x + [y],
-        )
-        return self._group_averages(grouped)
+        return self._metric_means("sleep_performance", weekly)
 
     def asleep_duration(self, weekly=False):
-        grouped = self._group_by_date(
-            [c for c in self.cycles if c.asleep_duration],
-            lambda w: w.asleep_duration,
-            weekly,
-            default_value=[],
-            agg_func=lambda x, y: x + [y],
+        return self._metric_means("asleep_duration", weekly)
+
+
+class RecoveryRunJoin:
+    """
+    Matches every run to the Whoop cycle it took place in (as-of join on
+    cycle start times) and relates the cycle's recovery metrics to the run.
+    """
+
+    WHOOP_FEATURES = [
+        "recovery_score",
+        "heart_rate_variability",
+        "resting_heart_rate",
+        "sleep_performance",
+    ]
+    RUN_FEATURES = ["avg_heart_rate", "speed_at_heart_rate"]
+
+    def __init__(
+        self,
+        runs: list[dict],
+        cycles: list[WhoopCycle],
+        heart_rate_zones: list[tuple[str, int, int]] | None = None,
+    ):
+        self.runs = sorted(runs, key=lambda r: r["start_time"])
+        # Plus the time spent in each of the athlete's heart rate zones
+        zones = heart_rate_zones or DEFAULT_ATHLETE.heart_rate_zones
+        self.run_feature_names = self.RUN_FEATURES + [
+            self.zone_feature(name) for name, _, _ in zones
+        ]
+        # Whoop cycle times are local, TCX times are UTC.
+        self.cycles = sorted(
+            [
+                (
+                    c.start_time - utc_offset(c.cycle_timezone),
+                    c.end_time - utc_offset(c.cycle_timezone) if c.end_time else None,
+                    c,
+                )
+                for c in cycles
+                if c.start_time
+            ],
+            key=lambda c: c[0],
         )
-        return self._group_averages(grouped)
+        self._cycle_starts = [c[0] for c in self.cycles]
+
+    @staticmethod
+    def zone_feature(zone_name: str):
+        # e.g. "zone_1_seconds" for "Zone 1"
+        return f"{zone_name.lower().replace(' ', '_')}_seconds"
+
+    def _cycle_for(self, start_time: datetime):
+        i = bisect_right(self._cycle_starts, start_time) - 1
+        if i < 0:
+            return None
+        _, end, cycle = self.cycles[i]
+        if end is not None and start_time >= end:
+            return None
+        return cycle
+
+    def run_features(self):
+        features = []
+        for run in self.runs:
+            cycle = self._cycle_for(run["start_time"])
+            if cycle is None:
+                continue
+            row = {"date": date_to_str(run["start_time"])}
+            row.update({f: getattr(cycle, f) for f in self.WHOOP_FEATURES})
+            row.update({f: run[f] for f in self.run_feature_names})
+            features.append(row)
+        return features
+
+    def correlations(self):
+        features = self.run_features()
+        correlations = []
+        for whoop_feature in self.WHOOP_FEATURES:
+            for run_feature in self.run_feature_names:
+                pairs = [
+                    (r[whoop_feature], r[run_feature])
+                    for r in features
+                    if r[whoop_feature] is not None and r[run_feature] is not None
+                ]
+                correlations.append(
+                    (
+                        whoop_feature,
+                        run_feature,
+                        pearson_correlation(
+                            [p[0] for p in pairs], [p[1] for p in pairs]
+                        ),
+                        len(pairs),
+                    )
+                )
+        return correlations
+
+
+class TrainingLoadModel:
+    """
+    Fatigue (ATL) and fitness (CTL) as exponentially weighted averages of
+    daily training load, and form (TSB) as the previous day's CTL - ATL.
+
+    The per-day state of consecutive days is kept in STATE_FILE. An update
+    advances ATL and CTL from the stored values of the day before the first
+    day whose load changed, so adding a new day is a single step.
+    """
+
+    # Relative to the athlete's data directory
+    STATE_FILE = "training_load.json"
+
+    def __init__(self, path=DEFAULT_ATHLETE.path(STATE_FILE)):
+        self.path = path
+        self.state = {"dates": [], "load": [], "atl": [], "ctl": []}
+        self.modified = False
+        if os.path.exists(path):
+            with open(path, "r") as file:
+                self.state = json.load(file)
+
+    def _index(self, day: date):
+        return (day - date.fromisoformat(self.state["dates"][0])).days
+
+    def _trim(self, first: date, last: date):
+        """
+        Drop stored days before `first` and after `last`. Returns whether
+        days before `first` were dropped.
+        """
+        if len(self.state["dates"]) == 0:
+            return False
+        start = max(self._index(first), 0)
+        end = max(self._index(last) + 1, 0)
+        if start == 0 and end >= len(self.state["dates"]):
+            return False
+        self.state = {k: v[start:end] for k, v in self.state.items()}
+        self.modified = True
+        return start > 0
+
+    def _extend(self, first: date, last: date):
+        """
+        Add days without load so that the stored days span `first` to
+        `last`. Returns the index of the first day added, if any.
+        """
+        stored = self.state["dates"]
+        if len(stored) == 0:
+            before, after = 0, (last - first).days + 1
+            start = first
+        else:
+            start = min(first, date.fromisoformat(stored[0]))
+            before = (date.fromisoformat(stored[0]) - start).days
+            after = max((last - date.fromisoformat(stored[-1])).days, 0)
+        if before == 0 and after == 0:
+            return None
+
+        added = 0 if before > 0 else len(stored)
+        new_dates = [
+            date_to_str(start + timedelta(days=i))
+            for i in range(before + len(stored) + after)
+        ]
+        self.state = {
+            "dates": new_dates,
+            **{
+                k: [0.0] * before + self.state[k] + [0.0] * after
+                for k in ("load", "atl", "ctl")
+            },
+        }
+        self.modified = True
+        return added
+
+    def _advance(self, start: int):
+        """
+        Recompute ATL and CTL from day `start` on.
+        """
+        load, atl, ctl = self.state["load"], self.state["atl"], self.state["ctl"]
+        atl_decay = 1 - math.exp(-1 / ATL_DAYS)
+        ctl_decay = 1 - math.exp(-1 / CTL_DAYS)
+        for i in range(start, len(load)):
+            previous_atl = atl[i - 1] if i > 0 else 0.0
+            previous_ctl = ctl[i - 1] if i > 0 else 0.0
+            atl[i] = previous_atl + (load[i] - previous_atl) * atl_decay
+            ctl[i] = previous_ctl + (load[i] - previous_ctl) * ctl_decay
+
+    def update(self, dates: list[date], loads: list[float], complete=True):
+        """
+        Add the daily loads of consecutive `dates` and return load, ATL, CTL
+        and TSB for them. If `complete`, the given dates are the whole
+        history and stored days outside of them are dropped.
+        """
+        if len(dates) == 0:
+            if complete and len(self.state["dates"]) > 0:
+                self.state = {k: [] for k in self.state}
+                self.modified = True
+            return {"load": [], "atl": [], "ctl": [], "tsb": []}
+        # ATL and CTL of the remaining days no longer include dropped days
+        dropped = complete and self._trim(dates[0], dates[-1])
+        changed = self._extend(dates[0], dates[-1])
+        if dropped:
+            changed = 0
+        offset = self._index(dates[0])
+        stored_loads = self.state["load"]
+        for i, load in enumerate(loads, offset):
+            if stored_loads[i] != load:
+                stored_loads[i] = load
+                changed = i if changed is None else min(changed, i)
+        if changed is not None:
+            self._advance(changed)
+            self.modified = True
+
+        end = offset + len(dates)
+        atl = self.state["atl"]
+        ctl = self.state["ctl"]
+        return {
+            "load": stored_loads[offset:end],
+            "atl": atl[offset:end],
+            "ctl": ctl[offset:end],
+            "tsb": [
+                ctl[i - 1] - atl[i - 1] if i > 0 else 0.0 for i in range(offset, end)
+            ],
+        }
+
+    def save(self):
+        if not self.modified:
+            return
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+        self.modified = False
 
 
 # w = WhoopUtils()
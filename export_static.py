@@ -0,0 +1,276 @@
+import argparse
+import json
+import os
+import re
+import shutil
+from itertools import product
+
+from streamlit_echarts import JsCode
+
+from charts import (
+    make_run_duration_distance_chart,
+    make_training_load_chart,
+    make_heart_rate_zone_chart,
+    make_pace_zone_chart,
+    make_peak_chart,
+    make_peak_pace_chart_by_month,
+    make_heart_rate_pace_chart,
+    make_shoe_chart,
+    make_shoe_wear_chart,
+    make_strength_duration_volume_chart,
+    make_one_rep_max_chart,
+    make_recovery_chart,
+    make_sleep_strain_chart,
+    make_recovery_run_correlation_chart,
+    make_heatmap_chart,
+)
+from constants import HEATMAP_MIN_ZOOM, HEATMAP_MAX_ZOOM
+from data_access import Reader
+from models.athlete import Athlete, DEFAULT_ATHLETE_ID
+from resources.resources import (
+    TIMER_HTML,
+    STATIC_INDEX_HTML,
+    STATIC_APP_JS,
+)
+from utils import m_to_km_or_mi
+
+EXPORT_DIR = "dist"
+
+# JsCode wraps the function source in this marker on both sides
+JS_MARKER = JsCode("").js_code[: len(JsCode("").js_code) // 2]
+
+# (anchor, title, [(chart, description)]), in the order of the dashboard
+SECTIONS = [
+    (
+        "road-to-2-59-59",
+        "Road to 2:59:59",
+        [
+            ("run_duration_distance", "Running distance"),
+            ("training_load", "Training load"),
+        ],
+    ),
+    (
+        "zones",
+        "Zones",
+        [("heart_rate_zones", "Heart rate zones"), ("pace_zones", "Pace zones")],
+    ),
+    (
+        "peak-heart-rate-and-pace",
+        "Peak Heart Rate and Pace",
+        [
+            ("peak_hr", "Highest average heart rate sustained over a given duration"),
+            ("peak_pace", "Fastest average pace sustained over a given distance"),
+            ("peak_pace_monthly", "Same but grouped by month"),
+            ("heart_rate_pace", "Heart Rate vs Pace"),
+        ],
+    ),
+    (
+        "shoes",
+        "Shoes",
+        [("shoe_distance", "Distance by shoe"), ("shoe_wear", "Shoe wear")],
+    ),
+    (
+        "weightlifting",
+        "Weightlifting",
+        [
+            ("strength_duration_volume", "Volume and Duration"),
+            ("one_rep_max", "One Rep Max"),
+        ],
+    ),
+    (
+        "whoop-recovery-sleep-and-strain",
+        "Whoop Recovery, Sleep, and Strain",
+        [
+            ("recovery", "Recovery"),
+            ("whoop_combined", "Sleep and Strain"),
+            ("recovery_run_correlation", "Recovery and Running"),
+        ],
+    ),
+]
+
+# Charts with one category per day (or week)
+DATE_CHARTS = {
+    "run_duration_distance",
+    "training_load",
+    "heart_rate_zones",
+    "pace_zones",
+    "shoe_wear",
+    "strength_duration_volume",
+    "one_rep_max",
+    "recovery",
+    "whoop_combined",
+}
+
+
+def make_charts(reader: Reader, weekly: bool, imperial: bool):
+    return {
+        "run_duration_distance": make_run_duration_distance_chart(
+            reader, weekly, imperial
+        ),
+        "training_load": make_training_load_chart(reader, weekly),
+        "heart_rate_zones": make_heart_rate_zone_chart(reader, weekly),
+        "pace_zones": make_pace_zone_chart(reader, weekly, imperial),
+        "peak_hr": make_peak_chart(reader, "peak_hr", "BPM", imperial),
+        "peak_pace": make_peak_chart(
+            reader,
+            "peak_pace",
+            "Pace (min/km)" if not imperial else "Pace (min/mi)",
+            imperial,
+        ),
+        "peak_pace_monthly": make_peak_pace_chart_by_month(reader, imperial),
+        "heart_rate_pace": make_heart_rate_pace_chart(reader).to_dict(),
+        "shoe_distance": make_shoe_chart(reader, imperial),
+        "shoe_wear": make_shoe_wear_chart(reader, weekly, imperial),
+        "strength_duration_volume": make_strength_duration_volume_chart(
+            reader, weekly, imperial
+        ),
+        "one_rep_max": make_one_rep_max_chart(reader, weekly, imperial),
+        "recovery": make_recovery_chart(reader, weekly),
+        "whoop_combined": make_sleep_strain_chart(reader, weekly),
+        "recovery_run_correlation": make_recovery_run_correlation_chart(reader),
+    }
+
+
+def make_metrics(reader: Reader, imperial: bool):
+    return {
+        "metric_distance": f"{round(m_to_km_or_mi(reader.get_tcx('total_run_distance'), imperial), 2)} {'km' if not imperial else 'mi'}",
+        "metric_elevation": f"{round(reader.get_tcx('total_run_elevation') * (3.28084 if imperial else 1), 2)} {'m' if not imperial else 'ft'}",
+        "metric_calories": f"{int(reader.get_tcx('total_run_calories'))} cal",
+    }
+
+
+def with_date_zoom(options: dict):
+    """
+    Daily charts get a zoom slider and let ECharts downsample lines with
+    LTTB in the browser, instead of the server doing it per rerun.
+    """
+    return {
+        **options,
+        "series": [
+            {**s, "sampling": "lttb"} if s["type"] == "line" else s
+            for s in options["series"]
+        ],
+        "dataZoom": [{"type": "inside"}, {"type": "slider"}],
+    }
+
+
+def to_js(value):
+    """
+    Serialize to a JS literal, turning JsCode placeholders back into
+    functions.
+    """
+    return re.sub(
+        f'"{JS_MARKER}((?:[^"\\\\]|\\\\.)*){JS_MARKER}"',
+        lambda m: json.loads(f'"{m.group(1)}"'),
+        json.dumps(value, ensure_ascii=False),
+    )
+
+
+def build_bundle(reader: Reader):
+    """
+    Precompute the chart specs of all four weekly/imperial variants. Specs
+    that are the same across variants (e.g. anything not depending on
+    units) are stored once and referenced by index.
+    """
+    specs, spec_index = [], {}
+
+    def add_spec(spec):
+        key = json.dumps(spec, sort_keys=True)
+        if key not in spec_index:
+            spec_index[key] = len(specs)
+            specs.append(spec)
+        return spec_index[key]
+
+    charts, metrics = {}, {}
+    for weekly, imperial in product([True, False], repeat=2):
+        variant = f"{int(weekly)}{int(imperial)}"
+        for name, options in make_charts(reader, weekly, imperial).items():
+            # Charts without data (None) show a note instead
+            if name in DATE_CHARTS and not weekly and options is not None:
+                options = with_date_zoom(options)
+            charts.setdefault(name, {})[variant] = add_spec(options)
+        metrics[variant] = make_metrics(reader, imperial)
+
+    heatmap = {
+        zoom: add_spec(make_heatmap_chart(reader, zoom))
+        for zoom in range(HEATMAP_MIN_ZOOM, HEATMAP_MAX_ZOOM + 1)
+    }
+    return {
+        "specs": specs,
+        "charts": charts,
+        "kinds": {"heart_rate_pace": "vega"},
+        "metrics": metrics,
+        "heatmap": heatmap,
+    }
+
+
+def make_index_html():
+    links = "\n".join(
+        f'<a href="#{anchor}">{title}</a>' for anchor, title, _ in SECTIONS
+    )
+    links += '\n<a href="#heatmap-section">Heatmap</a>'
+
+    sections = []
+    for anchor, title, charts in SECTIONS:
+        sections.append(f'<h2 id="{anchor}">{title}</h2>')
+        if anchor == "road-to-2-59-59":
+            sections.append(
+                '<div class="metrics">'
+                + "".join(
+                    f'<div class="metric">{label}<span id="metric_{label.lower()}"></span></div>'
+                    for label in ["Distance", "Elevation", "Calories"]
+                )
+                + "</div>"
+            )
+        for chart, description in charts:
+            sections.append(
+                f'<h3>{description}</h3>\n<div class="chart" id="{chart}"></div>'
+            )
+    sections.append(
+        '<h2 id="heatmap-section">Heatmap</h2>\n'
+        "<p>Where we run, by time spent in each spot.</p>\n"
+        f'<label>Zoom <input type="range" id="heatmap-zoom" min="{HEATMAP_MIN_ZOOM}" '
+        f'max="{HEATMAP_MAX_ZOOM}" value="{HEATMAP_MIN_ZOOM + 5}"></label>\n'
+        '<div class="chart tall" id="heatmap"></div>'
+    )
+
+    return STATIC_INDEX_HTML.replace("__LINKS__", links).replace(
+        "__SECTIONS__", "\n".join(sections)
+    )
+
+
+def export(out_dir: str = EXPORT_DIR, athlete_id: str = DEFAULT_ATHLETE_ID):
+    reader = Reader(Athlete.load(athlete_id))
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, "specs.js"), "w", encoding="utf-8") as f:
+        f.write(f"const BUNDLE = {to_js(build_bundle(reader))};\n")
+    with open(os.path.join(out_dir, "app.js"), "w", encoding="utf-8") as f:
+        f.write(STATIC_APP_JS)
+    with open(os.path.join(out_dir, "index.html"), "w", encoding="utf-8") as f:
+        f.write(make_index_html())
+    with open(os.path.join(out_dir, "timer.html"), "w", encoding="utf-8") as f:
+        f.write(TIMER_HTML)
+    shutil.copy("resources/mcmo_solid_black.png", out_dir)
+    print(f"Exported static dashboard to {out_dir}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export the dashboard as static HTML, JS and chart specs."
+    )
+    parser.add_argument(
+        "--out",
+        default=EXPORT_DIR,
+        help="Directory to write the bundle to.",
+    )
+    parser.add_argument(
+        "--athlete",
+        default=DEFAULT_ATHLETE_ID,
+        help="Athlete whose dashboard to export.",
+    )
+    args = parser.parse_args()
+    export(args.out, args.athlete)
+
+
+if __name__ == "__main__":
+    main()
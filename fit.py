@@ -0,0 +1,207 @@
+import struct
+from datetime import datetime, timedelta
+from typing import BinaryIO
+
+from tcxreader import TCXExercise, TCXTrackPoint
+
+# FIT timestamps are seconds since this date (UTC)
+FIT_EPOCH = datetime(1989, 12, 31)
+SEMICIRCLES = 2**31 / 180
+
+SESSION = 18
+LAP = 19
+RECORD = 20
+
+# Fields used per global message number: {field number: (name, scale, offset)},
+# value = raw / scale - offset
+MESSAGE_FIELDS = {
+    SESSION: {
+        2: ("start_time", 1, 0),
+        5: ("sport", 1, 0),
+        8: ("total_timer_time", 1000, 0),
+        9: ("total_distance", 100, 0),
+        11: ("total_calories", 1, 0),
+    },
+    LAP: {
+        2: ("start_time", 1, 0),
+        8: ("total_timer_time", 1000, 0),
+    },
+    RECORD: {
+        253: ("timestamp", 1, 0),
+        0: ("latitude", SEMICIRCLES, 0),
+        1: ("longitude", SEMICIRCLES, 0),
+        2: ("altitude", 5, 500),
+        3: ("heart_rate", 1, 0),
+        5: ("distance", 100, 0),
+        6: ("speed", 1000, 0),
+        73: ("enhanced_speed", 1000, 0),
+        78: ("enhanced_altitude", 5, 500),
+    },
+}
+
+# Base type number: (struct format, invalid value); NaN floats are invalid too
+BASE_TYPES = {
+    0x00: ("B", 0xFF),
+    0x01: ("b", 0x7F),
+    0x02: ("B", 0xFF),
+    0x03: ("h", 0x7FFF),
+    0x04: ("H", 0xFFFF),
+    0x05: ("i", 0x7FFFFFFF),
+    0x06: ("I", 0xFFFFFFFF),
+    0x08: ("f", None),
+    0x09: ("d", None),
+    0x0A: ("B", 0x00),
+    0x0B: ("H", 0x0000),
+    0x0C: ("I", 0x00000000),
+    0x0E: ("q", 0x7FFFFFFFFFFFFFFF),
+    0x0F: ("Q", 0xFFFFFFFFFFFFFFFF),
+    0x10: ("Q", 0x0000000000000000),
+}
+
+# FIT sport enum to TCX activity types
+SPORTS = {0: "Other", 1: "Running", 2: "Biking"}
+
+
+def _read_definition(data: bytes, pos: int, header: int, definitions: dict):
+    """
+    Parse a definition message into a struct for its data messages that
+    unpacks the fields we use and skips the rest. Returns the new position.
+    """
+    big_endian = data[pos + 1] == 1
+    message_number = struct.unpack_from(">H" if big_endian else "<H", data, pos + 2)[0]
+    field_count = data[pos + 4]
+    pos += 5
+
+    used = MESSAGE_FIELDS.get(message_number, {})
+    fmt = ">" if big_endian else "<"
+    fields = []
+    for _ in range(field_count):
+        number, size, base_type = data[pos], data[pos + 1], data[pos + 2] & 0x1F
+        pos += 3
+        type_fmt, invalid = BASE_TYPES.get(base_type, (None, None))
+        if number in used and type_fmt and struct.calcsize(type_fmt) == size:
+            fmt += type_fmt
+            fields.append((*used[number], invalid))
+        else:
+            fmt += f"{size}x"
+    if header & 0x20:
+        # Developer fields are skipped
+        developer_count = data[pos]
+        pos += 1
+        fmt += "".join(f"{data[pos + 3 * i + 1]}x" for i in range(developer_count))
+        pos += 3 * developer_count
+
+    definitions[header & 0x0F] = (message_number, struct.Struct(fmt), fields)
+    return pos
+
+
+def decode_fit(data: bytes):
+    """
+    Session, lap and record messages of a FIT file, as lists of
+    {name: value}.
+    """
+    if len(data) < 12 or data[8:12] != b".FIT":
+        raise ValueError("Not a FIT file")
+    header_size = data[0]
+    end = header_size + struct.unpack_from("<I", data, 4)[0]
+
+    definitions = {}
+    messages = {SESSION: [], LAP: [], RECORD: []}
+    last_timestamp = 0
+    pos = header_size
+    while pos < end:
+        header = data[pos]
+        pos += 1
+        timestamp = None
+        if header & 0x80:
+            # Compressed timestamp header: 5 bit offset from the last timestamp
+            local_type = (header >> 5) & 0x03
+            timestamp = last_timestamp + ((header & 0x1F) - last_timestamp) % 0x20
+        elif header & 0x40:
+            pos = _read_definition(data, pos, header, definitions)
+            continue
+        else:
+            local_type = header & 0x0F
+
+        message_number, message_struct, fields = definitions[local_type]
+        values = message_struct.unpack_from(data, pos)
+        pos += message_struct.size
+        message = {}
+        for (name, scale, offset, invalid), raw in zip(fields, values):
+            if raw == invalid or raw != raw:
+                continue
+            message[name] = raw / scale - offset if scale != 1 or offset else raw
+        if "timestamp" in message:
+            last_timestamp = message["timestamp"]
+        elif timestamp is not None:
+            message["timestamp"] = last_timestamp = timestamp
+        if message_number in messages:
+            messages[message_number].append(message)
+    return messages[SESSION], messages[LAP], messages[RECORD]
+
+
+def read_fit(file: str | BinaryIO):
+    """
+    Read a FIT activity, from a path or a binary file object, into the same
+    TCXExercise that TCXReader returns for the equivalent TCX file.
+    """
+    if isinstance(file, str):
+        with open(file, "rb") as f:
+            return read_fit(f)
+    return fit_to_exercise(*decode_fit(file.read()))
+
+
+def fit_to_exercise(sessions: list[dict], laps: list[dict], records: list[dict]):
+    trackpoints = []
+    for record in records:
+        if "timestamp" not in record:
+            continue
+        speed = record.get("enhanced_speed", record.get("speed"))
+        trackpoints.append(
+            TCXTrackPoint(
+                longitude=record.get("longitude"),
+                latitude=record.get("latitude"),
+                elevation=record.get("enhanced_altitude", record.get("altitude")),
+                time=FIT_EPOCH + timedelta(seconds=record["timestamp"]),
+                distance=record.get("distance"),
+                hr_value=record.get("heart_rate"),
+                tpx_ext={} if speed is None else {"Speed": speed},
+            )
+        )
+
+    # Summed over sessions like TCXReader sums laps; ascent is derived from
+    # the trackpoints the same way too
+    ascent = 0
+    elevations = [t.elevation for t in trackpoints if t.elevation is not None]
+    for previous, elevation in zip(elevations, elevations[1:]):
+        ascent += max(elevation - previous, 0)
+
+    # Start and moving (timer) time of the sessions, or of the laps if there
+    # are no sessions; the trackpoints are the fallback. Without any of them
+    # the start time is None.
+    summaries = sessions or laps
+    start_times = [s["start_time"] for s in summaries if "start_time" in s]
+    if start_times:
+        start_time = FIT_EPOCH + timedelta(seconds=min(start_times))
+    elif trackpoints:
+        start_time = trackpoints[0].time
+    else:
+        start_time = None
+    end_time = trackpoints[-1].time if trackpoints else start_time
+    timer_times = [s["total_timer_time"] for s in summaries if "total_timer_time" in s]
+    if timer_times:
+        duration = sum(timer_times)
+    elif trackpoints:
+        duration = (end_time - start_time).total_seconds()
+    else:
+        duration = 0
+    return TCXExercise(
+        trackpoints=trackpoints,
+        activity_type=SPORTS.get(sessions[0].get("sport") if sessions else 0, "Other"),
+        calories=sum(s.get("total_calories", 0) for s in sessions),
+        start_time=start_time,
+        end_time=end_time,
+        duration=duration,
+        ascent=ascent,
+        distance=sum(s.get("total_distance", 0) for s in sessions),
+    )
@@ -0,0 +1,89 @@
+import hashlib
+import os
+import pickle
+import tempfile
+from typing import Any, Callable
+
+MEMO_DIR = "data/.memo"
+MEMO_MAX_BYTES = 256 * 1024 * 1024
+# Bump whenever a memoized analytic changes, so stale results aren't reused.
+ALGORITHM_VERSION = 4
+
+
+class MemoStore:
+    """
+    Disk-backed, content-addressed memo store for per-workout results.
+
+    Entries are keyed by a hash of everything the result depends on (usually
+    a hash of the workout's trackpoints, the analytic's name, its parameters
+    such as zone definitions, and ALGORITHM_VERSION). When the store grows
+    beyond `max_bytes`, least recently used entries are evicted.
+    """
+
+    def __init__(self, directory=MEMO_DIR, max_bytes=MEMO_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(
+            entry.stat().st_size
+            for entry in os.scandir(directory)
+            if entry.name.endswith(".pkl")
+        )
+
+    @staticmethod
+    def key(*parts: Any):
+        return hashlib.sha256(repr((ALGORITHM_VERSION, parts)).encode()).hexdigest()
+
+    def _path(self, key: str):
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def get(self, key: str, default=None):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            return default
+        except Exception:
+            # Truncated, or pickled with an incompatible version of a library
+            return default
+        os.utime(path)  # Mark as recently used
+        return value
+
+    def put(self, key: str, value: Any):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        self._size += os.path.getsize(tmp_path)
+        os.replace(tmp_path, self._path(key))
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def memoize(self, parts: tuple, compute: Callable[[], Any]):
+        key = self.key(*parts)
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def evict(self):
+        """
+        Delete least recently used entries until the store is at 90% of its
+        size limit.
+        """
+        entries = sorted(
+            (e for e in os.scandir(self.directory) if e.name.endswith(".pkl")),
+            key=lambda e: e.stat().st_mtime,
+        )
+        self._size = sum(e.stat().st_size for e in entries)
+        for entry in entries:
+            if self._size <= self.max_bytes * 0.9:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+            except FileNotFoundError:
+                continue  # Evicted by another process
+            self._size -= size
@@ -0,0 +1,85 @@
+import json
+import os
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from constants import PLAN_START_DATE, RESTING_HEART_RATE, MAX_HEART_RATE
+from enums import HeartRateZone, PaceZone
+
+DEFAULT_DATA_DIR = "data"
+# One directory per athlete, laid out like DEFAULT_DATA_DIR
+ATHLETES_DIR = "data/athletes"
+CONFIG_FILE = "athlete.json"
+DEFAULT_ATHLETE_ID = "default"
+
+
+@dataclass
+class Athlete:
+    """
+    Where an athlete's data lives and the settings their series are computed
+    with. Heart rate zones are (name, min bpm, max bpm) and pace zones
+    (min/mi label, min/km label, min m/s, max m/s), bounds inclusive.
+    """
+
+    athlete_id: str
+    data_dir: str
+    name: str = ""
+    plan_start_date: datetime = PLAN_START_DATE
+    resting_heart_rate: int = RESTING_HEART_RATE
+    max_heart_rate: int = MAX_HEART_RATE
+    heart_rate_zones: list[tuple[str, int, int]] = field(
+        default_factory=lambda: [zone.value for zone in HeartRateZone]
+    )
+    pace_zones: list[tuple[str, str, float, float]] = field(
+        default_factory=lambda: [
+            (zone.min_mi, zone.min_km, zone.min_speed, zone.max_speed)
+            for zone in PaceZone
+        ]
+    )
+
+    def path(self, *parts: str):
+        return os.path.join(self.data_dir, *parts)
+
+    @classmethod
+    def load(cls, athlete_id: str):
+        """
+        The athlete's settings from CONFIG_FILE in their directory; anything
+        not set there falls back to the single-athlete defaults.
+        """
+        if athlete_id == DEFAULT_ATHLETE_ID:
+            data_dir = DEFAULT_DATA_DIR
+        else:
+            data_dir = os.path.join(ATHLETES_DIR, athlete_id)
+            if not os.path.isdir(data_dir):
+                raise ValueError(f"Unknown athlete: {athlete_id}")
+
+        config = {}
+        if os.path.exists(os.path.join(data_dir, CONFIG_FILE)):
+            with open(os.path.join(data_dir, CONFIG_FILE), "r") as file:
+                config = json.load(file)
+        if "plan_start_date" in config:
+            config["plan_start_date"] = datetime.fromisoformat(
+                config["plan_start_date"]
+            )
+        for key in ["heart_rate_zones", "pace_zones"]:
+            if key in config:
+                config[key] = [tuple(zone) for zone in config[key]]
+        return cls(athlete_id=athlete_id, data_dir=data_dir, **config)
+
+
+def athlete_ids():
+    """
+    Athletes with a directory in ATHLETES_DIR, or just the default athlete
+    (whose data is in DEFAULT_DATA_DIR) if there are none.
+    """
+    if not os.path.isdir(ATHLETES_DIR):
+        return [DEFAULT_ATHLETE_ID]
+    ids = sorted(
+        d
+        for d in os.listdir(ATHLETES_DIR)
+        if os.path.isdir(os.path.join(ATHLETES_DIR, d))
+    )
+    return ids if len(ids) > 0 else [DEFAULT_ATHLETE_ID]
+
+
+DEFAULT_ATHLETE = Athlete(athlete_id=DEFAULT_ATHLETE_ID, data_dir=DEFAULT_DATA_DIR)
@@ -1,8 +1,114 @@
+import json
 from dataclasses import dataclass
 from datetime import datetime
 
+import numpy as np
+
 
 @dataclass
 class MinimalRun:
     start_time: datetime
     distance: float
+
+
+@dataclass
+class ActivityStreams:
+    """
+    Per-activity Strava streams stored column-wise. Missing samples (e.g. no
+    heart rate strap) are NaN.
+    """
+
+    activity_id: int
+    sport_type: str
+    start_time: datetime
+    distance: float
+    duration: float
+    ascent: float
+    time: np.ndarray  # seconds since start_time
+    heartrate: np.ndarray
+    velocity_smooth: np.ndarray
+    distance_stream: np.ndarray
+    altitude: np.ndarray
+    latitude: np.ndarray
+    longitude: np.ndarray
+
+    KEYS = ["time", "heartrate", "velocity_smooth", "distance", "altitude", "latlng"]
+
+    @staticmethod
+    def from_api(activity: dict, streams: dict):
+        """
+        Build from an activity summary and a `key_by_type=true` streams
+        response of the Strava API.
+        """
+        time = np.asarray(streams["time"]["data"], dtype=np.int32)
+
+        def column(key, dtype=np.float32):
+            if key not in streams:
+                return np.full(len(time), np.nan, dtype=dtype)
+            return np.asarray(
+                [np.nan if v is None else v for v in streams[key]["data"]],
+                dtype=dtype,
+            )
+
+        if "latlng" in streams:
+            latlng = np.asarray(streams["latlng"]["data"], dtype=np.float64)
+        else:
+            latlng = np.full((len(time), 2), np.nan)
+
+        return ActivityStreams(
+            activity_id=activity["id"],
+            sport_type=activity["type"],
+            start_time=datetime.strptime(activity["start_date"], "%Y-%m-%dT%H:%M:%SZ"),
+            distance=activity["distance"],
+            duration=activity["elapsed_time"],
+            ascent=activity["total_elevation_gain"],
+            time=time,
+            heartrate=column("heartrate"),
+            velocity_smooth=column("velocity_smooth"),
+            distance_stream=column("distance"),
+            altitude=column("altitude"),
+            latitude=latlng[:, 0],
+            longitude=latlng[:, 1],
+        )
+
+    def save(self, path: str):
+        meta = {
+            "activity_id": self.activity_id,
+            "sport_type": self.sport_type,
+            "start_time": self.start_time.isoformat(),
+            "distance": self.distance,
+            "duration": self.duration,
+            "ascent": self.ascent,
+        }
+        with open(path, "wb") as f:
+            np.savez_compressed(
+                f,
+                meta=np.array(json.dumps(meta)),
+                time=self.time,
+                heartrate=self.heartrate,
+                velocity_smooth=self.velocity_smooth,
+                distance=self.distance_stream,
+                altitude=self.altitude,
+                latitude=self.latitude,
+                longitude=self.longitude,
+            )
+
+    @staticmethod
+    def load(path: str):
+        with np.load(path) as npz:
+            meta = json.loads(str(npz["meta"]))
+            return ActivityStreams(
+                activity_id=meta["activity_id"],
+                sport_type=meta["sport_type"],
+                start_time=datetime.fromisoformat(meta["start_time"]),
+                distance=meta["distance"],
+                duration=meta["duration"],
+                ascent=meta["ascent"],
+                time=npz["time"],
+                heartrate=npz["heartrate"],
+                velocity_smooth=npz["velocity_smooth"],
+                distance_stream=npz["distance"],
+                altitude=npz["altitude"],
+                latitude=npz["latitude"],
+                longitude=npz["longitude"],
+            )
@@ -1,11 +1,18 @@
+import argparse
 import json
 import os
+import threading
 import time
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from dotenv import load_dotenv
 
 import requests
 import webbrowser
+from requests.adapters import HTTPAdapter
+
+from models.athlete import Athlete, DEFAULT_ATHLETE, DEFAULT_ATHLETE_ID
+from models.strava import ActivityStreams
 
 load_dotenv()
 
@@ -15,8 +22,25 @@ CLIENT_SECRET = os.getenv("STRAVA_CLIENT_SECRET")
 REDIRECT_URI = "http://localhost/exchange_token"  # Can be any valid redirect URI
 ACCESS_TOKEN_URL = "https://www.strava.com/oauth/token"
 AUTHORIZE_URL = "https://www.strava.com/oauth/authorize"
-ACTIVITIES_URL = "https://www.strava.com/api/v3/athlete/activities"
-GEAR_URL = "https://www.strava.com/api/v3/gear"
+API_URL = "https://www.strava.com/api/v3"
+ACTIVITIES_PATH = "/athlete/activities"
+GEAR_PATH = "/gear"
+STREAMS_PATH = "/activities/{}/streams"
+MAX_PER_PAGE = 200  # Largest page size the activities endpoint accepts
+PAGE_WINDOW = 4  # Maximum number of pages requested concurrently
+MAX_RETRIES = 5
+RATE_LIMIT_PERIOD = 15 * 60  # Short-term limits reset every quarter hour
+DAILY_RATE_LIMIT_PERIOD = 24 * 60 * 60  # Daily limits reset at midnight UTC
+
+# Relative to the athlete's data directory
+ACTIVITIES_FILE = "strava_activities.json"
+ACTIVITIES_BY_GEAR_FILE = "strava_activities_by_gear.json"
+GEAR_CACHE_FILE = "strava_gear_cache.json"
+GEAR_CACHE_TTL = 7 * 24 * 60 * 60  # Gear metadata rarely changes
+SYNC_STATE_FILE = "strava_sync_state.json"
+STREAMS_DIR = "strava_streams"
+TOKEN_FILE = "strava_token.json"
+TOKEN_EXPIRY_MARGIN = 5 * 60  # Renew access tokens this long before they expire
 
 
 def read_json_file(file):
@@ -61,55 +85,342 @@ def exchange_code_for_token(auth_code):
 
     response = requests.post(ACCESS_TOKEN_URL, data=payload)
     if response.status_code == 200:
-        token_info = response.json()
-        return token_info["access_token"]
+        return response.json()
     else:
         print(f"Failed to get access token: {response.status_code}")
         print(response.text)
         return None
 
 
+class TokenStore:
+    """
+    Persists an athlete's OAuth tokens so that expired access tokens can be
+    renewed with the refresh token, without a browser or any user input.
+    """
+
+    def __init__(self, athlete: Athlete = DEFAULT_ATHLETE, token_url=ACCESS_TOKEN_URL):
+        self.athlete = athlete
+        self.path = athlete.path(TOKEN_FILE)
+        self.token_url = token_url
+        self._lock = threading.Lock()
+        self._tokens = read_json_file(self.path) if os.path.exists(self.path) else None
+
+    @property
+    def authorized(self):
+        return self._tokens is not None
+
+    def save(self, token_info):
+        self._tokens = {
+            "access_token": token_info["access_token"],
+            "refresh_token": token_info["refresh_token"],
+            "expires_at": token_info["expires_at"],
+        }
+        write_json_file(self.path, self._tokens)
+
+    def access_token(self):
+        with self._lock:
+            if self._tokens["expires_at"] - TOKEN_EXPIRY_MARGIN < time.time():
+                self._refresh()
+            return self._tokens["access_token"]
+
+    def refresh(self):
+        with self._lock:
+            self._refresh()
+
+    def _refresh(self):
+        print("Refreshing Strava access token...")
+        payload = {
+            "client_id": CLIENT_ID,
+            "client_secret": CLIENT_SECRET,
+            "grant_type": "refresh_token",
+            "refresh_token": self._tokens["refresh_token"],
+        }
+        response = requests.post(self.token_url, data=payload, timeout=30)
+        response.raise_for_status()
+        self.save(response.json())
+
+
+class DailyRateLimitExceeded(requests.HTTPError):
+    """
+    Raised instead of sending a request once Strava's daily budget is used
+    up. It's an HTTPError, so callers that skip failed requests skip these.
+    """
+
+
+class StravaClient:
+    """
+    Thin wrapper around a pooled requests.Session that retries failed
+    requests and pauses when Strava's rate limit headers say we are out of
+    budget. Safe to share between threads. Acts for the athlete whose tokens
+    it uses, and the sync functions store data in that athlete's directory.
+    """
+
+    def __init__(self, tokens: TokenStore, api_url=API_URL, pool_size=PAGE_WINDOW):
+        self.tokens = tokens
+        self.athlete = tokens.athlete
+        self.api_url = api_url
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+        # Requests are refused until the daily budget resets
+        self._exhausted_until = 0.0
+
+    def get(self, path, params=None):
+        refreshed = False
+        for attempt in range(MAX_RETRIES):
+            self._wait_for_rate_limit()
+            if time.time() < self._exhausted_until:
+                raise DailyRateLimitExceeded(
+                    f"Strava daily rate limit exhausted, not requesting {path}"
+                )
+            response = self.session.get(
+                f"{self.api_url}{path}",
+                params=params,
+                headers={"Authorization": f"Bearer {self.tokens.access_token()}"},
+                timeout=30,
+            )
+            self._update_rate_limit(response.headers)
+            if response.status_code == 200:
+                return response.json()
+            if response.status_code == 401 and not refreshed:
+                # Token revoked or expired early, renew it once
+                self.tokens.refresh()
+                refreshed = True
+                continue
+            if response.status_code == 429 or response.status_code >= 500:
+                delay = float(response.headers.get("Retry-After", 2**attempt))
+                print(f"Request to {path} failed ({response.status_code}), retrying...")
+                self._pause(delay)
+                continue
+            response.raise_for_status()
+        raise requests.HTTPError(f"Giving up on {path} after {MAX_RETRIES} attempts")
+
+    def _pause(self, seconds):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.time() + seconds)
+
+    def _wait_for_rate_limit(self):
+        while True:
+            with self._lock:
+                remaining = self._paused_until - time.time()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
+
+    def _update_rate_limit(self, headers):
+        # Both headers are "<15 minute>,<daily>" pairs; read endpoints have
+        # their own, stricter, X-ReadRateLimit-* budget.
+        for prefix in ("X-RateLimit", "X-ReadRateLimit"):
+            limit = headers.get(f"{prefix}-Limit")
+            usage = headers.get(f"{prefix}-Usage")
+            if not limit or not usage:
+                continue
+            short_limit, daily_limit = [int(x) for x in limit.split(",")]
+            short_usage, daily_usage = [int(x) for x in usage.split(",")]
+            if daily_usage >= daily_limit:
+                # The response at hand is still used; only later requests
+                # are refused
+                now = time.time()
+                print("Strava daily rate limit reached, stopping until tomorrow...")
+                with self._lock:
+                    self._exhausted_until = (
+                        now // DAILY_RATE_LIMIT_PERIOD + 1
+                    ) * DAILY_RATE_LIMIT_PERIOD
+            if short_usage >= short_limit:
+                now = time.time()
+                next_period = (now // RATE_LIMIT_PERIOD + 1) * RATE_LIMIT_PERIOD
+                print("Strava rate limit reached, waiting for the next period...")
+                self._pause(next_period - now)
+
+
 # Step 3: Fetch Recent Activities from Strava API
-def fetch_activities(access_token, from_date, to_date):
-    headers = {"Authorization": f"Bearer {access_token}"}
+def fetch_activities(
+    client: StravaClient, after: int = None, before: int = None, window=PAGE_WINDOW
+):
+    return [
+        activity
+        for page in fetch_activity_pages(client, after, before, window)
+        for activity in page
+    ]
+
+
+def fetch_activity_pages(
+    client: StravaClient, after: int = None, before: int = None, window=PAGE_WINDOW
+):
+    """
+    Pages of activities in page order. With `after` set, Strava returns
+    the oldest activities first, so every prefix of the pages is complete up
+    to its last activity. A failed page stops the iteration there.
+    """
+    params = {"per_page": MAX_PER_PAGE}
+    if after is not None:
+        params["after"] = after
+    if before is not None:
+        params["before"] = before
+
+    def fetch_page(page):
+        print(f"Fetching page {page}...")
+        return client.get(ACTIVITIES_PATH, {**params, "page": page})
 
-    activities = []
+    # Pages are requested in concurrent batches that start with a single
+    # page and double up to `window`, so short syncs don't over-fetch.
     page = 1
-    while True:
-        print(f"Fetching page {page}...")
-        params = {
-            "after": int(time.mktime(from_date.timetuple())),
-            "before": int(time.mktime(to_date.timetuple())),
-            "page": page,
-        }
-        response = requests.get(ACTIVITIES_URL, headers=headers, params=params)
-        if response.status_code == 200:
-            activities_page = response.json()
-            if len(activities_page) == 0:
-                break
-            page += 1
-            activities.extend(activities_page)
+    batch_size = 1
+    done = False
+    with ThreadPoolExecutor(max_workers=window) as executor:
+        while not done:
+            pages = executor.map(fetch_page, range(page, page + batch_size))
+            for activities_page in pages:
+                yield activities_page
+                # An empty or partial page is the last one
+                if len(activities_page) < MAX_PER_PAGE:
+                    done = True
+                    break
+            page += batch_size
+            batch_size = min(batch_size * 2, window)
+
+
+def activity_epoch(activity):
+    start_date = datetime.strptime(activity["start_date"], "%Y-%m-%dT%H:%M:%SZ")
+    return int(start_date.replace(tzinfo=timezone.utc).timestamp())
+
+
+def read_sync_state(athlete: Athlete, activities):
+    """
+    The stored sync state, or one rebuilt from the stored activities if there
+    is none (e.g. they were downloaded before syncs were incremental).
+    """
+    if os.path.exists(athlete.path(SYNC_STATE_FILE)):
+        return read_json_file(athlete.path(SYNC_STATE_FILE))
+    return {
+        "high_water_mark": max(map(activity_epoch, activities), default=None),
+        "activity_ids": sorted(a["id"] for a in activities),
+    }
 
-    # dump to a JSON file
-    write_json_file("data/strava_activities.json", activities)
 
+def sync_activities(client: StravaClient, from_date=None, to_date=None, full=False):
+    """
+    Bring the client's athlete's activity store up to date. Unless `full` is
+    set (or there is no store yet), only activities after the stored
+    high-water mark are requested; they are merged into the store by
+    activity id.
+
+    The store is saved after every page, so a sync stopped by the daily rate
+    limit resumes from where it stopped.
+    """
+    athlete = client.athlete
+    if full or not os.path.exists(athlete.path(ACTIVITIES_FILE)):
+        activities = []
+        state = {"high_water_mark": None, "activity_ids": []}
+    else:
+        activities = read_json_file(athlete.path(ACTIVITIES_FILE))
+        state = read_sync_state(athlete, activities)
+
+    if state["high_water_mark"] is not None:
+        after = state["high_water_mark"]
+    else:
+        after = int(time.mktime((from_date or athlete.plan_start_date).timetuple()))
+    before = int(time.mktime(to_date.timetuple())) if to_date else None
+
+    activity_ids = set(state["activity_ids"])
+    fetched = 0
+    try:
+        for page in fetch_activity_pages(client, after, before):
+            new_activities = [a for a in page if a["id"] not in activity_ids]
+            fetched += len(new_activities)
+            activities.extend(new_activities)
+            activities.sort(key=activity_epoch)
+            activity_ids.update(a["id"] for a in new_activities)
+            if len(activities) > 0:
+                state["high_water_mark"] = activity_epoch(activities[-1])
+            state["activity_ids"] = sorted(activity_ids)
+            write_json_file(athlete.path(ACTIVITIES_FILE), activities)
+            write_json_file(athlete.path(SYNC_STATE_FILE), state)
+    except DailyRateLimitExceeded as e:
+        print(f"{e}; the next sync continues from here")
+    print(f"Fetched {fetched} new activities")
     return activities
 
 
-def fetch_gear(access_token, gear_ids: set[str]):
-    headers = {"Authorization": f"Bearer {access_token}"}
+def read_gear_cache(athlete: Athlete):
+    if not os.path.exists(athlete.path(GEAR_CACHE_FILE)):
+        return {}
+    return read_json_file(athlete.path(GEAR_CACHE_FILE))
 
-    gear = []
-    for gear_id in gear_ids:
-        print(f"Fetching gear {gear_id}...")
-        response = requests.get(f"{GEAR_URL}/{gear_id}", headers=headers)
-        if response.status_code == 200:
-            gear_response = response.json()
-            gear.append(gear_response)
 
-    # dump to a JSON file
-    write_json_file("data/strava_gear.json", gear)
-    return gear
+def fetch_gear(client: StravaClient, gear_ids: set[str], ttl=GEAR_CACHE_TTL):
+    """
+    Refresh the gear cache for the given ids. Only ids that are not cached
+    yet, or whose entry is older than `ttl` seconds, are requested.
+    """
+    gear_cache = read_gear_cache(client.athlete)
+    now = time.time()
+    stale_ids = [
+        gear_id
+        for gear_id in gear_ids
+        if gear_id not in gear_cache or now - gear_cache[gear_id]["fetched_at"] > ttl
+    ]
+
+    def fetch(gear_id):
+        print(f"Fetching gear {gear_id}...")
+        try:
+            return gear_id, client.get(f"{GEAR_PATH}/{gear_id}")
+        except requests.HTTPError as e:
+            print(f"Failed to fetch gear {gear_id}: {e}")
+            return gear_id, None
+
+    with ThreadPoolExecutor(max_workers=PAGE_WINDOW) as executor:
+        for gear_id, gear in executor.map(fetch, stale_ids):
+            # Keep serving a stale entry if refreshing it failed
+            if gear is not None:
+                gear_cache[gear_id] = {"fetched_at": now, "gear": gear}
+
+    write_json_file(client.athlete.path(GEAR_CACHE_FILE), gear_cache)
+    return gear_cache
+
+
+def stream_file(athlete: Athlete, activity_id):
+    return athlete.path(STREAMS_DIR, f"{activity_id}.npz")
+
+
+def fetch_streams(client: StravaClient, activities, sport_type="Run"):
+    """
+    Download the streams of every activity of the given type that has no
+    stream file yet, a few activities at a time.
+    """
+    athlete = client.athlete
+    os.makedirs(athlete.path(STREAMS_DIR), exist_ok=True)
+    missing = [
+        a
+        for a in activities
+        if a.get("type") == sport_type
+        and not os.path.exists(stream_file(athlete, a["id"]))
+    ]
+
+    def fetch(activity):
+        print(f"Fetching streams for activity {activity['id']}...")
+        try:
+            streams = client.get(
+                STREAMS_PATH.format(activity["id"]),
+                {"keys": ",".join(ActivityStreams.KEYS), "key_by_type": "true"},
+            )
+        except requests.HTTPError as e:
+            print(f"Failed to fetch streams for activity {activity['id']}: {e}")
+            return False
+        if "time" not in streams:
+            return False
+        ActivityStreams.from_api(activity, streams).save(
+            stream_file(athlete, activity["id"])
+        )
+        return True
+
+    with ThreadPoolExecutor(max_workers=PAGE_WINDOW) as executor:
+        fetched = sum(executor.map(fetch, missing))
+    print(f"Fetched streams for {fetched} activities")
+    return fetched
 
 
 def extract_gear_from_activities(activities):
@@ -134,39 +445,96 @@ def extract_activity_stats(activity):
     }
 
 
-def get_group_activities_by_gear(gear, activities):
-    gear_map = {g["id"]: g for g in gear}
+def modify_gear_name(gear_name: str):
+    saucony_end_speed_3 = "Saucony Endorphin Speed 3"
+    if gear_name.startswith(saucony_end_speed_3):
+        return saucony_end_speed_3
+    return gear_name
+
+
+def get_group_activities_by_gear(athlete: Athlete, activities):
+    gear_cache = read_gear_cache(athlete)
     grouped = {}
     for activity in activities:
         gear_id = activity.get("gear_id")
         activity_stats = extract_activity_stats(activity)
         if gear_id:
-            gear = gear_map.get(gear_id)
-            if gear:
-                gear_name = gear.get("name")
+            cached = gear_cache.get(gear_id)
+            if cached:
+                gear_name = modify_gear_name(cached["gear"].get("name"))
                 if gear_name not in grouped:
                     grouped[gear_name] = []
                 grouped[gear_name].append(activity_stats)
-    write_json_file("data/strava_activities_by_gear.json", grouped)
+    write_json_file(athlete.path(ACTIVITIES_BY_GEAR_FILE), grouped)
     return grouped
 
 
+def sync(client: StravaClient, from_date=None, to_date=None, full=False, streams=False):
+    activities = sync_activities(client, from_date, to_date, full)
+    gear_ids = extract_gear_from_activities(activities)
+    fetch_gear(client, gear_ids)
+    get_group_activities_by_gear(client.athlete, activities)
+    if streams:
+        fetch_streams(client, activities)
+    return activities
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Sync activities from Strava.")
+    parser.add_argument(
+        "--authorize",
+        action="store_true",
+        help="Go through the browser authorization even if a token is stored.",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Re-download every activity instead of syncing incrementally.",
+    )
+    parser.add_argument(
+        "--from",
+        dest="from_date",
+        type=datetime.fromisoformat,
+        help="Start of the first (or full) sync, defaults to the plan start.",
+    )
+    parser.add_argument(
+        "--to",
+        dest="to_date",
+        type=datetime.fromisoformat,
+        help="Only sync activities before this date.",
+    )
+    parser.add_argument(
+        "--streams",
+        action="store_true",
+        help="Also download the streams of runs that have none stored yet.",
+    )
+    parser.add_argument(
+        "--athlete",
+        default=DEFAULT_ATHLETE_ID,
+        help="Athlete to sync, whose data and token are in their directory.",
+    )
+    return parser.parse_args()
+
+
 # Main script flow
 def main():
-    # Step 1: Get authorization code
-    auth_code = get_authorization_code()
-
-    # Step 2: Exchange authorization code for access token
-    access_token = exchange_code_for_token(auth_code)
-
-    if access_token:
-        # Step 3: Fetch recent activities
-        from_date = datetime(2024, 7, 1)
-        to_date = datetime(2024, 10, 27)
-        activities = fetch_activities(access_token, from_date, to_date)
-        gear_ids = extract_gear_from_activities(activities)
-        gear = fetch_gear(access_token, gear_ids)
-        activities_by_gear = get_group_activities_by_gear(gear, activities)
+    args = parse_args()
+    tokens = TokenStore(Athlete.load(args.athlete))
+
+    # Steps 1 and 2 are only needed once, afterwards the stored refresh token
+    # is used to renew the access token.
+    if args.authorize or not tokens.authorized:
+        # Step 1: Get authorization code
+        auth_code = get_authorization_code()
+
+        # Step 2: Exchange authorization code for access and refresh tokens
+        token_info = exchange_code_for_token(auth_code)
+        if token_info is None:
+            return
+        tokens.save(token_info)
+
+    # Step 3: Fetch new activities
+    sync(StravaClient(tokens), args.from_date, args.to_date, args.full, args.streams)
 
 
 if __name__ == "__main__":
@@ -104,3 +104,97 @@ _SHOE_FORMATTER = """function (params) {
     "\n", " "
 )
 SHOE_FORMATTER = re.sub(r"\s+", " ", _SHOE_FORMATTER)
+
+STATIC_INDEX_HTML = """<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="utf-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1">
+    <title>Road to 2:59:59</title>
+    <script src="https://cdn.jsdelivr.net/npm/echarts@5/dist/echarts.min.js"></script>
+    <script src="https://cdn.jsdelivr.net/npm/vega@5"></script>
+    <script src="https://cdn.jsdelivr.net/npm/vega-lite@5"></script>
+    <script src="https://cdn.jsdelivr.net/npm/vega-embed@6"></script>
+    <style>
+        body { margin: 0; font-family: sans-serif; display: flex; }
+        nav { width: 220px; padding: 1rem; position: sticky; top: 0; height: 100vh; box-sizing: border-box; }
+        nav img { width: 100%; }
+        nav a { display: block; margin: 0.3rem 0; }
+        main { flex: 1; max-width: 1000px; padding: 1rem 2rem; }
+        .chart { width: 100%; height: 400px; }
+        .chart.tall { height: 600px; }
+        .metrics { display: flex; gap: 3rem; }
+        .metric span { display: block; font-size: 2rem; }
+        #timer { width: 100%; height: 150px; border: none; }
+    </style>
+</head>
+<body>
+    <nav>
+        <img src="mcmo_solid_black.png">
+        <hr>
+        <label><input type="checkbox" id="weekly" checked> Group by week</label><br>
+        <label><input type="checkbox" id="imperial" checked> Imperial units</label>
+        <hr>
+        __LINKS__
+    </nav>
+    <main>
+        <iframe id="timer" src="timer.html"></iframe>
+        __SECTIONS__
+    </main>
+    <script src="specs.js"></script>
+    <script src="app.js"></script>
+</body>
+</html>
+"""
+
+STATIC_APP_JS = """
+const weekly = document.getElementById("weekly");
+const imperial = document.getElementById("imperial");
+const heatmapZoom = document.getElementById("heatmap-zoom");
+const rendered = {};
+
+function variant() {
+    return (weekly.checked ? "1" : "0") + (imperial.checked ? "1" : "0");
+}
+
+function show(name, index) {
+    // Only charts whose spec differs between the variants are redrawn
+    if (rendered[name] === index) {
+        return;
+    }
+    rendered[name] = index;
+    const element = document.getElementById(name);
+    const spec = BUNDLE.specs[index];
+    if (BUNDLE.kinds[name] === "vega") {
+        vegaEmbed(element, spec, { actions: false });
+    } else if (spec === null) {
+        element.textContent = "No data yet.";
+    } else {
+        (echarts.getInstanceByDom(element) || echarts.init(element)).setOption(spec, true);
+    }
+}
+
+function render() {
+    const current = variant();
+    for (const [name, variants] of Object.entries(BUNDLE.charts)) {
+        show(name, variants[current]);
+    }
+    for (const [name, value] of Object.entries(BUNDLE.metrics[current])) {
+        document.getElementById(name).textContent = value;
+    }
+    show("heatmap", BUNDLE.heatmap[heatmapZoom.value]);
+}
+
+weekly.addEventListener("change", render);
+imperial.addEventListener("change", render);
+heatmapZoom.addEventListener("input", render);
+window.addEventListener("resize", () => {
+    for (const element of document.querySelectorAll(".chart")) {
+        const chart = echarts.getInstanceByDom(element);
+        if (chart) {
+            chart.resize();
+        }
+    }
+});
+render();
+"""
@@ -0,0 +1,266 @@
+from dataclasses import dataclass
+from functools import cached_property
+
+import numpy as np
+from tcxreader import TCXExercise
+
+from constants import (
+    DISTANCE_GRID_STEP,
+    GRADE_SMOOTHING_DISTANCE,
+    MAX_GRADE,
+    PAUSE_GAP_SECONDS,
+    PAUSE_SPEED,
+    TIME_GRID_STEP,
+)
+
+
+@dataclass
+class UniformSeries:
+    """
+    Channels resampled onto a uniform grid (seconds or metres from the first
+    trackpoint, `step` apart). Samples that fall into a pause, or next to a
+    missing value, are NaN.
+    """
+
+    step: float
+    index: np.ndarray
+    heart_rate: np.ndarray
+    speed: np.ndarray
+    grade_adjusted_speed: np.ndarray
+    latitude: np.ndarray
+    longitude: np.ndarray
+
+    def rolling_means(self, values: np.ndarray, width: float) -> np.ndarray:
+        """
+        Mean of values over every window of the given width (in seconds or
+        metres) of moving time or distance. NaN samples (pauses, or missing
+        values) are left out, so a window that spans a pause joins the
+        samples on either side of it.
+        """
+        window = max(int(round(width / self.step)), 1)
+        moving = values[~np.isnan(values)]
+        if len(moving) < window:
+            return np.empty(0)
+        sums = np.concatenate(([0], np.cumsum(moving)))
+        return (sums[window:] - sums[:-window]) / window
+
+    def histogram(self, bins: np.ndarray) -> dict[int, float]:
+        """
+        Seconds (or metres) spent in each integer bin; NaN bins are skipped.
+        """
+        valid = ~np.isnan(bins)
+        keys, counts = np.unique(bins[valid].astype(int), return_counts=True)
+        return dict(zip(keys.tolist(), (counts * float(self.step)).tolist()))
+
+
+def _resample(
+    index: np.ndarray, moving: np.ndarray, step: float, channels: dict
+) -> UniformSeries:
+    finite = np.isfinite(index)
+    if finite.sum() < 2:
+        empty = np.empty(0)
+        return UniformSeries(step, empty, **{name: empty for name in channels})
+
+    grid = np.arange(index[finite][0], index[finite][-1], step)
+    i = np.clip(np.searchsorted(index, grid, side="right") - 1, 0, len(index) - 2)
+    span = index[i + 1] - index[i]
+    # Grid points inside paused (or zero length) intervals are masked
+    mask = moving[i] & np.isfinite(span) & (span > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fraction = (grid - index[i]) / span
+    resampled = {
+        name: np.where(mask, values[i] + (values[i + 1] - values[i]) * fraction, np.nan)
+        for name, values in channels.items()
+    }
+    return UniformSeries(step, grid - index[finite][0], **resampled)
+
+
+@dataclass
+class WorkoutSegments:
+    """
+    A workout's samples as arrays (sorted by time, missing values NaN), split
+    into moving segments. Interval i spans samples i and i + 1, so
+    `durations` and `moving` have one entry less than the samples.
+    `boundaries` holds the first and last sample index of each segment.
+    """
+
+    seconds: np.ndarray
+    heart_rate: np.ndarray
+    speed: np.ndarray
+    grade_adjusted_speed: np.ndarray
+    distance: np.ndarray
+    elevation: np.ndarray
+    latitude: np.ndarray
+    longitude: np.ndarray
+    durations: np.ndarray
+    moving: np.ndarray
+    boundaries: list[tuple[int, int]]
+
+    @property
+    def moving_time(self) -> float:
+        return float(self.durations[self.moving].sum())
+
+    @property
+    def elapsed_time(self) -> float:
+        if len(self.seconds) == 0:
+            return 0.0
+        return float(self.seconds[-1] - self.seconds[0])
+
+    @property
+    def _channels(self) -> dict[str, np.ndarray]:
+        return {
+            "heart_rate": self.heart_rate,
+            "speed": self.speed,
+            "grade_adjusted_speed": self.grade_adjusted_speed,
+            "latitude": self.latitude,
+            "longitude": self.longitude,
+        }
+
+    @cached_property
+    def per_second(self) -> UniformSeries:
+        return _resample(
+            self.seconds,
+            self.moving,
+            TIME_GRID_STEP,
+            self._channels,
+        )
+
+    @cached_property
+    def per_distance(self) -> UniformSeries:
+        # Carry the last known distance forward; leading gaps can't be placed
+        distance = np.fmax.accumulate(self.distance)
+        distance[np.isnan(distance)] = -np.inf
+        return _resample(
+            distance,
+            self.moving,
+            DISTANCE_GRID_STEP,
+            self._channels,
+        )
+
+
+def _to_array(values: list[float | None]) -> np.ndarray:
+    return np.array([np.nan if v is None else v for v in values], dtype=float)
+
+
+def _grade(distance: np.ndarray, elevation: np.ndarray) -> np.ndarray:
+    """
+    Grade at each trackpoint, from elevation smoothed over
+    GRADE_SMOOTHING_DISTANCE metres on a uniform distance grid.
+    """
+    grade = np.zeros(len(distance))
+    known = ~np.isnan(distance) & ~np.isnan(elevation)
+    if known.sum() < 2:
+        return grade
+    known_distance = np.maximum.accumulate(distance[known])
+    grid = np.arange(known_distance[0], known_distance[-1], DISTANCE_GRID_STEP)
+    if len(grid) < 2:
+        return grade
+
+    elevation_grid = np.interp(grid, known_distance, elevation[known])
+    window = max(int(GRADE_SMOOTHING_DISTANCE / DISTANCE_GRID_STEP), 1)
+    padded = np.pad(elevation_grid, (window // 2, window - 1 - window // 2), "edge")
+    smoothed = np.convolve(padded, np.ones(window) / window, mode="valid")
+    grade_grid = np.gradient(smoothed, DISTANCE_GRID_STEP)
+
+    located = ~np.isnan(distance)
+    grade[located] = np.interp(distance[located], grid, grade_grid)
+    return np.clip(grade, -MAX_GRADE, MAX_GRADE)
+
+
+def _energy_cost(grade: np.ndarray) -> np.ndarray:
+    # Metabolic cost of running (J/kg/m) by grade (Minetti et al., 2002)
+    return (
+        155.4 * grade**5
+        - 30.4 * grade**4
+        - 43.3 * grade**3
+        + 46.3 * grade**2
+        + 19.5 * grade
+        + 3.6
+    )
+
+
+def segment_workout(
+    workout: TCXExercise,
+    max_gap: float = PAUSE_GAP_SECONDS,
+    min_speed: float = PAUSE_SPEED,
+) -> WorkoutSegments:
+    """
+    Split a workout into moving segments, see segment_arrays.
+    """
+    trackpoints = sorted(workout.trackpoints, key=lambda t: t.time)
+    start = trackpoints[0].time if trackpoints else None
+    return segment_arrays(
+        seconds=np.array(
+            [(t.time - start).total_seconds() for t in trackpoints], dtype=float
+        ),
+        heart_rate=_to_array([t.hr_value for t in trackpoints]),
+        speed=_to_array([t.tpx_ext.get("Speed") for t in trackpoints]),
+        distance=_to_array([t.distance for t in trackpoints]),
+        elevation=_to_array([t.elevation for t in trackpoints]),
+        latitude=_to_array([t.latitude for t in trackpoints]),
+        longitude=_to_array([t.longitude for t in trackpoints]),
+        max_gap=max_gap,
+        min_speed=min_speed,
+    )
+
+
+def segment_arrays(
+    seconds: np.ndarray,
+    heart_rate: np.ndarray,
+    speed: np.ndarray,
+    distance: np.ndarray,
+    elevation: np.ndarray,
+    latitude: np.ndarray,
+    longitude: np.ndarray,
+    max_gap: float = PAUSE_GAP_SECONDS,
+    min_speed: float = PAUSE_SPEED,
+) -> WorkoutSegments:
+    """
+    Split a workout, given as one array per channel (missing values NaN),
+    into moving segments. An interval counts as a pause if the gap between
+    its samples exceeds max_gap seconds, or if the recorded speed (or the
+    speed derived from distance when none was recorded) is below min_speed.
+    """
+    order = np.argsort(seconds, kind="stable")
+
+    def column(values):
+        return np.asarray(values, dtype=float)[order]
+
+    seconds = column(seconds)
+    if len(seconds) > 0:
+        seconds -= seconds[0]
+    heart_rate = column(heart_rate)
+    speed = column(speed)
+    distance = column(distance)
+    elevation = column(elevation)
+    latitude = column(latitude)
+    longitude = column(longitude)
+    # Speed on flat ground that would take the same effort
+    grade_adjusted_speed = (
+        speed * _energy_cost(_grade(distance, elevation)) / _energy_cost(0)
+    )
+
+    durations = np.diff(seconds)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        derived_speed = np.diff(distance) / durations
+    interval_speed = np.where(np.isnan(speed[:-1]), derived_speed, speed[:-1])
+    # NaN speeds (no speed or distance recorded) never count as standing still
+    moving = (durations <= max_gap) & ~(interval_speed < min_speed)
+
+    padded = np.concatenate(([0], moving.astype(np.int8), [0]))
+    changes = np.flatnonzero(np.diff(padded))
+    boundaries = list(zip(changes[0::2].tolist(), changes[1::2].tolist()))
+
+    return WorkoutSegments(
+        seconds=seconds,
+        heart_rate=heart_rate,
+        speed=speed,
+        grade_adjusted_speed=grade_adjusted_speed,
+        distance=distance,
+        elevation=elevation,
+        latitude=latitude,
+        longitude=longitude,
+        durations=durations,
+        moving=moving,
+        boundaries=boundaries,
+    )
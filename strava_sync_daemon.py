@@ -0,0 +1,85 @@
+import argparse
+import time
+import traceback
+from datetime import datetime
+
+from data_access import Writer
+from models.athlete import Athlete, athlete_ids
+from read_strava_data import TokenStore, StravaClient, sync
+
+SYNC_INTERVAL = 6 * 60 * 60
+
+
+def log(message):
+    print(f"[{datetime.now().isoformat(timespec='seconds')}] {message}")
+
+
+def sync_and_rebuild(client: StravaClient, streams=False):
+    athlete_id = client.athlete.athlete_id
+    activities = sync(client, streams=streams)
+    log(f"Synced {athlete_id}, {len(activities)} activities stored")
+
+    writer = Writer(use_strava_streams=streams, athlete=client.athlete)
+    writer.build()
+    writer.write_json()
+    if len(writer.failed_sources) > 0:
+        failed = ", ".join(writer.failed_sources)
+        log(f"Rebuilt dashboard data of {athlete_id}, failed: {failed}")
+    else:
+        log(f"Rebuilt dashboard data of {athlete_id}")
+
+
+def authorized_clients(clients: dict[str, StravaClient]):
+    """
+    Clients of every athlete that has a Strava token stored. Athletes added
+    since the last call are picked up; known athletes keep their client (and
+    its connection pool).
+    """
+    for athlete_id in athlete_ids():
+        if athlete_id not in clients:
+            tokens = TokenStore(Athlete.load(athlete_id))
+            if tokens.authorized:
+                clients[athlete_id] = StravaClient(tokens)
+    return [clients[a] for a in athlete_ids() if a in clients]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Periodically sync Strava and rebuild the dashboard data."
+    )
+    parser.add_argument(
+        "--interval",
+        type=int,
+        default=SYNC_INTERVAL,
+        help="Seconds between syncs.",
+    )
+    parser.add_argument("--once", action="store_true", help="Sync once and exit.")
+    parser.add_argument(
+        "--streams",
+        action="store_true",
+        help="Download run streams and build the run series from them.",
+    )
+    args = parser.parse_args()
+
+    clients = {}
+    if len(authorized_clients(clients)) == 0:
+        raise SystemExit(
+            "No Strava token stored, run read_strava_data.py --athlete <id> first."
+        )
+
+    while True:
+        started = time.time()
+        for client in authorized_clients(clients):
+            try:
+                sync_and_rebuild(client, args.streams)
+            except Exception:
+                # Keep the daemon alive, the next run will retry
+                athlete_id = client.athlete.athlete_id
+                log(f"Sync of {athlete_id} failed:\n{traceback.format_exc()}")
+        if args.once:
+            break
+        time.sleep(max(0.0, args.interval - (time.time() - started)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,42 +1,143 @@
 import math
-from datetime import datetime
 
-import altair as alt
 import streamlit as st
-import matplotlib.pyplot as plt
-from matplotlib.colors import rgb2hex
 from streamlit.components.v1 import html, iframe
-from streamlit_echarts import st_echarts, JsCode
-
-from constants import DISTANCE_NAMES
-from data_access import Reader
-from utils import m_to_km_or_mi, ms_to_min_km_or_min_mi, lbs_to_kg
-from enums import HeartRateZone, PaceZone, ExerciseName, RecoveryZone
-from resources.resources import (
-    TIMER_HTML,
-    PACE_FORMATTER,
-    SHOE_FORMATTER,
+from streamlit_echarts import st_echarts
+
+from charts import (
+    make_run_duration_distance_chart,
+    make_training_load_chart,
+    make_heart_rate_zone_chart,
+    make_pace_zone_chart,
+    make_peak_chart,
+    make_peak_pace_chart_by_month,
+    make_heart_rate_pace_chart,
+    make_shoe_chart,
+    make_shoe_wear_chart,
+    make_strength_duration_volume_chart,
+    make_one_rep_max_chart,
+    make_recovery_chart,
+    make_sleep_strain_chart,
+    make_recovery_run_correlation_chart,
+    make_heatmap_chart,
 )
+from constants import HEATMAP_MIN_ZOOM, HEATMAP_MAX_ZOOM
+from data_access import ReaderRegistry
+from models.athlete import DEFAULT_ATHLETE_ID, athlete_ids
+from utils import m_to_km_or_mi, lttb_indices, busiest_tile, tile_at_zoom
+from resources.resources import TIMER_HTML
 
 
 @st.cache_resource
-def get_reader():
-    return Reader()
+def get_registry():
+    # Shared by all sessions, so athletes viewed by several people load once
+    return ReaderRegistry()
 
 
-def get_color(value, min_value=0, max_value=100, cmap_name="Reds"):
-    cmap = plt.get_cmap(cmap_name)
-    norm = plt.Normalize(min_value, max_value)
-    rgba = cmap(norm(value))
-    return rgb2hex(rgba)
+# Points per daily chart, about one per two pixels on a wide layout
+DAILY_CHART_POINTS = 400
+DATA_ZOOM_EVENT = """
+    function(params) {
+        var zoom = params.batch ? params.batch[0] : params;
+        return [zoom.start, zoom.end];
+    }
+"""
+
+
+def _kept_indices(series: list[list], first: int, last: int, points: int):
+    kept = set()
+    for values in series:
+        numeric = [
+            v if isinstance(v, (int, float)) else 0 for v in values[first : last + 1]
+        ]
+        threshold = max(points // len(series), 3)
+        kept.update(first + i for i in lttb_indices(numeric, threshold))
+    return kept
+
+
+def show_date_chart(options: dict, key: str, weekly: bool):
+    """
+    Render a chart whose x-axis holds one category per day (or week). Daily
+    series are reduced with LTTB to DAILY_CHART_POINTS; once zoomed in, the
+    visible range is sent in full if it fits and the rest only as context.
+    """
+    dates = options["xAxis"]["data"]
+    if weekly or len(dates) <= DAILY_CHART_POINTS:
+        st_echarts(options=options)
+        return
+
+    first, last = 0, len(dates) - 1
+    if f"{key}_zoom" in st.session_state:
+        zoom_first, zoom_last = st.session_state[f"{key}_zoom"]
+        if zoom_first in dates and zoom_last in dates:
+            first, last = dates.index(zoom_first), dates.index(zoom_last)
+
+    series = [s["data"] for s in options["series"] if len(s["data"]) == len(dates)]
+    if len(series) == 0:
+        # Nothing that is indexed by date to downsample
+        st_echarts(options=options)
+        return
+    kept = _kept_indices(series, first, last, DAILY_CHART_POINTS)
+    context_points = DAILY_CHART_POINTS // 8
+    if first > 0:
+        kept |= _kept_indices(series, 0, first, context_points)
+    if last < len(dates) - 1:
+        kept |= _kept_indices(series, last, len(dates) - 1, context_points)
+    kept = sorted(kept)
+
+    shown_dates = [dates[i] for i in kept]
+    downsampled = {
+        **options,
+        "xAxis": {**options["xAxis"], "data": shown_dates},
+        "series": [
+            (
+                {**s, "data": [s["data"][i] for i in kept]}
+                if len(s["data"]) == len(dates)
+                else s
+            )
+            for s in options["series"]
+        ],
+        "dataZoom": [
+            {"type": "inside", "startValue": dates[first], "endValue": dates[last]},
+            {"type": "slider", "startValue": dates[first], "endValue": dates[last]},
+        ],
+    }
+    zoom = st_echarts(
+        options=downsampled, events={"datazoom": DATA_ZOOM_EVENT}, key=key
+    )
+    if zoom is not None and zoom != st.session_state.get(f"{key}_event"):
+        # The event reports percentages of the categories that were shown
+        st.session_state[f"{key}_event"] = zoom
+        start, end = zoom
+        st.session_state[f"{key}_zoom"] = (
+            shown_dates[math.floor(start / 100 * (len(shown_dates) - 1))],
+            shown_dates[math.ceil(end / 100 * (len(shown_dates) - 1))],
+        )
+        st.rerun(scope="fragment")
+
+
+def display_options():
+    """
+    The "Group by week" and "Imperial units" choices, as (weekly, imperial).
+    They apply to every section and are read from the session state, so
+    fragment reruns see the current choice.
+    """
+    return st.session_state["weekly"], st.session_state["imperial"]
+
+
+def show_section(key: str, label: str) -> bool:
+    # Heavy sections only load their data once they are opened
+    return st.toggle(label, value=False, key=f"{key}_open")
 
 
 with st.sidebar:
     st.image("resources/mcmo_solid_black.png")
     st.html("<hr>")
-    weekly = st.toggle("Group by week", value=True)
-    imperial = st.toggle("Imperial units", value=True)
-    st.html("<hr>")
+    athletes = athlete_ids()
+    athlete_id = DEFAULT_ATHLETE_ID
+    if len(athletes) > 1:
+        athlete_id = st.selectbox("Athlete", athletes, key="athlete")
+        st.html("<hr>")
     st.write('<a href="#road-to-2-59-59">Road to 2:59:59</a>', unsafe_allow_html=True)
     st.write('<a href="#zones">Zones</a>', unsafe_allow_html=True)
     st.write(
@@ -49,6 +150,7 @@ with st.sidebar:
         '<a href="#whoop-recovery-sleep-and-strain">Whoop Recovery</a>',
         unsafe_allow_html=True,
     )
+    st.write('<a href="#heatmap">Heatmap</a>', unsafe_allow_html=True)
     st.html("<hr>")
     st.html(
         """
@@ -61,7 +163,7 @@ with st.sidebar:
 
 html(TIMER_HTML)
 
-reader = get_reader()
+reader = get_registry().get(athlete_id)
 
 st.write(
     """
@@ -79,597 +181,285 @@ iframe(
     scrolling=True
 )
 
-col1, col2, col3 = st.columns(3)
-col1.metric(
-    "Distance",
-    f"{round(m_to_km_or_mi(reader.get_tcx('total_run_distance'), imperial), 2)} {'km' if not imperial else 'mi'}",
-)
-col2.metric(
-    "Elevation",
-    f"{round(reader.get_tcx('total_run_elevation') * (3.28084 if imperial else 1), 2)} {'m' if not imperial else 'ft'}",
-)
-col3.metric(
-    "Calories",
-    f"{int(reader.get_tcx('total_run_calories'))} cal",
-)
 
-st.write(
-    """
-    ## Running distance
-    """
-)
+@st.fragment
+def running_section():
+    weekly, imperial = display_options()
 
-run_duration_distance_chart = {
-    "legend": {"data": [f"Distance ({'mi' if imperial else 'km'})", "Duration (min)"]},
-    "xAxis": {
-        "type": "category",
-        "axisTick": {"alignWithLabel": True},
-        # "data":
-        "data": [
-            f"Wk {i + 1}" for i, _ in enumerate(reader.get_tcx("week_start_dates"))
-        ]
-        if weekly
-        else reader.get_tcx("dates_str"),
-    },
-    "yAxis": [
-        {
-            "type": "value",
-            "name": f"Distance ({'mi' if imperial else 'km'})",
-            "position": "left",
-            "alignTicks": True,
-            "axisLabel": {"formatter": "{value}" + f"{'mi' if imperial else 'km'}"},
-        },
-        {
-            "type": "value",
-            "name": "Duration (min)",
-            "position": "right",
-            "alignTicks": True,
-            "axisLabel": {"formatter": "{value} min"},
-        },
-    ],
-    "series": [
-        {
-            "name": f"Distance ({'mi' if imperial else 'km'})",
-            "data": [
-                round(m_to_km_or_mi(d, imperial), 2)
-                for d in reader.get_tcx(
-                    "run_distances_weekly" if weekly else "run_distances_daily"
-                )
-            ],
-            "type": "line",
-            "yAxisIndex": 0,
-        },
-        {
-            "name": "Duration (min)",
-            "data": [
-                round(d / 60, 2)
-                for d in reader.get_tcx(
-                    "run_duration_weekly" if weekly else "run_duration_daily"
-                )
-            ],
-            "type": "line",
-            "yAxisIndex": 1,
-        },
-    ],
-    "tooltip": {
-        "trigger": "axis",
-        "axisPointer": {"type": "cross"},
-    },
-}
-st_echarts(options=run_duration_distance_chart)
+    col1, col2, col3 = st.columns(3)
+    col1.metric(
+        "Distance",
+        f"{round(m_to_km_or_mi(reader.get_tcx('total_run_distance'), imperial), 2)} {'km' if not imperial else 'mi'}",
+    )
+    col2.metric(
+        "Elevation",
+        f"{round(reader.get_tcx('total_run_elevation') * (3.28084 if imperial else 1), 2)} {'m' if not imperial else 'ft'}",
+    )
+    col3.metric(
+        "Calories",
+        f"{int(reader.get_tcx('total_run_calories'))} cal",
+    )
 
-st.write(
-    """
-    ## Zones
-    """
-)
+    st.write(
+        """
+        ## Running distance
+        """
+    )
+    show_date_chart(
+        make_run_duration_distance_chart(reader, weekly, imperial),
+        "run_duration_distance",
+        weekly,
+    )
 
-st.write(
-    """
-    ### Heart rate zones
-    """
-)
+    st.write(
+        """
+        ### Training load
 
-heart_rate_zone_stacked_bar_chart = {
-    "tooltip": {"trigger": "axis", "axisPointer": {"type": "shadow"}},
-    "legend": {
-        "data": [zone.value for zone in HeartRateZone],
-    },
-    "grid": {"left": "3%", "right": "4%", "bottom": "3%", "containLabel": True},
-    "xAxis": {
-        "type": "category",
-        "data": [
-            f"Wk {i + 1}" for i, _ in enumerate(reader.get_tcx("week_start_dates"))
-        ]
-        if weekly
-        else reader.get_tcx("dates_str"),
-    },
-    "yAxis": {"type": "value", "min": 0, "max": 100},
-    "series": [
-        {
-            "name": zone,
-            "type": "bar",
-            "stack": "total",
-            "itemStyle": {"color": get_color(i + 1, 0, len(HeartRateZone), "Reds")},
-            "data": data,
-        }
-        for i, (zone, data) in enumerate(
-            reader.get_tcx(
-                "heart_rate_zone_percentages_weekly"
-                if weekly
-                else "heart_rate_zone_percentages_daily"
-            )
-        )
-    ],
-}
+        Fitness (CTL) and fatigue (ATL) are 42 and 7 day exponentially weighted
+        averages of the heart rate based training load (TRIMP); form (TSB) is
+        yesterday's fitness minus fatigue.
+        """
+    )
+    training_load_chart = make_training_load_chart(reader, weekly)
+    if training_load_chart is None:
+        st.write("No training load yet.")
+    else:
+        show_date_chart(training_load_chart, "training_load", weekly)
 
-st_echarts(options=heart_rate_zone_stacked_bar_chart)
 
-st.write(
-    """
-    ### Pace zones
-    """
-)
+@st.fragment
+def zones_section():
+    weekly, imperial = display_options()
 
-pace_zone_stacked_bar_chart = {
-    "tooltip": {"trigger": "axis", "axisPointer": {"type": "shadow"}},
-    "legend": {
-        "data": [zone.min_mi if imperial else zone.min_km for zone in PaceZone],
-    },
-    "grid": {"left": "3%", "right": "4%", "bottom": "3%", "containLabel": True},
-    "xAxis": {
-        "type": "category",
-        "data": [
-            f"Wk {i + 1}" for i, _ in enumerate(reader.get_tcx("week_start_dates"))
-        ]
-        if weekly
-        else reader.get_tcx("dates_str"),
-    },
-    "yAxis": {"type": "value", "min": 0, "max": 100},
-    "series": [
-        {
-            "name": min_mi if imperial else min_km,
-            "type": "bar",
-            "stack": "total",
-            "itemStyle": {"color": get_color(i + 1, 0, len(PaceZone), "Blues")},
-            "data": data,
-        }
-        for i, (min_mi, min_km, data) in enumerate(
-            reader.get_tcx(
-                "pace_zone_percentages_weekly"
-                if weekly
-                else "pace_zone_percentages_daily"
-            )
-        )
-    ],
-}
+    st.write(
+        """
+        ### Heart rate zones
+        """
+    )
+    show_date_chart(
+        make_heart_rate_zone_chart(reader, weekly), "heart_rate_zones", weekly
+    )
 
-st_echarts(options=pace_zone_stacked_bar_chart)
+    st.write(
+        """
+        ### Pace zones
+        """
+    )
+    show_date_chart(
+        make_pace_zone_chart(reader, weekly, imperial), "pace_zones", weekly
+    )
 
 
-def make_peak_chart(dataset_name: str, pretty_name: str):
-    data = reader.get_tcx(dataset_name)
-    if dataset_name == "peak_pace":
-        y_values = [ms_to_min_km_or_min_mi(d, imperial) for d in data.values()]
-        categories = [
-            name for val, name in DISTANCE_NAMES.items() if val in data.keys()
-        ]
-        inverse = True
-        base_color = "Blues"
-        min_value = min(y_values)
-        max_value = max(y_values)
-        formatter = JsCode(PACE_FORMATTER).js_code
-    elif dataset_name == "peak_hr":
-        y_values = [d for d in data.values()]
-        categories = list(data.keys())
-        inverse = False
-        base_color = "Reds"
-        min_value = min(y_values) - 10
-        max_value = max(y_values) + 5
-        formatter = "{b}: {c} BPM"
-    else:
-        raise ValueError(f"Unknown dataset_name: {dataset_name}")
-
-    return {
-        "xAxis": {
-            "type": "category",
-            "data": categories,
-        },
-        "yAxis": {
-            "type": "value",
-            "name": pretty_name,
-            "inverse": inverse,
-            "min": math.floor(min_value),
-            "max": math.ceil(max_value),
-        },
-        "series": [
-            {
-                "data": [round(d, 2) for d in y_values],
-                "type": "line",
-                "itemStyle": {"color": get_color(4, 0, 5, base_color)},
-            }
-        ],
-        "tooltip": {"trigger": "axis", "formatter": formatter},
-    }
+@st.fragment
+def peak_section():
+    if not show_section("peak", "Show peak heart rate and pace"):
+        return
+    _, imperial = display_options()
 
+    peak_heart_rate_col1, peak_heart_rate_col2 = st.columns(
+        2, vertical_alignment="center"
+    )
 
-st.write(
-    """
-    ## Peak Heart Rate and Pace
-    """
-)
+    with peak_heart_rate_col1:
+        st.write(
+            """
+            This chart shows the highest average heart rate sustained over a given duration.
+            """
+        )
 
-peak_heart_rate_col1, peak_heart_rate_col2 = st.columns(2, vertical_alignment="center")
+    with peak_heart_rate_col2:
+        st_echarts(options=make_peak_chart(reader, "peak_hr", "BPM", imperial))
 
-with peak_heart_rate_col1:
-    st.write(
-        """
-        This chart shows the highest average heart rate sustained over a given duration.
-        """
+    peak_pace_col1, peak_pace_col2 = st.columns(2, vertical_alignment="center")
+
+    with peak_pace_col1:
+        st.write(
+            """
+            This chart shows the fastest average pace sustained over a given distance.
+            """
+        )
+
+    with peak_pace_col2:
+        st_echarts(
+            options=make_peak_chart(
+                reader,
+                "peak_pace",
+                "Pace (min/km)" if not imperial else "Pace (min/mi)",
+                imperial,
+            )
+        )
+
+    grouped_peak_pace_col1, grouped_peak_pace_col2 = st.columns(
+        2, vertical_alignment="center"
     )
 
-with peak_heart_rate_col2:
-    st_echarts(options=make_peak_chart("peak_hr", "BPM"))
+    with grouped_peak_pace_col1:
+        st.write(
+            """
+            Same but grouped by month.
+            """
+        )
 
-peak_pace_col1, peak_pace_col2 = st.columns(2, vertical_alignment="center")
+    with grouped_peak_pace_col2:
+        st_echarts(options=make_peak_pace_chart_by_month(reader, imperial))
 
-with peak_pace_col1:
     st.write(
         """
-        This chart shows the fastest average pace sustained over a given distance.
+        ### Heart Rate vs Pace
         """
     )
+    st.altair_chart(make_heart_rate_pace_chart(reader), use_container_width=True)
 
-with peak_pace_col2:
-    st_echarts(
-        options=make_peak_chart(
-            "peak_pace", "Pace (min/km)" if not imperial else "Pace (min/mi)"
-        )
-    )
 
+@st.fragment
+def shoes_section():
+    weekly, imperial = display_options()
 
-def make_peak_pace_chart_by_month():
-    data = reader.get_tcx("peak_pace_monthly")
+    st_echarts(options=make_shoe_chart(reader, imperial))
 
-    raw_categories = list(
-        set([int(item) for sublist in data.values() for item in sublist])
+    st.write("### Shoe wear")
+    shoe_wear_chart = make_shoe_wear_chart(reader, weekly, imperial)
+    if shoe_wear_chart is None:
+        st.write("No shoe wear yet.")
+    else:
+        show_date_chart(shoe_wear_chart, "shoe_wear", weekly)
+
+
+@st.fragment
+def weightlifting_section():
+    if not show_section("weightlifting", "Show weightlifting"):
+        return
+    weekly, imperial = display_options()
+
+    st.write("### Volume and Duration")
+    show_date_chart(
+        make_strength_duration_volume_chart(reader, weekly, imperial),
+        "strength_duration_volume",
+        weekly,
     )
-    categories = [name for val, name in DISTANCE_NAMES.items() if val in raw_categories]
-    flat_values = [item for sublist in data.values() for item in sublist.values()]
-    months = [datetime(2024, int(month), 1).strftime("%B") for month in data.keys()]
-
-    slowest_pace = ms_to_min_km_or_min_mi(min(flat_values), imperial)
-    fastest_pace = ms_to_min_km_or_min_mi(max(flat_values), imperial)
-
-    return {
-        "xAxis": {
-            "type": "category",
-            "data": categories,
-        },
-        "legend": {
-            "data": [categories],
-        },
-        "grid": {"left": "3%", "right": "4%", "bottom": "3%", "containLabel": True},
-        "yAxis": {
-            "type": "value",
-            "name": "Pace (min/km)" if not imperial else "Pace (min/mi)",
-            "inverse": True,
-            "min": math.floor(fastest_pace),
-            "max": math.ceil(slowest_pace),
-        },
-        "series": [
-            {
-                "name": months[i],
-                "data": [
-                    round(ms_to_min_km_or_min_mi(d, imperial), 2) for d in y_values
-                ],
-                "type": "line",
-                "itemStyle": {"color": get_color(i + 1, 0, len(data.keys()), "Blues")},
-            }
-            for i, y_values in enumerate([d.values() for d in data.values()])
-        ],
-        "tooltip": {
-            "trigger": "axis",
-        },
-    }
 
+    st.write("### One Rep Max")
+    show_date_chart(
+        make_one_rep_max_chart(reader, weekly, imperial), "one_rep_max", weekly
+    )
 
-grouped_peak_pace_col1, grouped_peak_pace_col2 = st.columns(
-    2, vertical_alignment="center"
-)
 
-with grouped_peak_pace_col1:
+@st.fragment
+def whoop_section():
+    if not show_section("whoop", "Show Whoop recovery, sleep, and strain"):
+        return
+    weekly, _ = display_options()
+
     st.write(
         """
-        Same but grouped by month.
+        ### Recovery
         """
     )
+    show_date_chart(make_recovery_chart(reader, weekly), "recovery", weekly)
 
-with grouped_peak_pace_col2:
-    st_echarts(options=make_peak_pace_chart_by_month())
+    st.write(
+        """
+        ### Sleep and Strain
+        """
+    )
+    show_date_chart(make_sleep_strain_chart(reader, weekly), "whoop_combined", weekly)
 
-st.write(
-    """
-    ### Heart Rate vs Pace
-    """
-)
+    st.write(
+        """
+        ### Recovery and Running
 
-selector = alt.selection_point(fields=["Month"], bind="legend")
-c = (
-    alt.Chart(
-        alt.Data(
-            values=[
-                {"Month": t, "HR": hr, "Pace": p}
-                for t, hr, p in reader.get_tcx("heart_rate_pace_data")
-            ]
-        )
-    )
-    .mark_circle(size=50)
-    .encode(
-        x="Pace:Q",
-        y="HR:Q",
-        color="Month:N",
-        opacity=alt.condition(selector, alt.value(1), alt.value(0.1)),
+        Correlation between the morning's Whoop metrics and that day's runs.
+        """
     )
-    .add_params(selector)
-)
+    correlation_chart = make_recovery_run_correlation_chart(reader)
+    if correlation_chart is None:
+        st.write("No recovery and running data yet.")
+    else:
+        st_echarts(options=correlation_chart)
 
-st.altair_chart(c, use_container_width=True)
 
-st.write(
-    """
-    ## Shoes
-    """
-)
+# Tiles moved per click of a pan button
+HEATMAP_PAN = {"←": (-1, 0), "↑": (0, -1), "↓": (0, 1), "→": (1, 0)}
 
 
-def make_shoe_chart():
-    data = reader.get_strava("distance_by_gear")
-    categories = [x.replace(" ", "\n") for x in data.keys()]
-    y_values = [round(m_to_km_or_mi(d, imperial), 2) for d in data.values()]
-    return {
-        "tooltip": {
-            "trigger": "axis",
-            "axisPointer": {"type": "shadow"},
-            "formatter": JsCode(SHOE_FORMATTER).js_code,
-        },
-        "grid": {"left": "3%", "right": "4%", "bottom": "3%", "containLabel": True},
-        "xAxis": {
-            "type": "category",
-            "data": categories,
-        },
-        "yAxis": {
-            "type": "value",
-            "min": 0,
-            "max": math.ceil(max(y_values)),
-        },
-        "series": [
-            {
-                "type": "bar",
-                "data": y_values,
-            }
-        ],
-    }
+@st.fragment
+def heatmap_section():
+    if not show_section("heatmap", "Show heatmap"):
+        return
 
+    heatmap_zoom = st.select_slider(
+        "Zoom",
+        options=list(range(HEATMAP_MIN_ZOOM, HEATMAP_MAX_ZOOM + 1)),
+        value=HEATMAP_MIN_ZOOM + 5,
+    )
+    tiles = reader.get_heatmap_tiles(heatmap_zoom)
+    if len(tiles) == 0:
+        st.write("No GPS data yet.")
+        return
+
+    # The view's center tile is kept with its zoom, so zooming in or out stays
+    # over the same spot. It starts at the busiest tile.
+    if "heatmap_center" in st.session_state:
+        zoom, tile = st.session_state["heatmap_center"]
+        center = tile_at_zoom(tile, zoom, heatmap_zoom)
+    else:
+        center = busiest_tile(tiles)
+    columns = st.columns(len(HEATMAP_PAN) + 1)
+    for column, (label, (dx, dy)) in zip(columns, HEATMAP_PAN.items()):
+        if column.button(label, key=f"heatmap_pan_{dx}_{dy}"):
+            center = (center[0] + dx, center[1] + dy)
+    if columns[-1].button("Busiest spot", key="heatmap_busiest"):
+        center = busiest_tile(tiles)
+    st.session_state["heatmap_center"] = (heatmap_zoom, center)
 
-st_echarts(options=make_shoe_chart())
+    st_echarts(options=make_heatmap_chart(reader, heatmap_zoom, center), height="600px")
 
-st.write("## Weightlifting")
 
-st.write("### Volume and Duration")
+@st.fragment
+def dashboard_sections():
+    # Flipping a toggle reruns the sections that depend on it, but not the
+    # timer, the TrainingPeaks iframe or the heatmap
+    col1, col2 = st.columns(2)
+    col1.toggle("Group by week", value=True, key="weekly")
+    col2.toggle("Imperial units", value=True, key="imperial")
 
-strength_duration_volume_chart = {
-    "legend": {"data": [f"Volume ({'lbs' if imperial else 'kg'})", "Duration (min)"]},
-    "xAxis": {
-        "type": "category",
-        "axisTick": {"alignWithLabel": True},
-        "data": [
-            f"Wk {i + 1}" for i, _ in enumerate(reader.get_hevy("week_start_dates"))
-        ]
-        if weekly
-        else reader.get_hevy("dates_str"),
-    },
-    "yAxis": [
-        {
-            "type": "value",
-            "name": f"Volume ({'lbs' if imperial else 'kg'})",
-            "position": "left",
-            "alignTicks": True,
-            "axisLabel": {"formatter": "{value}" + f"{'lbs' if imperial else 'kg'}"},
-        },
-        {
-            "type": "value",
-            "name": "Duration (min)",
-            "position": "right",
-            "alignTicks": True,
-            "axisLabel": {"formatter": "{value} min"},
-        },
-    ],
-    "series": [
-        {
-            "name": f"Volume ({'lbs' if imperial else 'kg'})",
-            "data": [
-                round(d if imperial else lbs_to_kg(d), 2)
-                for d in reader.get_hevy(
-                    "workout_volume_weekly" if weekly else "workout_volume_daily"
-                )
-            ],
-            "type": "line",
-            "yAxisIndex": 0,
-        },
-        {
-            "name": "Duration (min)",
-            "data": [
-                round(d / 60, 2)
-                for d in reader.get_hevy(
-                    "workout_duration_weekly" if weekly else "workout_duration_daily"
-                )
-            ],
-            "type": "line",
-            "yAxisIndex": 1,
-        },
-    ],
-    "tooltip": {
-        "trigger": "axis",
-        "axisPointer": {"type": "cross"},
-    },
-}
-st_echarts(options=strength_duration_volume_chart)
-
-st.write("### One Rep Max")
-
-one_rep_max_chart = {
-    "legend": {"data": [v.value for v in ExerciseName]},
-    "xAxis": {
-        "type": "category",
-        "axisTick": {"alignWithLabel": True},
-        "data": [
-            f"Wk {i + 1}" for i, _ in enumerate(reader.get_hevy("week_start_dates"))
-        ]
-        if weekly
-        else reader.get_hevy("dates_str"),
-    },
-    "yAxis": {
-        "type": "value",
-        "name": f"One Rep Max ({'lbs' if imperial else 'kg'})",
-        "position": "left",
-        "alignTicks": True,
-        "axisLabel": {"formatter": "{value}" + f"{'lbs' if imperial else 'kg'}"},
-    },
-    "series": [
-        {
-            "name": exercise,
-            "data": [round(d if imperial else lbs_to_kg(d), 2) for d in data],
-            "type": "line",
-        }
-        for exercise, data in reader.get_hevy(
-            "exercise_one_rep_max_monthly" if weekly else "exercise_one_rep_max_daily"
-        )
-    ],
-    "tooltip": {
-        "trigger": "axis",
-        "axisPointer": {"type": "cross"},
-    },
-}
-st_echarts(options=one_rep_max_chart)
+    running_section()
 
-st.write("## Whoop Recovery, Sleep, and Strain")
+    st.write(
+        """
+        ## Zones
+        """
+    )
+    zones_section()
 
-st.write(
-    """
-    ### Recovery
-    """
-)
+    st.write(
+        """
+        ## Peak Heart Rate and Pace
+        """
+    )
+    peak_section()
+
+    st.write(
+        """
+        ## Shoes
+        """
+    )
+    shoes_section()
+
+    st.write("## Weightlifting")
+    weightlifting_section()
+
+    st.write("## Whoop Recovery, Sleep, and Strain")
+    whoop_section()
 
-recovery_stacked_bar_chart = {
-    "tooltip": {"trigger": "axis", "axisPointer": {"type": "shadow"}},
-    "legend": {
-        "data": [zone.value for zone in RecoveryZone],
-    },
-    "grid": {"left": "3%", "right": "4%", "bottom": "3%", "containLabel": True},
-    "xAxis": {
-        "type": "category",
-        "data": [
-            f"Wk {i + 1}" for i, _ in enumerate(reader.get_whoop("week_start_dates"))
-        ]
-        if weekly
-        else reader.get_whoop("dates_str"),
-    },
-    "yAxis": {"type": "value", "min": 0, "max": 100, "name": "%"},
-    "series": [
-        {
-            "name": zone,
-            "type": "bar",
-            "stack": "total",
-            "itemStyle": {
-                "color": {
-                    RecoveryZone.RED.name: "#FF0026",
-                    RecoveryZone.YELLOW.name: "#FFDE00",
-                    RecoveryZone.GREEN.name: "#16EC06",
-                }[zone]
-            },
-            "data": [round(d, 2) for d in data],
-        }
-        for i, (zone, data) in enumerate(
-            reader.get_whoop(
-                "avg_recovery_score_weekly" if weekly else "avg_recovery_score_daily"
-            )
-        )
-    ],
-}
-st_echarts(options=recovery_stacked_bar_chart)
+
+dashboard_sections()
 
 st.write(
     """
-    ### Sleep and Strain
+    ## Heatmap
+
+    Where we run, by time spent in each spot.
     """
 )
-whoop_combined_charts2 = {
-    "legend": {
-        "data": [
-            "Sleep Performance",
-            "Day Strain",
-        ]
-    },
-    "xAxis": {
-        "type": "category",
-        "axisTick": {"alignWithLabel": True},
-        "data": [
-            f"Wk {i + 1}" for i, _ in enumerate(reader.get_whoop("week_start_dates"))
-        ]
-        if weekly
-        else reader.get_whoop("dates_str"),
-        "axisLine": {
-            "onZero": False,
-            "show": True,
-        },
-    },
-    "yAxis": [
-        {
-            "type": "value",
-            "name": "Sleep\nPerformance",
-            "position": "left",
-            "alignTicks": True,
-            "axisLabel": {"formatter": "{value} %"},
-        },
-        {
-            "type": "value",
-            "name": "Day\nStrain",
-            "position": "right",
-            "alignTicks": True,
-            "axisLabel": {"formatter": "{value} min"},
-        },
-    ],
-    "series": [
-        {
-            "name": "Sleep Performance",
-            "data": [
-                round(d, 2)
-                for d in reader.get_whoop(
-                    "sleep_performance_weekly" if weekly else "sleep_performance_daily"
-                )
-            ],
-            "type": "line",
-            "yAxisIndex": 0,
-            "itemStyle": {"color": "#7BA1BB"},
-        },
-        {
-            "name": "Day Strain",
-            "data": [
-                round(d, 2)
-                for d in reader.get_whoop(
-                    "day_strain_weekly" if weekly else "day_strain_daily"
-                )
-            ],
-            "type": "line",
-            "yAxisIndex": 1,
-            "itemStyle": {"color": "#67AEE6"},
-        },
-    ],
-    "tooltip": {
-        "trigger": "axis",
-        "axisPointer": {"type": "cross"},
-    },
-    "grid": {"containLabel": True},
-}
-st_echarts(options=whoop_combined_charts2)
+heatmap_section()
@@ -0,0 +1,33 @@
+from charts import make_heatmap_chart
+from constants import HEATMAP_TILE_CELLS
+
+
+class TileReader:
+    def __init__(self, tiles):
+        self.tiles = tiles
+
+    def get_heatmap_tiles(self, zoom):
+        return self.tiles
+
+
+READER = TileReader({"10/20": {0: 600, 33: 60}, "40/20": {5: 120}})
+
+
+def test_heatmap_is_centered_on_the_busiest_tile():
+    options = make_heatmap_chart(READER, 12)
+    # Cell 33 is the second row's second cell of the tile in the middle
+    assert options["series"][0]["data"] == [
+        [HEATMAP_TILE_CELLS, HEATMAP_TILE_CELLS, 10.0],
+        [HEATMAP_TILE_CELLS + 1, HEATMAP_TILE_CELLS + 1, 1.0],
+    ]
+
+
+def test_heatmap_pans_to_other_tiles():
+    options = make_heatmap_chart(READER, 12, center=(41, 20))
+    assert options["series"][0]["data"] == [[5, HEATMAP_TILE_CELLS, 2.0]]
+    empty = make_heatmap_chart(READER, 12, center=(25, 20))
+    assert empty["series"][0]["data"] == []
+
+
+def test_heatmap_without_tiles():
+    assert make_heatmap_chart(TileReader({}), 12) is None
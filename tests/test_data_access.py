@@ -0,0 +1,259 @@
+import json
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pytest
+
+import data_access
+from data_access import (
+    Reader,
+    ReaderRegistry,
+    Writer,
+    _splice_by_date,
+    parse_args,
+    series_keys,
+)
+from data_utils import StravaUtils
+from models.athlete import Athlete
+from utils import histogram_zone_percentages
+
+OLD_DATES = ["2024-09-02", "2024-09-03"]
+NEW_DATES = ["2024-09-06", "2024-09-07"]
+DATES = [
+    "2024-09-02",
+    "2024-09-03",
+    "2024-09-04",
+    "2024-09-05",
+    "2024-09-06",
+    "2024-09-07",
+]
+
+
+def splice(old, new):
+    return _splice_by_date(old, new, OLD_DATES, NEW_DATES, DATES)
+
+
+def test_splice_fills_gap_in_totals_with_zero():
+    assert splice([1.0, 2.0], [3.0, 4.0]) == [1.0, 2.0, 0, 0, 3.0, 4.0]
+
+
+def test_splice_fills_gap_in_histograms_with_empty_dicts():
+    spliced = splice([{150: 60.0}, {}], [{}, {160: 30.0}])
+    assert spliced == [{150: 60.0}, {}, {}, {}, {}, {160: 30.0}]
+    percentages = histogram_zone_percentages(spliced, [("Easy", 0, 155)])
+    assert percentages["Easy"] == [100.0, 0, 0, 0, 0, 0]
+
+
+def test_splice_fills_gap_in_statistics_with_none():
+    old = {"hrv": {"mean": [40.0, 42.0], "max": [40, 42], "count": [1, 1]}}
+    new = {"hrv": {"mean": [45.0, 44.0], "max": [45, 44], "count": [1, 1]}}
+    assert splice(old, new) == {
+        "hrv": {
+            "mean": [40.0, 42.0, None, None, 45.0, 44.0],
+            "max": [40, 42, None, None, 45, 44],
+            "count": [1, 1, 0, 0, 1, 1],
+        }
+    }
+
+
+def test_splice_carries_running_totals_over_gap():
+    old = {"Shoe": {"distance": [5.0, 0], "cumulative_distance": [5.0, 5.0]}}
+    new = {"Shoe": {"distance": [0, 2.0], "cumulative_distance": [5.0, 7.0]}}
+    assert splice(old, new) == {
+        "Shoe": {
+            "distance": [5.0, 0, 0, 0, 0, 2.0],
+            "cumulative_distance": [5.0, 5.0, 5.0, 5.0, 5.0, 7.0],
+        }
+    }
+
+
+def test_splice_keeps_zone_labels_of_nested_series():
+    old = [("Zone 1", [10.0, 20.0])]
+    new = [("Zone 1", [30.0, 40.0])]
+    assert splice(old, new) == [["Zone 1", [10.0, 20.0, 0, 0, 30.0, 40.0]]]
+
+
+@pytest.fixture
+def fake_readers(monkeypatch):
+    """
+    Readers that take `memory_size` bytes and, for athlete "slow", only
+    finish loading once `release` is set.
+    """
+    release = threading.Event()
+
+    class FakeReader:
+        memory_size = 10
+
+        def __init__(self, athlete_id):
+            if athlete_id == "slow":
+                release.wait(5)
+
+    monkeypatch.setattr(data_access, "Reader", FakeReader)
+    monkeypatch.setattr(data_access.Athlete, "load", lambda athlete_id: athlete_id)
+    return release
+
+
+def test_registry_loads_athletes_without_blocking_others(fake_readers):
+    registry = ReaderRegistry()
+    with ThreadPoolExecutor() as executor:
+        slow = [executor.submit(registry.get, "slow") for _ in range(2)]
+        registry.get("fast")
+        assert not any(future.done() for future in slow)
+        fake_readers.set()
+        assert slow[0].result() is slow[1].result()
+
+
+def test_registry_evicts_least_recently_used(fake_readers):
+    fake_readers.set()
+    registry = ReaderRegistry(max_bytes=25)
+    first = registry.get("a")
+    registry.get("b")
+    assert registry.get("a") is first
+    registry.get("c")
+    assert list(registry._readers) == ["a", "c"]
+
+
+def test_until_build_splices_like_a_full_rebuild(tmp_path, monkeypatch, make_tcx):
+    monkeypatch.chdir(tmp_path)  # The memo store is relative to it
+    athlete = Athlete(athlete_id="test", data_dir=str(tmp_path))
+    # The first week's last run is on a Wednesday
+    for day in [0, 2, 8, 15]:
+        start = datetime(2024, 9, 2, 7) + timedelta(days=day)
+        (tmp_path / f"run_{day}.tcx").write_text(make_tcx(start))
+    full = Writer(athlete=athlete)
+    full.build(["tcx"])
+    full.write_json()
+
+    spliced = Writer(athlete=athlete, until=datetime(2024, 9, 4))
+    spliced.build(["tcx"])
+    assert spliced.failed_sources == []
+    for key in ["dates_str", "training_load_daily", "training_load_weekly"]:
+        assert spliced.data["tcx__" + key] == full.data["tcx__" + key]
+
+
+def test_reader_computes_pace_zones_from_speed_histograms(
+    tmp_path, monkeypatch, make_tcx
+):
+    monkeypatch.chdir(tmp_path)
+    athlete = Athlete(athlete_id="test", data_dir=str(tmp_path))
+    (tmp_path / "run.tcx").write_text(make_tcx(datetime(2024, 9, 2, 7), speed=3.0))
+    writer = Writer(athlete=athlete)
+    writer.build(["tcx"])
+    writer.write_json()
+
+    reader = Reader(athlete)
+    zones = [("Easy", 0, 2.99), ("Steady", 3.0, 3.2), ("Fast", 3.21, 10)]
+    percentages = reader.get_pace_zone_percentages(zones)
+    assert [percentages[zone][0] for zone, _, _ in zones] == [0, 100.0, 0]
+    # The stored histograms don't depend on the zones
+    assert reader.get_pace_zone_percentages([("All", 0, 10)], weekly=True) == {
+        "All": [100.0]
+    }
+
+
+def test_streaming_build_matches_a_regular_build(tmp_path, monkeypatch, make_tcx):
+    athlete = Athlete(athlete_id="test", data_dir=str(tmp_path))
+    for day in [0, 1, 9]:
+        start = datetime(2024, 9, 2, 7) + timedelta(days=day)
+        (tmp_path / f"run_{day}.tcx").write_text(make_tcx(start, speed=3 + day / 10))
+    builds = {}
+    for streaming in [False, True]:
+        # Separate memo stores, so neither build reuses the other's summaries
+        memo_dir = tmp_path / f"memo_{streaming}"
+        memo_dir.mkdir()
+        monkeypatch.chdir(memo_dir)
+        writer = Writer(athlete=athlete, streaming=streaming)
+        writer.build(["tcx"])
+        assert writer.failed_sources == []
+        builds[streaming] = writer.data
+    assert builds[False]["tcx__total_run_distance"] > 0
+    assert builds[True] == builds[False]
+
+
+def write_strava_runs(athlete: Athlete, days: list[int]):
+    first_day = datetime(2024, 9, 2, 7)
+    runs = [
+        {
+            "start_date_local": f"{first_day + timedelta(days=day):%Y-%m-%dT%H:%M:%SZ}",
+            "distance": 10_000.0,
+            "sport_type": "Run",
+        }
+        for day in days
+    ]
+    with open(athlete.path(StravaUtils.JSON_NAME), "w") as file:
+        json.dump({"Shoe": runs}, file)
+
+
+@pytest.fixture
+def strava_athlete(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # The memo store is relative to it
+    athlete = Athlete(athlete_id="test", data_dir=str(tmp_path))
+    write_strava_runs(athlete, [0, 3, 9])
+    writer = Writer(athlete=athlete)
+    writer.build(["strava"])
+    writer.write_json()
+    write_strava_runs(athlete, [0, 3, 9, 20, 30])
+    return athlete
+
+
+def test_keyed_strava_build_refreshes_its_calendar(strava_athlete):
+    writer = Writer(athlete=strava_athlete, keys=["gear_mileage_daily"])
+    writer.build(["strava"])
+    dates = writer.data["strava__dates_str"]
+    assert dates[-1] == "2024-10-02"
+    assert len(writer.data["strava__gear_mileage_daily"]["Shoe"]["distance"]) == len(
+        dates
+    )
+    # Not recomputed, but realigned to the new calendar
+    assert len(writer.data["strava__gear_mileage_weekly"]["Shoe"]["distance"]) == len(
+        writer.data["strava__week_start_dates"]
+    )
+
+
+def test_windowed_strava_build_matches_a_full_rebuild(strava_athlete):
+    spliced = Writer(athlete=strava_athlete, since=datetime(2024, 9, 20))
+    spliced.build(["strava"])
+    full = Writer(athlete=strava_athlete)
+    full.build(["strava"])
+    assert spliced.failed_sources == []
+    for key in [
+        "dates_str",
+        "week_start_dates",
+        "gear_mileage_daily",
+        "gear_mileage_weekly",
+        "distance_by_gear",
+    ]:
+        assert spliced.data["strava__" + key] == full.data["strava__" + key]
+
+
+def test_windowed_build_recomputes_full_history_series(tmp_path, monkeypatch, make_tcx):
+    monkeypatch.chdir(tmp_path)
+    athlete = Athlete(athlete_id="test", data_dir=str(tmp_path))
+    (tmp_path / "first.tcx").write_text(make_tcx(datetime(2024, 9, 2, 7)))
+    full = Writer(athlete=athlete)
+    full.build(["tcx"])
+    full.write_json()
+
+    (tmp_path / "second.tcx").write_text(make_tcx(datetime(2024, 9, 9, 7)))
+    spliced = Writer(athlete=athlete, since=datetime(2024, 9, 9))
+    spliced.build(["tcx"])
+    assert spliced.data["tcx__total_run_distance"] == pytest.approx(
+        2 * full.data["tcx__total_run_distance"]
+    )
+    assert len(spliced.data["tcx__heart_rate_pace_data"]) > len(
+        full.data["tcx__heart_rate_pace_data"]
+    )
+
+
+def test_unknown_keys_are_rejected(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert {"strava__gear_mileage_daily", "recovery_run__correlations"} <= (
+        series_keys()
+    )
+    monkeypatch.setattr(sys, "argv", ["data_access.py", "--keys", "peak_hr"])
+    assert parse_args().keys == ["peak_hr"]
+    monkeypatch.setattr(sys, "argv", ["data_access.py", "--keys", "peak_hr,nope"])
+    with pytest.raises(SystemExit):
+        parse_args()
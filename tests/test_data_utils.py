@@ -0,0 +1,220 @@
+import inspect
+import zipfile
+from dataclasses import replace
+from datetime import datetime, timedelta
+
+import pytest
+
+from data_utils import RecoveryRunJoin, StravaUtils, TcxUtils, WhoopUtils
+from models.athlete import Athlete
+from models.strava import MinimalRun
+from models.whoop import WhoopCycle
+
+RUN_START = datetime(2024, 9, 2, 7)
+
+
+@pytest.fixture
+def athlete(tmp_path, make_tcx):
+    with zipfile.ZipFile(tmp_path / "export.zip", "w") as archive:
+        archive.writestr("activities/run.tcx", make_tcx(RUN_START))
+    return Athlete(athlete_id="test", data_dir=str(tmp_path))
+
+
+def test_archived_run_is_reparsed_once_plan_start_moves_earlier(athlete):
+    later_start = replace(athlete, plan_start_date=RUN_START + timedelta(days=1))
+    excluded = TcxUtils(athlete=later_start)
+    excluded.load_data()
+    assert excluded.workouts == []
+
+    included = TcxUtils(athlete=athlete)
+    included.load_data()
+    assert len(included.workouts) == 1
+    assert included.get_peak_data("heart_rate")[600] > 0
+
+    # The manifest now holds the run's summaries
+    restored = TcxUtils(athlete=athlete)
+    restored.load_data()
+    assert restored.workouts[0].trackpoints == []
+    assert restored.get_peak_data("heart_rate") == included.get_peak_data("heart_rate")
+
+
+def test_speed_histograms_and_pace_zones(tmp_path, make_tcx):
+    # An easy run on Monday, a faster one on Wednesday
+    (tmp_path / "easy.tcx").write_text(make_tcx(RUN_START, speed=3.0))
+    fast_start = RUN_START + timedelta(days=2)
+    (tmp_path / "fast.tcx").write_text(make_tcx(fast_start, speed=3.6))
+    utils = TcxUtils(athlete=Athlete(athlete_id="test", data_dir=str(tmp_path)))
+    utils.load_data()
+
+    assert utils.speed_histograms()[:3] == [{3.0: 1199.0}, {}, {3.6: 1199.0}]
+    assert utils.speed_histograms(weekly=True)[0] == {3.0: 1199.0, 3.6: 1199.0}
+    zones = utils.pace_zone_percentages(weekly=True)
+    assert [percentages[0] for _, _, percentages in zones] == [50.0, 0, 50.0, 0, 0]
+
+
+def test_streaming_drops_trackpoints_after_summarizing(tmp_path, make_tcx):
+    (tmp_path / "run.tcx").write_text(make_tcx(RUN_START))
+    athlete = Athlete(athlete_id="test", data_dir=str(tmp_path))
+    regular = TcxUtils(athlete=athlete)
+    regular.load_data()
+    streamed = TcxUtils(athlete=athlete, streaming=True)
+    streamed.load_data()
+
+    assert len(regular.workouts[0].trackpoints) == 1200
+    assert streamed.workouts[0].trackpoints == []
+    assert streamed.get_peak_data("pace") == regular.get_peak_data("pace")
+    assert streamed.heart_rate_histograms() == regular.heart_rate_histograms()
+    assert streamed.heatmap_tiles() == regular.heatmap_tiles()
+
+
+@pytest.fixture
+def strava_utils():
+    utils = StravaUtils()
+    utils.data = {
+        "Old shoe": [
+            MinimalRun(datetime(2024, 9, 2, 7), 500_000.0),
+            MinimalRun(datetime(2024, 9, 2, 18), 250_000.0),
+            MinimalRun(datetime(2024, 9, 4, 7), 60_000.0),
+            MinimalRun(datetime(2024, 9, 10, 7), 10_000.0),
+        ],
+        "New shoe": [MinimalRun(datetime(2024, 9, 5, 7), 10_000.0)],
+    }
+    return utils
+
+
+def test_gear_mileage_daily(strava_utils):
+    mileage = strava_utils.gear_mileage()
+    # Both runs on the first day count towards it
+    old_shoe = [750_000.0, 0, 60_000.0, 0, 0, 0, 0, 0, 10_000.0]
+    assert mileage["Old shoe"]["distance"] == old_shoe
+    assert mileage["Old shoe"]["cumulative_distance"][-1] == 820_000.0
+    assert mileage["New shoe"]["cumulative_distance"][2:4] == [0, 10_000.0]
+
+
+def test_gear_mileage_weekly(strava_utils):
+    mileage = strava_utils.gear_mileage(weekly=True)
+    assert mileage["Old shoe"]["distance"] == [810_000.0, 10_000.0]
+    assert mileage["Old shoe"]["cumulative_distance"] == [810_000.0, 820_000.0]
+    assert mileage["New shoe"]["distance"] == [10_000.0, 0]
+
+
+def test_gear_retires_on_the_run_passing_the_retirement_distance(strava_utils):
+    mileage = strava_utils.gear_mileage()
+    assert mileage["Old shoe"]["retired_on"] == "2024-09-04"
+    assert mileage["New shoe"]["retired_on"] is None
+    assert strava_utils.gear_mileage(weekly=True)["Old shoe"]["retired_on"] == (
+        "2024-09-04"
+    )
+
+
+def whoop_cycle(start: str, end: str, **metrics):
+    fields = inspect.signature(WhoopCycle.__init__).parameters
+    values = {name: None for name in list(fields)[1:]}
+    values.update(start_time=start, end_time=end, cycle_timezone="UTC+02:00")
+    return WhoopCycle(**{**values, **metrics})
+
+
+@pytest.fixture
+def recovery_run_join():
+    cycles = [
+        whoop_cycle(
+            f"2024-09-0{day} 23:00:00",
+            f"2024-09-0{day + 1} 22:00:00",
+            recovery_score=40 + 10 * day,
+            heart_rate_variability=50,
+            resting_heart_rate=50 - day if day < 3 else None,
+        )
+        for day in range(1, 5)
+    ]
+    runs = [
+        {
+            # UTC, so 09:00 in the cycles' time zone
+            "start_time": datetime(2024, 9, day + 1, 7),
+            "avg_heart_rate": 160 - 5 * day,
+            "speed_at_heart_rate": 3.0 + 0.1 * day,
+            "zone_1_seconds": 600.0,
+        }
+        for day in range(1, 5)
+    ]
+    # Before the first cycle, so not matched
+    runs.append({**runs[0], "start_time": datetime(2024, 9, 1, 7)})
+    return RecoveryRunJoin(runs, cycles, [("Zone 1", 0, 150)])
+
+
+def test_runs_are_matched_to_their_cycle(recovery_run_join):
+    features = recovery_run_join.run_features()
+    assert [f["date"] for f in features] == [
+        "2024-09-02",
+        "2024-09-03",
+        "2024-09-04",
+        "2024-09-05",
+    ]
+    assert [f["recovery_score"] for f in features] == [50, 60, 70, 80]
+
+
+def test_correlations(recovery_run_join):
+    correlations = {
+        (whoop, run): (r, n) for whoop, run, r, n in recovery_run_join.correlations()
+    }
+    r, n = correlations[("recovery_score", "avg_heart_rate")]
+    assert (r, n) == (pytest.approx(-1), 4)
+    r, n = correlations[("recovery_score", "speed_at_heart_rate")]
+    assert (r, n) == (pytest.approx(1), 4)
+    # Constant on either side
+    assert correlations[("recovery_score", "zone_1_seconds")] == (None, 4)
+    assert correlations[("heart_rate_variability", "avg_heart_rate")] == (None, 4)
+    # Only two cycles have a resting heart rate
+    assert correlations[("resting_heart_rate", "avg_heart_rate")] == (None, 2)
+
+
+@pytest.fixture
+def whoop_utils():
+    utils = WhoopUtils()
+    utils.cycles = [
+        whoop_cycle(
+            "2024-09-02 23:00:00",
+            "2024-09-03 22:00:00",
+            recovery_score=40,
+            day_strain=10.0,
+        ),
+        # A second cycle on the same day, without a strain
+        whoop_cycle("2024-09-02 23:30:00", "2024-09-03 22:00:00", recovery_score=80),
+        whoop_cycle(
+            "2024-09-04 23:00:00",
+            "2024-09-05 22:00:00",
+            recovery_score=70,
+            day_strain=14.0,
+        ),
+    ]
+    return utils
+
+
+def test_cycle_metrics_skip_missing_values(whoop_utils):
+    metrics = whoop_utils.cycle_metrics()
+    assert metrics["recovery_score"] == {
+        "mean": [60.0, None, 70.0],
+        "min": [40, None, 70],
+        "max": [80, None, 70],
+        "count": [2, 0, 1],
+    }
+    assert metrics["day_strain"]["mean"] == [10.0, None, 14.0]
+    assert metrics["day_strain"]["count"] == [1, 0, 1]
+    # Days without a value are plotted as 0
+    assert whoop_utils.day_strain() == [10.0, 0, 14.0]
+
+
+def test_weekly_cycle_metrics(whoop_utils):
+    assert whoop_utils.cycle_metrics(weekly=True)["day_strain"] == {
+        "mean": [12.0],
+        "min": [10.0],
+        "max": [14.0],
+        "count": [2],
+    }
+
+
+def test_cycle_metrics_are_recomputed_for_a_window(whoop_utils):
+    assert whoop_utils.cycle_metrics()["recovery_score"]["count"] == [2, 0, 1]
+    whoop_utils.restrict_to_window(datetime(2024, 9, 4), datetime(2024, 9, 5))
+    # The calendar still starts on the Monday of the window's first week
+    assert whoop_utils.cycle_metrics()["recovery_score"]["count"] == [0, 0, 1]
+    assert whoop_utils.cycle_metrics()["recovery_score"]["mean"] == [None, None, 70.0]
@@ -0,0 +1,58 @@
+import json
+
+import pytest
+from streamlit_echarts import JsCode
+
+import export_static
+from export_static import SECTIONS, build_bundle, make_index_html, to_js
+
+
+def test_to_js_restores_functions():
+    options = {"formatter": JsCode("function(value) { return value; }").js_code}
+    assert to_js(options) == '{"formatter": function(value) { return value; }}'
+    assert json.loads(to_js({"name": "5:00 min/km"})) == {"name": "5:00 min/km"}
+
+
+@pytest.fixture
+def charts(monkeypatch):
+    def make_charts(reader, weekly, imperial):
+        return {
+            "training_load": {"series": [{"type": "line", "data": [1, 2]}]},
+            "shoe_distance": {"unit": "mi" if imperial else "km"},
+            "shoe_wear": None,
+        }
+
+    monkeypatch.setattr(export_static, "make_charts", make_charts)
+    monkeypatch.setattr(export_static, "make_metrics", lambda reader, imperial: {})
+    monkeypatch.setattr(
+        export_static, "make_heatmap_chart", lambda reader, zoom: {"zoom": 1}
+    )
+
+
+def test_bundle_stores_shared_specs_once(charts):
+    bundle = build_bundle(reader=None)
+    specs = [bundle["specs"][i] for i in bundle["charts"]["shoe_distance"].values()]
+    assert specs == [{"unit": "mi"}, {"unit": "km"}, {"unit": "mi"}, {"unit": "km"}]
+    assert len(set(bundle["charts"]["shoe_distance"].values())) == 2
+    assert len(set(bundle["heatmap"].values())) == 1
+
+
+def test_daily_charts_get_a_date_zoom(charts):
+    bundle = build_bundle(reader=None)
+    training_load = bundle["charts"]["training_load"]
+    weekly = bundle["specs"][training_load["11"]]
+    daily = bundle["specs"][training_load["01"]]
+    assert "dataZoom" not in weekly
+    assert daily["dataZoom"] == [{"type": "inside"}, {"type": "slider"}]
+    assert daily["series"][0]["sampling"] == "lttb"
+    # Charts without data stay empty
+    assert bundle["specs"][bundle["charts"]["shoe_wear"]["01"]] is None
+
+
+def test_index_has_a_container_for_every_chart():
+    index = make_index_html()
+    for anchor, _, charts in SECTIONS:
+        assert f'id="{anchor}"' in index
+        for chart, _ in charts:
+            assert f'<div class="chart" id="{chart}"></div>' in index
+    assert 'id="heatmap-zoom"' in index
@@ -0,0 +1,141 @@
+import gzip
+import io
+import struct
+from datetime import timedelta
+
+import pytest
+
+from data_utils import TcxUtils
+from models.athlete import Athlete
+from fit import FIT_EPOCH, RECORD, SEMICIRCLES, SESSION, read_fit
+
+START = 1_000_000_000  # FIT timestamp of the first record
+
+# (field number, struct format, FIT base type)
+RECORD_FIELDS = [
+    (253, "I", 0x86),  # timestamp
+    (0, "i", 0x85),  # latitude
+    (1, "i", 0x85),  # longitude
+    (2, "H", 0x84),  # altitude
+    (3, "B", 0x02),  # heart rate
+    (4, "B", 0x02),  # cadence, not decoded
+    (5, "I", 0x86),  # distance
+    (6, "H", 0x84),  # speed
+]
+# Records with a compressed timestamp header have no timestamp field
+COMPRESSED_RECORD_FIELDS = [(3, "B", 0x02), (5, "I", 0x86), (6, "H", 0x84)]
+SESSION_FIELDS = [
+    (2, "I", 0x86),  # start time
+    (5, "B", 0x00),  # sport
+    (8, "I", 0x86),  # total timer time
+    (9, "I", 0x86),  # total distance
+    (11, "H", 0x84),  # total calories
+]
+
+
+def definition(local_type: int, message_number: int, fields: list):
+    content = struct.pack(
+        "<BBBHB", 0x40 | local_type, 0, 0, message_number, len(fields)
+    )
+    for number, fmt, base_type in fields:
+        content += struct.pack("<BBB", number, struct.calcsize(fmt), base_type)
+    return content
+
+
+def data(header: int, fields: list, values: list):
+    return bytes([header]) + struct.pack(
+        "<" + "".join(fmt for _, fmt, _ in fields), *values
+    )
+
+
+def encode_fit(records: bytes):
+    header = struct.pack("<BBHI4sH", 14, 0x20, 2132, len(records), b".FIT", 0)
+    return header + records + b"\x00\x00"  # CRCs aren't checked
+
+
+@pytest.fixture
+def fit_bytes():
+    messages = definition(0, RECORD, RECORD_FIELDS)
+    for i in range(10):
+        messages += data(
+            0,
+            RECORD_FIELDS,
+            [
+                START + i,
+                int(52.5 * SEMICIRCLES),
+                int((13.4 + i * 1e-4) * SEMICIRCLES),
+                (30 + 500) * 5,
+                0xFF if i == 3 else 150,  # Invalid value, i.e. no heart rate
+                85,
+                i * 300,
+                3000,
+            ],
+        )
+    messages += definition(1, RECORD, COMPRESSED_RECORD_FIELDS)
+    for i in range(10, 12):
+        offset = (START + i) & 0x1F
+        messages += data(
+            0x80 | (1 << 5) | offset, COMPRESSED_RECORD_FIELDS, [152, i * 300, 3000]
+        )
+    messages += definition(2, SESSION, SESSION_FIELDS)
+    # Paused for two of the eleven seconds
+    messages += data(2, SESSION_FIELDS, [START, 1, 9000, 11 * 300, 42])
+    return encode_fit(messages)
+
+
+def test_read_fit(fit_bytes):
+    workout = read_fit(io.BytesIO(fit_bytes))
+
+    assert workout.activity_type == "Running"
+    assert workout.calories == 42
+    assert workout.distance == pytest.approx(33.0)
+    assert workout.start_time == FIT_EPOCH + timedelta(seconds=START)
+    assert workout.end_time == FIT_EPOCH + timedelta(seconds=START + 11)
+    assert workout.duration == 9
+
+    trackpoints = workout.trackpoints
+    assert len(trackpoints) == 12
+    assert [t.time - workout.start_time for t in trackpoints] == [
+        timedelta(seconds=i) for i in range(12)
+    ]
+    assert trackpoints[0].latitude == pytest.approx(52.5)
+    assert trackpoints[1].longitude == pytest.approx(13.4001)
+    assert trackpoints[0].elevation == pytest.approx(30)
+    assert trackpoints[2].distance == pytest.approx(6.0)
+    assert trackpoints[0].tpx_ext == {"Speed": 3.0}
+    assert [t.hr_value for t in trackpoints[:5]] == [150, 150, 150, None, 150]
+    assert trackpoints[11].hr_value == 152
+    assert trackpoints[11].latitude is None
+
+
+def test_read_gzipped_fit_like_tcx(fit_bytes):
+    workout = TcxUtils._read_workout("run.fit.gz", io.BytesIO(gzip.compress(fit_bytes)))
+    assert len(workout.trackpoints) == 12
+
+
+def test_reject_other_files():
+    with pytest.raises(ValueError):
+        read_fit(io.BytesIO(b"<?xml version='1.0'?><TrainingCenterDatabase/>"))
+
+
+def test_read_fit_without_records():
+    session = definition(0, SESSION, SESSION_FIELDS)
+    session += data(0, SESSION_FIELDS, [START, 1, 1800_000, 5000_00, 300])
+    workout = read_fit(io.BytesIO(encode_fit(session)))
+    assert workout.trackpoints == []
+    assert workout.start_time == FIT_EPOCH + timedelta(seconds=START)
+    assert workout.duration == 1800
+    assert workout.distance == pytest.approx(5000)
+
+
+def test_fit_without_start_time_is_skipped(tmp_path, fit_bytes):
+    fields = [(5, "B", 0x00)]
+    no_start = encode_fit(definition(0, SESSION, fields) + data(0, fields, [1]))
+    assert read_fit(io.BytesIO(no_start)).start_time is None
+
+    (tmp_path / "no_start.fit").write_bytes(no_start)
+    (tmp_path / "run.fit").write_bytes(fit_bytes)
+    athlete = Athlete("test", str(tmp_path), plan_start_date=FIT_EPOCH)
+    utils = TcxUtils(athlete=athlete)
+    utils.load_data()
+    assert [w.duration for w in utils.workouts] == [9]
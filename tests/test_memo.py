@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+import memo
+from memo import MemoStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return MemoStore(directory=str(tmp_path / "memo"), max_bytes=10_000)
+
+
+def test_key_depends_on_parts_and_algorithm_version(monkeypatch):
+    key = MemoStore.key("run-hash", "peaks", (60, 300))
+    assert key == MemoStore.key("run-hash", "peaks", (60, 300))
+    assert key != MemoStore.key("run-hash", "peaks", (60, 600))
+    monkeypatch.setattr(memo, "ALGORITHM_VERSION", memo.ALGORITHM_VERSION + 1)
+    assert key != MemoStore.key("run-hash", "peaks", (60, 300))
+
+
+def test_put_and_get(store):
+    missing = object()
+    assert store.get("key", missing) is missing
+    store.put("key", {"heart_rate": [150, 160]})
+    assert store.get("key") == {"heart_rate": [150, 160]}
+    # Entries are read back from disk by a new store
+    assert MemoStore(directory=store.directory).get("key") == {"heart_rate": [150, 160]}
+
+
+def test_corrupt_entry_is_a_miss(store):
+    with open(os.path.join(store.directory, "key.pkl"), "wb") as f:
+        f.write(b"not a pickle")
+    assert store.get("key", "default") == "default"
+
+
+def test_memoize_computes_once(store):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return 42
+
+    assert store.memoize(("run-hash", "peaks"), compute) == 42
+    assert store.memoize(("run-hash", "peaks"), compute) == 42
+    assert len(calls) == 1
+
+
+def test_least_recently_used_entries_are_evicted(store):
+    value = b"x" * 3_000
+    store.put("first", value)
+    store.put("second", value)
+    store.put("third", value)
+    for age, key in enumerate(["first", "second", "third"]):
+        os.utime(os.path.join(store.directory, f"{key}.pkl"), (age, age))
+    # Reading "first" marks it as the most recently used entry
+    store.get("first")
+    store.put("fourth", value)
+
+    assert store.get("second") is None
+    assert store.get("third") is None
+    assert store.get("first") == value
+    assert store.get("fourth") == value
+    assert store._size <= store.max_bytes * 0.9
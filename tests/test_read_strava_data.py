@@ -0,0 +1,202 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+import read_strava_data
+from data_utils import StravaStreamUtils
+from models.athlete import Athlete
+from read_strava_data import (
+    MAX_PER_PAGE,
+    DailyRateLimitExceeded,
+    StravaClient,
+    TokenStore,
+    fetch_activities,
+    fetch_streams,
+    sync_activities,
+)
+
+RUN_SECONDS = 1200
+
+
+def make_activity(i: int):
+    return {
+        "id": i,
+        "type": "Run",
+        "start_date": time.strftime(
+            "%Y-%m-%dT%H:%M:%SZ", time.gmtime(1725000000 + i * 86400)
+        ),
+        "distance": 3.0 * RUN_SECONDS,
+        "elapsed_time": RUN_SECONDS,
+        "total_elevation_gain": 0,
+        "gear_id": None,
+    }
+
+
+class StubStrava(BaseHTTPRequestHandler):
+    """
+    Answers the Strava endpoints used by read_strava_data from `server.state`.
+    """
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, body=None, headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(json.dumps(body).encode())
+
+    def do_POST(self):
+        state = self.server.state
+        state["refreshes"] += 1
+        state["token"] = f"token-{state['refreshes']}"
+        self._send(
+            200,
+            {
+                "access_token": state["token"],
+                "refresh_token": "refresh",
+                "expires_at": time.time() + 3600,
+            },
+        )
+
+    def do_GET(self):
+        state = self.server.state
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        state["requests"].append(url.path)
+        if self.headers["Authorization"] != f"Bearer {state['token']}":
+            self._send(401, {"message": "Authorization Error"})
+        elif state["throttle"] > 0:
+            state["throttle"] -= 1
+            self._send(429, {"message": "Rate Limit Exceeded"}, {"Retry-After": "0"})
+        elif url.path == "/athlete/activities":
+            page = int(query["page"][0])
+            per_page = int(query["per_page"][0])
+            activities = state["activities"][(page - 1) * per_page : page * per_page]
+            daily_usage = len(state["requests"])
+            self._send(
+                200,
+                activities,
+                {
+                    "X-RateLimit-Limit": f"100,{state['daily_limit']}",
+                    "X-RateLimit-Usage": f"1,{daily_usage}",
+                },
+            )
+        elif url.path.endswith("/streams"):
+            seconds = list(range(RUN_SECONDS))
+            self._send(
+                200,
+                {
+                    "time": {"data": seconds},
+                    "heartrate": {"data": [150] * RUN_SECONDS},
+                    "velocity_smooth": {"data": [3.0] * RUN_SECONDS},
+                    "distance": {"data": [3.0 * s for s in seconds]},
+                    "altitude": {"data": [30.0] * RUN_SECONDS},
+                    "latlng": {"data": [[52.5, 13.4 + s * 1e-5] for s in seconds]},
+                },
+            )
+        else:
+            self._send(404, {"message": "Record Not Found"})
+
+
+@pytest.fixture
+def strava(tmp_path):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubStrava)
+    server.state = {
+        "activities": [make_activity(i) for i in range(MAX_PER_PAGE + 50)],
+        "token": "token-0",
+        "refreshes": 0,
+        "throttle": 0,
+        "requests": [],
+        "daily_limit": 1000,
+    }
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_port}"
+
+    athlete = Athlete(athlete_id="test", data_dir=str(tmp_path))
+    tokens = TokenStore(athlete, token_url=f"{url}/oauth/token")
+    tokens.save(
+        {
+            "access_token": "token-0",
+            "refresh_token": "refresh",
+            "expires_at": time.time() + 3600,
+        }
+    )
+    yield StravaClient(tokens, api_url=url), server.state
+    server.shutdown()
+    server.server_close()
+
+
+def test_fetch_activities_reads_every_page(strava):
+    client, state = strava
+    activities = fetch_activities(client)
+    assert [a["id"] for a in activities] == [a["id"] for a in state["activities"]]
+
+
+def test_client_retries_rate_limited_requests(strava):
+    client, state = strava
+    state["throttle"] = 2
+    assert len(fetch_activities(client)) == len(state["activities"])
+    assert state["throttle"] == 0
+
+
+def test_client_refreshes_rejected_token(strava):
+    client, state = strava
+    state["token"] = "revoked"
+    state["refreshes"] = -1  # The refresh hands out "token-0" again
+    assert len(fetch_activities(client)) == len(state["activities"])
+    assert state["refreshes"] == 0
+
+
+def test_sync_without_state_file_only_fetches_new_activities(strava):
+    client, state = strava
+    athlete = client.athlete
+    stored = state["activities"][:10]
+    read_strava_data.write_json_file(
+        athlete.path(read_strava_data.ACTIVITIES_FILE), stored
+    )
+
+    activities = sync_activities(client)
+    assert len(activities) == len(state["activities"])
+    assert len({a["id"] for a in activities}) == len(activities)
+    saved_state = read_strava_data.read_json_file(
+        athlete.path(read_strava_data.SYNC_STATE_FILE)
+    )
+    assert saved_state["activity_ids"] == sorted(a["id"] for a in activities)
+
+
+def test_fetched_streams_load_as_runs(strava):
+    client, state = strava
+    activities = state["activities"][:3]
+    assert fetch_streams(client, activities) == 3
+    assert fetch_streams(client, activities) == 0  # Already stored
+
+    utils = StravaStreamUtils(athlete=client.athlete)
+    utils.load_data()
+    assert len(utils.workouts) == 3
+    peaks = utils.get_peak_data("heart_rate")
+    assert peaks[600] == pytest.approx(150)
+    assert utils.get_peak_data("pace")[1000] == pytest.approx(3.0)
+
+
+def test_sync_stopped_by_daily_limit_keeps_fetched_pages(strava):
+    client, state = strava
+    state["daily_limit"] = 1  # Reached by the first page
+    activities = sync_activities(client)
+    assert [a["id"] for a in activities] == list(range(MAX_PER_PAGE))
+    assert state["requests"] == ["/athlete/activities"]
+    with pytest.raises(DailyRateLimitExceeded):
+        client.get("/athlete/activities", {"page": 1, "per_page": 1})
+
+    # The next day's sync continues after the stored activities
+    state["daily_limit"] = 1000
+    client._exhausted_until = 0.0
+    activities = sync_activities(client)
+    assert [a["id"] for a in activities] == [a["id"] for a in state["activities"]]
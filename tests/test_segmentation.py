@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+from tcxreader import TCXExercise, TCXTrackPoint
+
+from constants import MAX_GRADE
+from segmentation import _energy_cost, segment_arrays, segment_workout
+
+START = datetime(2024, 10, 1, 7)
+
+
+def make_run(seconds: int, pause_at: int, pause_length: int, speed=3.0, hr=150):
+    """
+    A run at constant speed and heart rate with one standing pause, sampled
+    every second.
+    """
+    trackpoints = []
+    distance = 0.0
+    for t in range(seconds):
+        paused = pause_at <= t < pause_at + pause_length
+        if t > 0 and not paused:
+            distance += speed
+        trackpoints.append(
+            TCXTrackPoint(
+                time=START + timedelta(seconds=t),
+                distance=distance,
+                hr_value=100 if paused else hr,
+                tpx_ext={"Speed": 0.0 if paused else speed},
+            )
+        )
+    return TCXExercise(trackpoints=trackpoints, start_time=START)
+
+
+def test_pause_splits_moving_segments():
+    segments = segment_workout(make_run(5000, 2500, 60))
+    assert len(segments.boundaries) == 2
+    assert segments.moving_time == 4999 - 60
+
+
+def test_rolling_means_span_pauses():
+    segments = segment_workout(make_run(5000, 2500, 60))
+
+    heart_rate = segments.per_second
+    means = heart_rate.rolling_means(heart_rate.heart_rate, 3600)
+    assert len(means) > 0
+    assert np.allclose(means, 150)
+
+    pace = segments.per_distance
+    means = pace.rolling_means(pace.speed, 10000)
+    assert len(means) > 0
+    assert np.allclose(means, 3.0)
+
+
+def test_rolling_means_longer_than_moving_time():
+    series = segment_workout(make_run(600, 300, 60)).per_second
+    assert len(series.rolling_means(series.heart_rate, 600)) == 0
+
+
+def hill_segments(grade: float, elevation=True, seconds=600, speed=3.0):
+    """
+    Segments of a run at constant speed up (or down) a constant grade.
+    """
+    t = np.arange(seconds, dtype=float)
+    distance = t * speed
+    missing = np.full(seconds, np.nan)
+    return segment_arrays(
+        seconds=t,
+        heart_rate=np.full(seconds, 150.0),
+        speed=np.full(seconds, speed),
+        distance=distance,
+        elevation=30 + grade * distance if elevation else missing,
+        latitude=missing,
+        longitude=missing,
+    )
+
+
+def test_grade_adjusted_speed_on_flat_ground_is_the_speed():
+    assert np.allclose(hill_segments(0).grade_adjusted_speed, 3.0)
+    assert np.allclose(hill_segments(0.05, elevation=False).grade_adjusted_speed, 3.0)
+
+
+def test_grade_adjusted_speed_on_hills():
+    uphill = hill_segments(0.05).grade_adjusted_speed
+    downhill = hill_segments(-0.05).grade_adjusted_speed
+    # Away from the ends, where the smoothing window is cut off
+    middle = slice(100, 500)
+    expected = 3.0 * _energy_cost(np.array([0.05, -0.05])) / _energy_cost(0)
+    assert np.allclose(uphill[middle], expected[0], rtol=1e-3)
+    assert np.allclose(downhill[middle], expected[1], rtol=1e-3)
+    assert expected[0] > 3.0 > expected[1]
+
+
+def test_grades_are_clipped_to_the_energy_cost_model():
+    steep = hill_segments(1.0).grade_adjusted_speed
+    limit = 3.0 * _energy_cost(MAX_GRADE) / _energy_cost(0)
+    assert np.allclose(steep[100:500], limit)
@@ -0,0 +1,64 @@
+from datetime import date, timedelta
+
+import pytest
+
+from data_utils import TrainingLoadModel
+
+START = date(2024, 1, 1)
+
+
+def days(n: int, start: date = START):
+    return [start + timedelta(days=i) for i in range(n)]
+
+
+def full_update(loads: list[float], tmp_path):
+    return TrainingLoadModel(str(tmp_path / "full.json")).update(
+        days(len(loads)), loads
+    )
+
+
+@pytest.fixture
+def model(tmp_path):
+    return TrainingLoadModel(str(tmp_path / "training_load.json"))
+
+
+def test_new_days_advance_from_stored_state(model, tmp_path):
+    loads = [float(i % 7) * 10 for i in range(60)]
+    model.update(days(50), loads[:50])
+    model.save()
+
+    stored = TrainingLoadModel(model.path)
+    calls = []
+    advance = stored._advance
+    stored._advance = lambda start: calls.append(start) or advance(start)
+    result = stored.update(days(60), loads)
+
+    assert calls == [50]
+    assert result == pytest.approx(full_update(loads, tmp_path))
+
+
+def test_windowed_update_recomputes_following_days(model, tmp_path):
+    loads = [50.0] * 30
+    model.update(days(30), loads)
+
+    loads[10:15] = [0.0] * 5
+    window = model.update(days(7, START + timedelta(days=10)), loads[10:17], False)
+    assert window["load"] == [0.0] * 5 + [50.0] * 2
+    assert model.update(days(30), loads) == pytest.approx(full_update(loads, tmp_path))
+
+
+def test_complete_update_drops_days_outside_dates(model, tmp_path):
+    model.update(days(30), [20.0] * 30)
+    result = model.update(days(10, START + timedelta(days=5)), [20.0] * 10)
+
+    assert model.state["dates"][0] == "2024-01-06"
+    assert len(model.state["dates"]) == 10
+    assert result == pytest.approx(full_update([20.0] * 10, tmp_path))
+
+
+def test_save_skips_unchanged_state(model):
+    model.update(days(5), [10.0] * 5)
+    model.save()
+    stored = TrainingLoadModel(model.path)
+    stored.update(days(5), [10.0] * 5)
+    assert not stored.modified
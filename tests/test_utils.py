@@ -0,0 +1,48 @@
+import pytest
+
+from utils import (
+    busiest_tile,
+    histogram_zone_percentages,
+    pearson_correlation,
+    tile_at_zoom,
+)
+
+
+def test_pearson_correlation():
+    assert pearson_correlation([1, 2, 3, 4], [2, 4, 6, 8]) == pytest.approx(1)
+    assert pearson_correlation([1, 2, 3, 4], [8, 6, 4, 2]) == pytest.approx(-1)
+    assert pearson_correlation([1, 2, 3], [1, 3, 2]) == pytest.approx(0.5)
+
+
+def test_pearson_correlation_needs_three_pairs():
+    assert pearson_correlation([], []) is None
+    assert pearson_correlation([1, 2], [3, 1]) is None
+
+
+def test_pearson_correlation_of_constant_values_is_none():
+    assert pearson_correlation([1, 2, 3], [5, 5, 5]) is None
+    assert pearson_correlation([4, 4, 4], [1, 2, 3]) is None
+
+
+def test_busiest_tile():
+    tiles = {"10/20": {0: 30, 5: 40}, "11/20": {3: 60}, "-1/7": {1: 5}}
+    assert busiest_tile(tiles) == (10, 20)
+
+
+def test_tile_at_zoom_keeps_the_center():
+    assert tile_at_zoom((10, 20), 12, 12) == (10, 20)
+    assert tile_at_zoom((10, 21), 12, 11) == (5, 10)
+    assert tile_at_zoom((10, 21), 12, 10) == (2, 5)
+    # Zooming in lands on a tile inside the original one
+    assert tile_at_zoom((10, 21), 12, 13) == (21, 43)
+    assert tile_at_zoom(tile_at_zoom((10, 21), 12, 15), 15, 12) == (10, 21)
+
+
+def test_histogram_zone_percentages():
+    zones = [("Easy", 0, 3.12), ("Steady", 3.13, 3.53)]
+    # Bounds are inclusive, and speeds outside every zone are ignored
+    histograms = [{3.12: 30.0, 3.53: 10.0, 5.0: 60.0}, {}]
+    assert histogram_zone_percentages(histograms, zones) == {
+        "Easy": [75.0, 0],
+        "Steady": [25.0, 0],
+    }
@@ -1,4 +1,6 @@
 import datetime
+import math
+import re
 
 from constants import SLOWEST_SUPPORTED_PACE
 
@@ -37,3 +39,119 @@ def get_list_of_dates_between(
         current += datetime.timedelta(days=delta)
     return dates
 
+
+def utc_offset(timezone: str | None) -> datetime.timedelta:
+    """
+    Parse offsets of the form "UTC-05:00" as used in the Whoop export.
+    """
+    match = re.fullmatch(r"UTC([+-])(\d{2}):(\d{2})", timezone or "")
+    if match is None:
+        return datetime.timedelta(0)
+    sign = 1 if match.group(1) == "+" else -1
+    return sign * datetime.timedelta(
+        hours=int(match.group(2)), minutes=int(match.group(3))
+    )
+
+
+def pearson_correlation(xs: list[float], ys: list[float]) -> float | None:
+    """
+    None for fewer than three pairs (two points always correlate perfectly)
+    or if either variable is constant.
+    """
+    n = len(xs)
+    if n < 3:
+        return None
+    mean_x = sum(xs) / n
+    mean_y = sum(ys) / n
+    cov = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+    var_x = sum((x - mean_x) ** 2 for x in xs)
+    var_y = sum((y - mean_y) ** 2 for y in ys)
+    if var_x == 0 or var_y == 0:
+        return None
+    return cov / math.sqrt(var_x * var_y)
+
+
+def histogram_zone_durations(
+    histogram: dict, zones: list[tuple[str, float, float]]
+) -> dict[str, float]:
+    """
+    Time per zone in a histogram, given zones as (name, lower, upper) with
+    inclusive bounds. Values outside all zones are ignored.
+    """
+    durations = {name: 0 for name, _, _ in zones}
+    for value, duration in histogram.items():
+        value = float(value)
+        for name, lower, upper in zones:
+            if lower <= value <= upper:
+                durations[name] += duration
+                break
+    return durations
+
+
+def histogram_zone_percentages(
+    histograms: list[dict], zones: list[tuple[str, float, float]]
+) -> dict[str, list[float]]:
+    """
+    Percentage of time per zone for each histogram, given zones as
+    (name, lower, upper) with inclusive bounds. Values outside all zones are
+    ignored.
+    """
+    percentages = {name: [] for name, _, _ in zones}
+    for histogram in histograms:
+        durations = histogram_zone_durations(histogram, zones)
+        total = sum(durations.values())
+        for name, duration in durations.items():
+            percentages[name].append(round(duration / total * 100, 2) if total else 0)
+    return percentages
+
+
+def busiest_tile(tiles: dict) -> tuple[int, int]:
+    """
+    (x, y) of the tile with the most time in it, given {"x/y": {cell: seconds}}.
+    """
+    busiest = max(tiles, key=lambda t: sum(tiles[t].values()))
+    x, y = busiest.split("/")
+    return int(x), int(y)
+
+
+def tile_at_zoom(tile: tuple[int, int], zoom: int, to_zoom: int) -> tuple[int, int]:
+    """
+    The tile at `to_zoom` containing the center of `tile` at `zoom`.
+    """
+    scale = 2 ** (to_zoom - zoom)
+    return math.floor((tile[0] + 0.5) * scale), math.floor((tile[1] + 0.5) * scale)
+
+
+def lttb_indices(values: list[float], threshold: int) -> list[int]:
+    """
+    Indices of the points kept when downsampling to `threshold` points with
+    Largest-Triangle-Three-Buckets (Steinarsson, 2013), using the index as x.
+    The first and last points are always kept.
+    """
+    n = len(values)
+    if threshold >= n:
+        return list(range(n))
+    if threshold < 3:
+        return [0, n - 1][:threshold]
+
+    indices = [0]
+    bucket_size = (n - 2) / (threshold - 2)
+    for i in range(threshold - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        # The next bucket is represented by its average point
+        next_x = (end + next_end - 1) / 2
+        next_y = sum(values[end:next_end]) / (next_end - end)
+        a = indices[-1]
+        indices.append(
+            max(
+                range(start, end),
+                key=lambda j: abs(
+                    (a - next_x) * (values[j] - values[a])
+                    - (a - j) * (next_y - values[a])
+                ),
+            )
+        )
+    indices.append(n - 1)
+    return indices